@@ -0,0 +1,82 @@
+import os
+import random
+import tempfile
+import unittest
+
+from treasure_hunter_ai import MonsterAI
+from treasure_hunter_engine import MapCell, GameSession, populate, setup_game
+from treasure_hunter_events import Encounter, ListSink
+from treasure_hunter_save import load_game, save_game
+
+
+def _one_monster_game(events, monster_coord=(2, 0)):
+    """5x5 のマップに、プレイヤー (0, 0) とモンスター 1 体だけを置く"""
+    rng = random.Random(0)
+    player, game_map, monsters = setup_game(verbose=False, width=5, height=5,
+                                            num_treasures=0, num_monsters=0,
+                                            events=events, rng=rng)
+    populate(game_map, monsters, [], [monster_coord], None, rng)
+    return player, game_map, monsters, rng
+
+
+class ChaseTest(unittest.TestCase):
+    """追いかけてきたモンスターがプレイヤーのマスに入る"""
+
+    def test_combat_starts_once(self):
+        events = ListSink()
+        player, game_map, monsters, rng = _one_monster_game(events)
+        monster = next(iter(monsters))
+        ai = MonsterAI(game_map, random.Random(0))
+        session = GameSession(player, game_map, monsters, rng, ai=ai)
+        # 壁にぶつかってその場にとどまり、モンスターが来るのを待つ
+        for _ in range(10):
+            if session.mode != GameSession.MODE_EXPLORE:
+                break
+            session.handle("w")
+        self.assertEqual(session.mode, GameSession.MODE_COMBAT)
+        self.assertEqual((monster.x, monster.y), (0, 0))
+        # 決着がつくまで戦う (戦闘中はモンスターは動かない)
+        while session.mode == GameSession.MODE_COMBAT:
+            session.handle("a")
+        encounters = [e for e in events.drain() if isinstance(e, Encounter)]
+        self.assertEqual(len(encounters), 1)
+        self.assertEqual(encounters[0].name, monster.name)
+
+
+class SaveTest(unittest.TestCase):
+    """動いたモンスターの下のセルの説明文はセーブをまたいでも戻る"""
+
+    def test_description_under_monster(self):
+        # (3, 0) のモンスターは (0, 0) で待つプレイヤーへ (2, 0)・(1, 0) と 1 歩ずつ来る
+        player, game_map, monsters, rng = _one_monster_game(ListSink(), monster_coord=(3, 0))
+        chest = "空っぽの宝箱がある。"
+        game_map[(2, 0)] = MapCell(chest, None, None)
+        monster = next(iter(monsters))
+        ai = MonsterAI(game_map, random.Random(0))
+        session = GameSession(player, game_map, monsters, rng, ai=ai)
+        session.handle("w")
+        self.assertEqual(game_map[(2, 0)].monster.handle, monster.handle)
+        self.assertNotEqual(game_map[(2, 0)].description, chest)
+        self.assertEqual(list(session.monster_under), [monster.handle])
+        self.assertEqual(game_map.descriptions[session.monster_under[monster.handle]], chest)
+
+        fd, path = tempfile.mkstemp()
+        os.close(fd)
+        try:
+            save_game(path, session)
+            loaded = load_game(path, use_mmap=False)
+        finally:
+            os.remove(path)
+        self.assertEqual(loaded.monster_under, session.monster_under)
+        # treasure_hunter.py の --load と同じく、読んだ dict を MonsterAI に渡して続ける
+        loaded.ai = MonsterAI(loaded.game_map, random.Random(0), under=loaded.monster_under)
+        for s in (session, loaded):
+            s.handle("w")
+            self.assertEqual(s.game_map[(2, 0)], MapCell(chest, None, None))
+            self.assertEqual(s.game_map[(1, 0)].monster.handle, monster.handle)
+            self.assertEqual(s.monster_under, {})
+            self.assertEqual(s.mode, GameSession.MODE_EXPLORE)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,151 @@
+import random
+import unittest
+
+from treasure_hunter_engine import MapCell, populate, setup_game
+from treasure_hunter_fov import _OCTANTS, FieldOfView
+
+
+def _reference(game_map, cx, cy, radius):
+    """1 セルずつ調べる素直な再帰シャドウキャスティングで、見えるセルの番号の集合を返す"""
+    width = game_map.width
+    height = game_map.height
+    monster_ids = game_map.monster_ids
+    r2 = radius * (radius + 1)
+    cells = {cy * width + cx}
+
+    def cast(row, start, end, xx, xy, yx, yy):
+        if start < end:
+            return
+        new_start = start
+        for j in range(row, radius + 1):
+            dx = -j - 1
+            dy = -j
+            blocked = False
+            while dx <= 0:
+                dx += 1
+                left = (dx - 0.5) / (dy + 0.5)
+                right = (dx + 0.5) / (dy - 0.5)
+                if start < right:
+                    continue
+                if end > left:
+                    break
+                mx = cx + dx * xx + dy * xy
+                my = cy + dx * yx + dy * yy
+                if 0 <= mx < width and 0 <= my < height:
+                    i = my * width + mx
+                    if dx * dx + dy * dy <= r2:
+                        cells.add(i)
+                    opaque = monster_ids[i] != 0
+                else:
+                    opaque = True
+                if blocked:
+                    if opaque:
+                        new_start = right
+                    else:
+                        blocked = False
+                        start = new_start
+                elif opaque and j < radius:
+                    blocked = True
+                    cast(j + 1, start, left, xx, xy, yx, yy)
+                    new_start = right
+            if blocked:
+                break
+
+    for octant in _OCTANTS:
+        cast(1, 1.0, 0.0, *octant)
+    return cells
+
+
+def _random_map(rng, width, height, density):
+    _, game_map, monsters = setup_game(verbose=False, width=width, height=height,
+                                       num_treasures=0, num_monsters=0, rng=rng)
+    coords = [(x, y) for y in range(height) for x in range(width)]
+    populate(game_map, monsters, [], rng.sample(coords, int(len(coords) * density)), None, rng)
+    return game_map, monsters
+
+
+class ShadowcastTest(unittest.TestCase):
+    """FieldOfView の視界は、1 セルずつの再帰シャドウキャスティングと同じ"""
+
+    def assert_matches(self, fov, x, y):
+        expected = _reference(fov.game_map, x, y, fov.radius)
+        self.assertEqual(fov.visible_cells, expected)
+        for i in range(fov.game_map.width * fov.game_map.height):
+            self.assertEqual(fov.is_visible(i % fov.game_map.width, i // fov.game_map.width),
+                             i in expected)
+
+    def test_random_boards(self):
+        rng = random.Random(0)
+        for _ in range(150):
+            width, height = rng.randint(1, 24), rng.randint(1, 24)
+            game_map, _ = _random_map(rng, width, height, rng.choice((0.0, 0.05, 0.2, 0.5)))
+            fov = FieldOfView(game_map, rng.randint(1, 10))
+            x, y = rng.randrange(width), rng.randrange(height)
+            fov.update(x, y)
+            self.assert_matches(fov, x, y)
+
+    def test_moving_and_removed_monsters(self):
+        # プレイヤーが動かずにモンスターだけ動いたときは、その八分円だけ作り直す
+        rng = random.Random(1)
+        partial_updates = 0
+        for _ in range(12):
+            size = rng.randint(8, 30)
+            game_map, monsters = _random_map(rng, size, size, rng.choice((0.05, 0.15, 0.3)))
+            fov = FieldOfView(game_map, rng.randint(2, 8))
+            x, y = size // 2, size // 2
+            fov.update(x, y)
+            for _ in range(80):
+                r = rng.random()
+                if r < 0.3:
+                    dx, dy = rng.choice(((1, 0), (-1, 0), (0, 1), (0, -1)))
+                    if 0 <= x + dx < size and 0 <= y + dy < size:
+                        x, y = x + dx, y + dy
+                elif r < 0.8:
+                    # モンスターを隣のセルへ動かす
+                    for monster in rng.sample(list(monsters), min(3, len(monsters))):
+                        nx = monster.x + rng.choice((-1, 0, 1))
+                        ny = monster.y + rng.choice((-1, 0, 1))
+                        if not game_map.in_bounds(nx, ny) or (nx, ny) == (x, y) or \
+                                game_map[(nx, ny)].monster or game_map[(nx, ny)].item:
+                            continue
+                        game_map[(monster.x, monster.y)] = MapCell("何もない空間だ。", None, None)
+                        monster.x, monster.y = nx, ny
+                        game_map[(nx, ny)] = MapCell("", None, monster)
+                elif monsters:
+                    # 倒されていなくなる
+                    monster = rng.choice(list(monsters))
+                    game_map[(monster.x, monster.y)] = MapCell("残骸", None, None)
+                    monsters.remove(monster)
+                before = set(fov.visible_cells)
+                changed = fov.update(x, y)
+                self.assert_matches(fov, x, y)
+                self.assertEqual(set(changed), before ^ fov.visible_cells)
+            partial_updates += fov.partial_updates
+            fov.detach()
+        self.assertGreater(partial_updates, 0)
+
+    def test_octants_of(self):
+        # 何もないマップでは、八分円 k の見えるセル i について k in _octants_of([i])
+        game_map, _ = _random_map(random.Random(2), 21, 21, 0.0)
+        fov = FieldOfView(game_map, 8)
+        fov.update(10, 10)
+        owners = {}
+        for k, octant in enumerate(_OCTANTS):
+            cells, opaque = fov._shadowcast(10, 10, octant)
+            self.assertEqual(opaque, set())
+            for i in cells:
+                owners.setdefault(i, set()).add(k)
+        self.assertEqual(set(owners) | {10 * 21 + 10}, fov.visible_cells)
+        for i, octants in owners.items():
+            self.assertEqual(fov._octants_of([i]), octants)
+
+    def test_monsters_do_not_block(self):
+        game_map, _ = _random_map(random.Random(3), 15, 15, 0.3)
+        fov = FieldOfView(game_map, 5, monsters_block=False)
+        fov.update(7, 7)
+        empty_map, _ = _random_map(random.Random(3), 15, 15, 0.0)
+        self.assertEqual(fov.visible_cells, _reference(empty_map, 7, 7, 5))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,161 @@
+import heapq
+import random
+import unittest
+from array import array
+from collections import deque
+
+from treasure_hunter_engine import ITEMS, MONSTER_TYPES, MapCell, setup_game
+from treasure_hunter_path import (FLOOR_COST, INF, MONSTER_COST, NEIGHBORS, DistanceField,
+                                  find_path)
+
+
+def _dijkstra(width, height, costs, start):
+    """start から各セルまでの最小コスト (隣のセル n に入るコストは costs[n])"""
+    dist = [INF] * (width * height)
+    dist[start] = 0
+    heap = [(0, start)]
+    while heap:
+        d, i = heapq.heappop(heap)
+        if d > dist[i]:
+            continue
+        x, y = i % width, i // width
+        for dx, dy in NEIGHBORS:
+            nx, ny = x + dx, y + dy
+            if 0 <= nx < width and 0 <= ny < height:
+                n = ny * width + nx
+                if d + costs[n] < dist[n]:
+                    dist[n] = d + costs[n]
+                    heapq.heappush(heap, (dist[n], n))
+    return dist
+
+
+def _bfs(width, height, start):
+    """コストがすべて 1 のときの start から各セルまでの歩数"""
+    dist = [INF] * (width * height)
+    dist[start] = 0
+    queue = deque([start])
+    while queue:
+        i = queue.popleft()
+        x, y = i % width, i // width
+        for dx, dy in NEIGHBORS:
+            nx, ny = x + dx, y + dy
+            n = ny * width + nx
+            if 0 <= nx < width and 0 <= ny < height and dist[n] == INF:
+                dist[n] = dist[i] + 1
+                queue.append(n)
+    return dist
+
+
+class RepairTest(unittest.TestCase):
+    """ゴールやコストを変えたあとの距離の場は、作り直したものと同じ"""
+
+    def assert_fresh(self, field, fresh):
+        self.assertEqual(list(field.dist), list(fresh.dist))
+        # next_step() はコストの分だけ距離の縮む隣を指す
+        for i, d in enumerate(field.dist):
+            coord = (i % field.width, i // field.width)
+            step = field.next_step(coord)
+            if d == 0 or d == INF:
+                self.assertIsNone(step)
+            else:
+                n = (coord[1] + step[1]) * field.width + coord[0] + step[0]
+                self.assertEqual(field.dist[n] + field.costs[n], d)
+
+    def test_map_changes(self):
+        # ゲームと同じ手順で宝箱・モンスターを増やしたり消したりする
+        potion = ITEMS["ポーション"]
+        for seed in range(20):
+            rng = random.Random(seed)
+            width, height = rng.randint(2, 12), rng.randint(2, 12)
+            _, game_map, monsters = setup_game(
+                verbose=False, width=width, height=height,
+                num_treasures=rng.randint(0, width * height // 4),
+                num_monsters=rng.randint(0, width * height // 4), rng=rng)
+            field = DistanceField.from_map(game_map)
+            for _ in range(60):
+                coord = (rng.randrange(width), rng.randrange(height))
+                cell = game_map[coord]
+                if cell.item:
+                    game_map[coord] = cell._replace(item=None)
+                    field.remove_goal(coord)
+                elif cell.monster:
+                    monsters.remove(cell.monster)
+                    game_map[coord] = cell._replace(monster=None)
+                    field.set_cost(coord, FLOOR_COST)
+                elif rng.random() < 0.5:
+                    game_map[coord] = MapCell("宝箱がある！", potion, None)
+                    field.add_goal(coord)
+                else:
+                    name, hp, atk = rng.choice(MONSTER_TYPES)
+                    monster = monsters.add(name, hp, atk, coord[0], coord[1])
+                    game_map[coord] = MapCell("", None, monster)
+                    field.set_cost(coord, MONSTER_COST)
+                self.assert_fresh(field, DistanceField.from_map(game_map))
+
+    def test_cost_changes(self):
+        # コストはマップにない値にも変えられる
+        for seed in range(20):
+            rng = random.Random(seed)
+            width, height = rng.randint(1, 10), rng.randint(1, 10)
+            size = width * height
+            costs = array("B", [rng.randint(1, 9) for _ in range(size)])
+            goals = set(rng.sample(range(size), rng.randint(0, 3)))
+            field = DistanceField(width, height, goals, array("B", costs))
+            for _ in range(60):
+                i = rng.randrange(size)
+                coord = (i % width, i // width)
+                r = rng.random()
+                if r < 0.2:
+                    goals.add(i)
+                    field.add_goal(coord)
+                elif r < 0.4:
+                    goals.discard(i)
+                    field.remove_goal(coord)
+                else:
+                    costs[i] = rng.randint(1, 9)
+                    field.set_cost(coord, costs[i])
+                self.assert_fresh(field, DistanceField(width, height, goals, array("B", costs)))
+
+
+class FindPathTest(unittest.TestCase):
+    """A* の経路はつながっていて、コストは最小"""
+
+    def check(self, width, height, costs, start, goal, expected):
+        path = find_path(width, height, costs, start, goal)
+        if start == goal:
+            self.assertEqual(path, [])
+            return
+        self.assertEqual(path[-1], goal)
+        x, y = start
+        total = 0
+        for nx, ny in path:
+            self.assertEqual(abs(nx - x) + abs(ny - y), 1)
+            self.assertTrue(0 <= nx < width and 0 <= ny < height)
+            total += costs[ny * width + nx]
+            x, y = nx, ny
+        self.assertEqual(total, expected)
+
+    def test_uniform_cost(self):
+        rng = random.Random(0)
+        for _ in range(200):
+            width, height = rng.randint(1, 15), rng.randint(1, 15)
+            start = (rng.randrange(width), rng.randrange(height))
+            goal = (rng.randrange(width), rng.randrange(height))
+            dist = _bfs(width, height, start[1] * width + start[0])
+            self.check(width, height, [FLOOR_COST] * (width * height), start, goal,
+                       dist[goal[1] * width + goal[0]])
+
+    def test_monster_cost(self):
+        rng = random.Random(1)
+        for _ in range(200):
+            width, height = rng.randint(1, 15), rng.randint(1, 15)
+            costs = [MONSTER_COST if rng.random() < 0.3 else FLOOR_COST
+                     for _ in range(width * height)]
+            start = (rng.randrange(width), rng.randrange(height))
+            goal = (rng.randrange(width), rng.randrange(height))
+            dist = _dijkstra(width, height, costs, start[1] * width + start[0])
+            self.check(width, height, costs, start, goal, dist[goal[1] * width + goal[0]])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,140 @@
+import os
+import random
+import struct
+import tempfile
+import unittest
+from unittest import mock
+
+import treasure_hunter_save
+from treasure_hunter_engine import GameSession, populate, setup_game
+from treasure_hunter_events import ListSink
+from treasure_hunter_save import HEADER, load_game, save_game
+
+
+def _new_session(seed=0):
+    """5x5 のマップで、プレイヤーのすぐ右 (1, 0) にモンスターがいるゲーム"""
+    rng = random.Random(seed)
+    player, game_map, monsters = setup_game(verbose=False, width=5, height=5,
+                                            num_treasures=4, num_monsters=0,
+                                            events=ListSink(), rng=rng)
+    populate(game_map, monsters, [], [(1, 0)], None, rng)
+    player.inventory[player.registry.item_ids["ポーション"]] = 2
+    return GameSession(player, game_map, monsters, rng)
+
+
+def _snapshot(session):
+    """セーブデータに残るはずの状態をまとめて比べられる形にする"""
+    player = session.player
+    game_map = session.game_map
+    cells = []
+    for y in range(game_map.height):
+        for x in range(game_map.width):
+            cell = game_map[(x, y)]
+            monster = cell.monster
+            cells.append((cell.description, cell.item,
+                          monster and (monster.name, monster.hp, monster.x, monster.y)))
+    monster = session.monster
+    return {
+        "player": (player.x, player.y, player.hp, player.max_hp, player.atk),
+        "inventory": player.named_inventory(),
+        "mode": (session.mode, session.item_return_mode, session.outcome, session.turns),
+        "monster": monster and (monster.name, monster.hp, monster.x, monster.y),
+        "monsters": sorted((m.name, m.hp, m.x, m.y) for m in session.monsters),
+        "under": dict(session.monster_under),
+        "rng": session.rng.getstate(),
+        "cells": cells,
+    }
+
+
+class RoundTripTest(unittest.TestCase):
+    """保存して読み込んだゲームは、元のゲームと同じ状態で同じように進む"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "game.sav")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def round_trip(self, session, use_mmap):
+        save_game(self.path, session)
+        return load_game(self.path, use_mmap=use_mmap)
+
+    def assert_same_game(self, session, loaded, commands):
+        self.assertEqual(_snapshot(loaded), _snapshot(session))
+        for command in commands:
+            session.handle(command)
+            loaded.handle(command)
+            self.assertEqual(_snapshot(loaded), _snapshot(session))
+
+    def test_explore(self):
+        for use_mmap in (False, True):
+            with self.subTest(use_mmap=use_mmap):
+                session = _new_session()
+                for command in "sdsd":
+                    session.handle(command)
+                loaded = self.round_trip(session, use_mmap)
+                self.assert_same_game(session, loaded, "dwwaass")
+
+    def test_combat_and_item_mode(self):
+        for use_mmap in (False, True):
+            with self.subTest(use_mmap=use_mmap):
+                session = _new_session()
+                session.handle("d")
+                self.assertEqual(session.mode, GameSession.MODE_COMBAT)
+                loaded = self.round_trip(session, use_mmap)
+                self.assert_same_game(session, loaded, ["a", "i"])
+                self.assertEqual(loaded.mode, GameSession.MODE_ITEM)
+
+                loaded = self.round_trip(session, use_mmap)
+                self.assertEqual(loaded.item_return_mode, GameSession.MODE_COMBAT)
+                self.assert_same_game(session, loaded, ["ポーション", "a", "a", "a"])
+
+    def test_version_1(self):
+        session = _new_session()
+        handle = next(iter(session.monsters)).handle
+        session.monster_under[handle] = 0
+        save_game(self.path, session)
+        self.assertEqual(load_game(self.path).monster_under, {handle: 0})
+
+        # バージョン 1 はモンスターの下のセルの表を持たない (あっても読まない)
+        with open(self.path, "r+b") as f:
+            f.seek(4)
+            f.write(struct.pack("<H", 1))
+        loaded = load_game(self.path)
+        self.assertEqual(loaded.monster_under, {})
+        session.monster_under.clear()
+        self.assertEqual(_snapshot(loaded), _snapshot(session))
+
+    def test_truncated(self):
+        session = _new_session()
+        save_game(self.path, session)
+        with open(self.path, "rb") as f:
+            data = f.read()
+        cells_offset = HEADER.unpack_from(data)[-1]
+        for length in (0, 3, HEADER.size, cells_offset, len(data) - 1):
+            with self.subTest(length=length):
+                with open(self.path, "wb") as f:
+                    f.write(data[:length])
+                with self.assertRaises(ValueError):
+                    load_game(self.path)
+
+    def test_not_a_save(self):
+        with open(self.path, "wb") as f:
+            f.write(b"\0" * 64)
+        with self.assertRaises(ValueError):
+            load_game(self.path)
+
+    def test_byte_swap(self):
+        # ビッグエンディアンの環境と同じく、配列のバイト順を入れ替えて書いて読む
+        with mock.patch.object(treasure_hunter_save, "SWAP_BYTES", True):
+            for use_mmap in (False, True):
+                with self.subTest(use_mmap=use_mmap):
+                    session = _new_session()
+                    session.handle("s")
+                    loaded = self.round_trip(session, use_mmap)
+                    self.assert_same_game(session, loaded, "dds")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,33 @@
+import random
+import unittest
+
+from treasure_hunter_placement import PlacementError
+from treasure_hunter_sim import (ORB_CODE, OUTCOME_WIN, GreedyPolicy, generate_world,
+                                 run_games)
+
+
+class TinyMapTest(unittest.TestCase):
+    """オーブを置ける遠いセルがほとんどない小さいマップ"""
+
+    def test_far_cells_all_taken(self):
+        # 3x3 に宝箱 2・モンスター 1: 遠いセルが埋まることがある (以前は止まらなかった)
+        for seed in range(200):
+            state = generate_world(random.Random(seed), 3, 3, 2, 1)
+            self.assertEqual(state.cells[state.orb], ORB_CODE)
+            self.assertNotEqual(state.orb, 0)
+            self.assertEqual(sum(1 for code in state.cells if code > 0), 3)
+            self.assertEqual(sum(1 for code in state.cells if code < 0), 1)
+
+    def test_no_far_cell(self):
+        with self.assertRaises(PlacementError):
+            generate_world(random.Random(0), 2, 1, 0, 0)
+
+    def test_run_games(self):
+        results = run_games(GreedyPolicy(), 100, seed=0, width=3, height=3,
+                            num_treasures=2, num_monsters=1)
+        self.assertEqual(len(results), 100)
+        self.assertTrue(any(r.outcome == OUTCOME_WIN for r in results))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,32 @@
+import unittest
+
+from treasure_hunter_placement import PlacementError
+from treasure_hunter_sweep import grid, sweep
+
+
+class GridTest(unittest.TestCase):
+    """置けない設定は回し始める前にわかる"""
+
+    def test_too_many_entities(self):
+        with self.assertRaises(PlacementError) as cm:
+            grid({"monsters": [0, 200, 300]})
+        message = str(cm.exception)
+        self.assertIn("monsters=200", message)
+        self.assertIn("monsters=300", message)
+        self.assertNotIn("monsters=0:", message)
+
+    def test_no_run_before_error(self):
+        finished = []
+        with self.assertRaises(PlacementError):
+            sweep({"monsters": [0, 200]}, progress=finished.append, max_games=50)
+        self.assertEqual(finished, [])
+
+    def test_map_size(self):
+        # 既定の 5x5 には置けなくても、広いマップなら置ける
+        self.assertEqual(len(grid({"monsters": [30]}, width=10, height=10)), 1)
+        with self.assertRaises(PlacementError):
+            grid({"hp": [30]}, width=2, height=1)
+
+
+if __name__ == "__main__":
+    unittest.main()
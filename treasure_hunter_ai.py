@@ -0,0 +1,304 @@
+import heapq
+import random
+from array import array
+
+from treasure_hunter_grid import GridMap, KIND_EMPTY
+from treasure_hunter_registry import REGISTRY
+from treasure_hunter_spatial import SpatialIndex
+
+# --- モンスターの行動 ---
+# モンスターはプレイヤーが踏むまで待っているだけでなく、ターンごとに動く。
+#   プレイヤーから aggro_radius 以内: 毎ターン 1 歩追いかける (HP が最大の flee_fraction
+#                                     以下なら逃げる)。プレイヤーのマスに入ると戦闘になる
+#   それより遠い: wander_period ターンに 1 回、ランダムな方向へ 1 歩うろつく
+# 距離はチェビシェフ距離。モンスターは何もないセル (アイテムもモンスターもない) にだけ入れる。
+#
+# どのモンスターがいつ動くかは (動くターン, handle) のヒープで決め、1 ターンに調べるのは
+# ヒープの先頭の、そのターンが番のモンスターだけ。番を変えるときは新しい組を積み、
+# 古い組は取り出したときに due と合わないので捨てる (ヒープの中を探して消さない)。
+#
+# プレイヤーから wake_radius より遠いモンスターは、番が来たときに眠らせて (ヒープに戻さない)、
+# プレイヤーが近づいたら起こす。プレイヤーは 1 ターンに 1 マスしか動かないので、
+# 起こすために見るのは wake_radius の正方形に新しく入った辺 (2 * wake_radius + 1 セル) だけでよい。
+# 範囲の中のモンスターは SpatialIndex で探す (セルを 1 つずつは見ない)。
+# なので 1 ターンの手間はプレイヤーの周りのモンスターの数で決まり、マップ全体の数にはよらない。
+#
+# 遠くのモンスターは、プレイヤーが aggro_radius に入ってくるまで少なくとも
+# (距離 - aggro_radius) ターンかかるので、番をそれより先にはしない
+# (近づいてきたプレイヤーに気づくのが遅れない)。
+
+DEFAULT_AGGRO_RADIUS = 5
+DEFAULT_WAKE_RADIUS = 16
+DEFAULT_WANDER_PERIOD = (2, 6) # うろつくモンスターが何ターンに 1 回動くか (この範囲から選ぶ)
+DEFAULT_FLEE_FRACTION = 1 / 3
+
+MONSTER_DESCRIPTION = "{} が待ち構えている！" # populate() と同じ
+
+STEPS = ((0, -1), (0, 1), (-1, 0), (1, 0))
+ASLEEP = -1 # due の値: 眠っている (ヒープにいない)
+
+
+class MonsterAI:
+    """GridMap (monster_store つき) のモンスターをターンごとに動かす
+
+    GameSession(ai=...) に渡すと、プレイヤーが動くたびに take_turn() が呼ばれる。
+    wake_radius=None なら全員をずっと起こしておく (眠らせない)。
+    index はマップの SpatialIndex (省略すると作る)。
+    under はモンスターの下のセルの説明文番号の dict (handle -> 番号)。
+    load_game() で読んだ GameSession.monster_under を渡すと、保存したときの続きになる
+    (渡した dict をそのまま書き換える)。
+    """
+
+    def __init__(self, game_map, rng=random, aggro_radius=DEFAULT_AGGRO_RADIUS,
+                 wake_radius=DEFAULT_WAKE_RADIUS, wander_period=DEFAULT_WANDER_PERIOD,
+                 flee_fraction=DEFAULT_FLEE_FRACTION, registry=REGISTRY, index=None,
+                 under=None):
+        if not isinstance(game_map, GridMap) or game_map.monster_store is None:
+            raise ValueError("MonsterAI は MonsterStore を持つ GridMap でしか使えません")
+        if wake_radius is not None and wake_radius <= aggro_radius:
+            raise ValueError("wake_radius は aggro_radius より大きくしてください")
+        self.game_map = game_map
+        self.store = game_map.monster_store
+        self.rng = rng
+        self.aggro_radius = aggro_radius
+        self.wake_radius = wake_radius
+        self.wander_period = wander_period
+        self.flee_fraction = flee_fraction
+        self.registry = registry
+        self.index = index if index is not None else SpatialIndex(game_map)
+
+        self.turn = 0
+        self.due = array("q") # handle -> 次に動くターン (ASLEEP なら眠っている)
+        self.queue = [] # (ターン, handle) のヒープ。due と合わない組は古い
+        # handle -> モンスターの下のセルの説明文番号 (既定の説明文でないときだけ)
+        self.under = under if under is not None else {}
+        self.last_position = None # 前のターンのプレイヤーの位置
+        self._types = [] # store の種類番号 -> (最大 HP, モンスターのいるセルの説明文)
+
+        self.nearby = 0 # 直前のターンに aggro_radius 以内で動いた (追いかけた・逃げた) 数
+        self.acted = 0 # 番が来た回数の合計
+        self.moved = 0 # 実際に動いた回数の合計
+
+    def awake_count(self):
+        """起きているモンスターの数 (統計用。全員を数えるので O(モンスター数))"""
+        slots = self.store.slots
+        return sum(1 for handle, due in enumerate(self.due) if due != ASLEEP and slots[handle] >= 0)
+
+    def _type(self, type_id):
+        types = self._types
+        store = self.store
+        while len(types) <= type_id:
+            name = store.type_names[len(types)]
+            kind = self.registry.monster_ids.get(name)
+            max_hp = self.registry.monster_hp[kind] if kind is not None else 0
+            types.append((max_hp, MONSTER_DESCRIPTION.format(name)))
+        return types[type_id]
+
+    # --- 番の管理 ---
+
+    def _schedule(self, handle, turn):
+        self.due[handle] = turn
+        heapq.heappush(self.queue, (turn, handle))
+
+    def _delay(self, d):
+        """プレイヤーから距離 d のモンスターが、次に動くまでのターン数"""
+        if d <= self.aggro_radius:
+            return 1
+        lo, hi = self.wander_period
+        # randint() より速い (1 ターンに何万回も呼ぶので)
+        return min(lo + int(self.rng.random() * (hi - lo + 1)), d - self.aggro_radius)
+
+    def _notice(self, handle, x, y, px, py):
+        """(x, y) のモンスターを起こす (起きていても、今の番より早く動くべきなら早める)"""
+        d = max(abs(x - px), abs(y - py))
+        turn = self.turn if d <= self.aggro_radius else self.turn + self._delay(d)
+        due = self.due[handle]
+        if due == ASLEEP or due > turn:
+            self._schedule(handle, turn)
+
+    def _scan(self, x0, y0, x1, y1, px, py):
+        """矩形 (両端を含む) の中のモンスターを _notice() する"""
+        game_map = self.game_map
+        width = game_map.width
+        monster_ids = game_map.monster_ids
+        for x, y in self.index.monsters_in(x0, y0, x1, y1):
+            self._notice(monster_ids[y * width + x] - 1, x, y, px, py)
+
+    def _wake_around(self, px, py):
+        """プレイヤーの動きに合わせて、近くに来たモンスターを起こす"""
+        last = self.last_position
+        self.last_position = (px, py)
+        if last is None and self.wake_radius is None:
+            store = self.store
+            for slot, handle in enumerate(store.handles):
+                self._notice(handle, store.xs[slot], store.ys[slot], px, py)
+            return
+        if last is None or abs(px - last[0]) + abs(py - last[1]) > 1:
+            # 最初のターンか、ワープした (セーブデータから再開したときなど): 正方形を全部見る。
+            # 起きているモンスターの番は前の位置で決めたものなので、aggro_radius +
+            # wander_period の最大 (それより遠ければ今の番のままで間に合う) までは見直す
+            reach = max(self.wake_radius or 0, self.aggro_radius + self.wander_period[1])
+            self._scan(px - reach, py - reach, px + reach, py + reach, px, py)
+        elif self.wake_radius is not None and (px, py) != last:
+            # 1 歩動いた: 正方形の進んだ側の辺だけが新しい
+            reach = self.wake_radius
+            dx, dy = px - last[0], py - last[1]
+            if dx:
+                edge = px + dx * reach
+                self._scan(edge, py - reach, edge, py + reach, px, py)
+            else:
+                edge = py + dy * reach
+                self._scan(px - reach, edge, px + reach, edge, px, py)
+
+    # --- 1 ターン ---
+
+    def take_turn(self, px, py):
+        """プレイヤーが (px, py) にいるターンに、番の来たモンスターを動かす
+
+        動いたモンスターの (元の座標, 新しい座標) のリストを返す。
+        """
+        self.turn += 1
+        self.nearby = 0
+        turn = self.turn
+        store = self.store
+        slots = store.slots
+        if len(self.due) < len(slots):
+            self.due.extend([ASLEEP] * (len(slots) - len(self.due)))
+        self._wake_around(px, py)
+
+        moves = []
+        queue = self.queue
+        due = self.due
+        while queue and queue[0][0] <= turn:
+            when, handle = heapq.heappop(queue)
+            if due[handle] != when:
+                continue # 番を変えたあとの古い組
+            slot = slots[handle]
+            if slot < 0: # 倒された
+                due[handle] = ASLEEP
+                self.under.pop(handle, None)
+                continue
+            self._act(handle, slot, px, py, moves)
+        return moves
+
+    def _act(self, handle, slot, px, py, moves):
+        """番の来たモンスターを 1 歩動かし、次の番を決める"""
+        store = self.store
+        x, y = store.xs[slot], store.ys[slot]
+        d = max(abs(x - px), abs(y - py))
+        self.acted += 1
+        if self.wake_radius is not None and d > self.wake_radius:
+            self.due[handle] = ASLEEP # プレイヤーが近づいたら _wake_around() で起きる
+            return
+        if d <= self.aggro_radius:
+            self.nearby += 1
+            max_hp, _ = self._type(store.type_ids[handle])
+            if store.hp[slot] <= max_hp * self.flee_fraction:
+                step = self._flee_step(x, y, px, py)
+            else:
+                step = self._chase_step(x, y, px, py)
+        else:
+            step = self._wander_step(x, y, px, py)
+        if step is not None:
+            nx, ny = step
+            self._move(handle, slot, x, y, nx, ny)
+            moves.append(((x, y), (nx, ny)))
+            d = max(abs(nx - px), abs(ny - py))
+        self._schedule(handle, self.turn + self._delay(d))
+
+    # --- 動き方 ---
+
+    def _open(self, x, y):
+        """モンスターが (x, y) に入れるか (マップ内の、アイテムもモンスターもないセル)"""
+        game_map = self.game_map
+        return (0 <= x < game_map.width and 0 <= y < game_map.height
+                and game_map.kinds[y * game_map.width + x] == KIND_EMPTY)
+
+    def _chase_step(self, x, y, px, py):
+        """プレイヤーへのマンハッタン距離がいちばん縮む 1 歩 (縮まなければ None)"""
+        best = None
+        best_d = abs(px - x) + abs(py - y)
+        for dx, dy in STEPS:
+            nx, ny = x + dx, y + dy
+            d = abs(px - nx) + abs(py - ny)
+            if d < best_d and self._open(nx, ny):
+                best, best_d = (nx, ny), d
+        return best
+
+    def _flee_step(self, x, y, px, py):
+        """プレイヤーへのマンハッタン距離がいちばん開く 1 歩 (開かなければ None)"""
+        best = None
+        best_d = abs(px - x) + abs(py - y)
+        for dx, dy in STEPS:
+            nx, ny = x + dx, y + dy
+            d = abs(px - nx) + abs(py - ny)
+            if d > best_d and self._open(nx, ny):
+                best, best_d = (nx, ny), d
+        return best
+
+    def _wander_step(self, x, y, px, py):
+        """ランダムな方向への 1 歩 (入れなければ None)"""
+        dx, dy = STEPS[int(self.rng.random() * 4)]
+        nx, ny = x + dx, y + dy
+        if (nx, ny) != (px, py) and self._open(nx, ny):
+            return nx, ny
+        return None
+
+    def _move(self, handle, slot, x, y, nx, ny):
+        """モンスターを (x, y) から (nx, ny) へ移す (マップのセルとストアの座標の両方)"""
+        game_map = self.game_map
+        store = self.store
+        cell_type = game_map.cell_type
+        # 元のセルは、モンスターが来る前の説明文に戻す
+        under = game_map.description_ids[ny * game_map.width + nx]
+        game_map[(x, y)] = cell_type(game_map.descriptions[self.under.pop(handle, 0)], None, None)
+        if under:
+            self.under[handle] = under
+        _, description = self._type(store.type_ids[handle])
+        game_map[(nx, ny)] = cell_type(description, None, store.view(handle))
+        store.xs[slot] = nx
+        store.ys[slot] = ny
+        self.moved += 1
+
+
+if __name__ == "__main__":
+    import time
+    from treasure_hunter_engine import setup_game
+
+    def walk(ai, game_map, turns, seed=0):
+        """プレイヤーをマップの中央からランダムに歩かせ、1 ターンの平均時間 (秒) を返す"""
+        rng = random.Random(seed)
+        x, y = game_map.width // 2, game_map.height // 2
+        start = time.perf_counter()
+        for _ in range(turns):
+            dx, dy = rng.choice(STEPS)
+            if game_map.in_bounds(x + dx, y + dy):
+                x, y = x + dx, y + dy
+            ai.take_turn(x, y)
+        return (time.perf_counter() - start) / turns
+
+    # 密度 (1 セルあたり 0.1 体) をそろえてモンスターの数を増やす
+    turns = 200
+    print(f"{'モンスター':>10} {'マップ':>10} {'起きている範囲だけ':>18} {'全員を起こしたまま':>18}")
+    for n, side in ((1_000, 100), (10_000, 316), (100_000, 1000)):
+        per_turn = []
+        for wake_radius in (DEFAULT_WAKE_RADIUS, None):
+            _, game_map, monsters = setup_game(verbose=False, width=side, height=side,
+                                               num_treasures=n // 5, num_monsters=n,
+                                               rng=random.Random(0))
+            ai = MonsterAI(game_map, random.Random(0), wake_radius=wake_radius)
+            t = walk(ai, game_map, turns if wake_radius else 20)
+            per_turn.append(f"{t * 1e6:>8.0f} µs/ターン ({ai.acted / (turns if wake_radius else 20):>5.0f} 体)")
+        print(f"{n:>10} {f'{side}x{side}':>10} {per_turn[0]:>18} {per_turn[1]:>18}")
+    print("(かっこの中は 1 ターンに番が来たモンスターの数の平均)")
+
+    # スケジューラの処理量: 100k 体を全員起こしたまま
+    _, game_map, monsters = setup_game(verbose=False, width=1000, height=1000,
+                                       num_treasures=20_000, num_monsters=100_000,
+                                       rng=random.Random(0))
+    ai = MonsterAI(game_map, random.Random(0), wake_radius=None)
+    start = time.perf_counter()
+    walk(ai, game_map, 50)
+    elapsed = time.perf_counter() - start
+    print(f"\n100000 体を全員起こしたまま 50 ターン: {ai.acted / elapsed:,.0f} 行動/秒 "
+          f"(動いた {ai.moved:,} 回)")
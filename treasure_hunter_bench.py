@@ -0,0 +1,422 @@
+import gc
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+import types
+
+from treasure_hunter_engine import (REGISTRY, INITIAL_PLAYER_HP, INITIAL_PLAYER_ATK, MONSTER_TYPES,
+                                    Item, Player, Monster, setup_game)
+
+# --- ベンチマーク ---
+# ゲームの主な処理の速さを測り、ベースライン (bench_baseline.json) と比べる。
+#   python treasure_hunter_bench.py            測ってベースラインと比べる
+#   python treasure_hunter_bench.py --update   測った結果をベースラインとして保存
+# ベースラインより threshold (既定 25%) 以上遅くなった項目があれば終了コード 1 で終わる。
+# ベースラインは測ったマシンでしか意味がないので、比べるときは同じマシンで更新しておくこと。
+
+BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "bench_baseline.json")
+BASELINE_VERSION = 1
+DEFAULT_THRESHOLD = 0.25
+REPEAT = 7 # 何回測って最小値をとるか
+MIN_RUN_TIME = 0.1 # 1 回の測定でこれ以上の時間がかかるよう、呼ぶ回数を決める (秒)
+
+BENCHMARKS = {} # 名前 -> 測る関数を返す関数
+
+
+def benchmark(name):
+    """ベンチマークを登録するデコレータ
+
+    登録する関数は準備をして、測りたい処理だけをする引数なしの関数を返す。
+    """
+    def register(make):
+        BENCHMARKS[name] = make
+        return make
+    return register
+
+
+def time_callable(fn, repeat=REPEAT, min_run_time=MIN_RUN_TIME):
+    """fn 1 回あたりの時間 (秒、repeat 回測った最小値)
+
+    timeit と同じく、測っているあいだは GC を止めてばらつきを抑える。
+    """
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        return _time_callable(fn, repeat, min_run_time)
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+
+
+def _time_callable(fn, repeat, min_run_time):
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_run_time:
+            break
+        number *= 2 if elapsed == 0 else max(2, int(min_run_time / elapsed) + 1)
+    best = elapsed / number
+    for _ in range(repeat - 1):
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        best = min(best, (time.perf_counter() - start) / number)
+    return best
+
+
+# --- setup_game ---
+
+def _setup(width, height, num_treasures, num_monsters):
+    def run():
+        setup_game(verbose=False, width=width, height=height, num_treasures=num_treasures,
+                   num_monsters=num_monsters, rng=random.Random(0))
+    return run
+
+
+for _name, _size, _density in [("5x5", 5, None), ("64x64/sparse", 64, 0.03),
+                               ("64x64/dense", 64, 0.30), ("256x256/sparse", 256, 0.03),
+                               ("256x256/dense", 256, 0.30)]:
+    if _density is None:
+        benchmark(f"setup_game/{_name}")(lambda: _setup(5, 5, 5, 3))
+    else:
+        # 宝箱 : モンスター = 1 : 2 で、マップの density の割合を埋める
+        _count = int(_size * _size * _density)
+        benchmark(f"setup_game/{_name}")(
+            lambda s=_size, c=_count: _setup(s, s, c // 3, c - c // 3))
+
+
+# --- シミュレーション ---
+
+@benchmark("sim/greedy-5x5-1000-games")
+def _sim_games():
+    # 1000 ゲームの時間。1 ゲームあたり 10µs (1000 ゲームで 10ms) が
+    # treasure_hunter_sim.THROUGHPUT_TARGET (10 万ゲーム/秒)
+    from treasure_hunter_sim import GreedyPolicy, run_games
+    policy = GreedyPolicy()
+
+    def run():
+        run_games(policy, 1000, seed=0)
+    return run
+
+
+# --- オープンワールド ---
+
+@benchmark("world/generate-chunk-16x16")
+def _generate_chunk():
+    from treasure_hunter_world import ChunkedWorld
+    world = ChunkedWorld(0)
+    coords = [(cx, cy) for cx in range(10) for cy in range(10)]
+
+    def run():
+        for cx, cy in coords:
+            world.generate(cx, cy)
+    return run
+
+
+# --- 視界 ---
+
+@benchmark("fov/walk-512x512-radius-16")
+def _fov_walk():
+    from treasure_hunter_fov import FieldOfView
+    _, game_map, _ = setup_game(verbose=False, width=512, height=512, num_treasures=2600,
+                                num_monsters=5200, rng=random.Random(0))
+    fov = FieldOfView(game_map, 16)
+    # 右へ 50 歩、左へ 50 歩 (毎回同じところに戻る)
+    path = [(256 + i, 256) for i in range(50)] + [(306 - i, 256) for i in range(50)]
+
+    def run():
+        for x, y in path:
+            fov.update(x, y)
+    return run
+
+
+# --- モンスターの行動 ---
+
+def _monster_ai(wake_radius):
+    from treasure_hunter_ai import MonsterAI, DEFAULT_WANDER_PERIOD
+    _, game_map, _ = setup_game(verbose=False, width=1000, height=1000, num_treasures=20_000,
+                                num_monsters=100_000, rng=random.Random(0))
+    ai = MonsterAI(game_map, random.Random(0), wake_radius=wake_radius)
+    # 最初の数ターン (起こして番を散らすまで) は 1 ターンの手間が揃わないので測らない
+    for _ in range(DEFAULT_WANDER_PERIOD[1]):
+        ai.take_turn(500, 500)
+    return ai
+
+
+@benchmark("monsters/walk-100k-wake-16")
+def _monsters_walk():
+    ai = _monster_ai(16)
+    # 右へ 50 歩、左へ 50 歩 (毎回同じところに戻る)
+    path = [(501 + i, 500) for i in range(50)] + [(549 - i, 500) for i in range(50)]
+
+    def run():
+        for x, y in path:
+            ai.take_turn(x, y)
+    return run
+
+
+@benchmark("monsters/turn-100k-all-awake")
+def _monsters_all_awake():
+    # 全員を起こしたまま: 1 ターンに約 2 万体の番が来る (スケジューラの処理量)
+    ai = _monster_ai(None)
+
+    def run():
+        ai.take_turn(500, 500)
+    return run
+
+
+# --- 戦闘 ---
+
+@benchmark("combat/1000-rounds")
+def _combat():
+    rng = random.Random(0)
+    name, _, atk = MONSTER_TYPES[0]
+
+    def run():
+        # 倒れないように HP を大きくして、攻撃の往復だけを 1000 回
+        player = Player(0, 0, 10**9, INITIAL_PLAYER_ATK)
+        monster = Monster(name, 10**9, atk, 0, 0)
+        for _ in range(1000):
+            player.attack(monster, rng)
+            monster.attack(player, rng)
+    return run
+
+
+# --- アイテム ---
+
+@benchmark("use_item/10k-kinds-inventory")
+def _use_item():
+    from treasure_hunter_registry import Registry
+    # アイテムが 1 万種類ある表と、それを 1 個ずつ持った持ち物
+    junk = [Item(f"がらくた{i}", "", 0) for i in range(10_000)]
+    registry = Registry(REGISTRY.items + junk, REGISTRY.monster_types, "伝説のオーブ")
+    player = Player(0, 0, INITIAL_PLAYER_HP, INITIAL_PLAYER_ATK, registry=registry)
+    for item_id in range(len(REGISTRY.items), len(registry.items)):
+        player.inventory.add(item_id)
+    item_ids = REGISTRY.consumable_ids
+
+    def run():
+        for item_id in item_ids:
+            player.inventory[item_id] = 300
+        for _ in range(300):
+            for item_id in item_ids:
+                player.use_item(item_id)
+    return run
+
+
+# --- 戦闘の厳密解 ---
+
+@benchmark("solver/type-odds-cold")
+def _solver_cold():
+    import treasure_hunter_solver as solver
+
+    def run():
+        # キャッシュが空の状態から、ポーション 2 個・すごいポーション 1 個で全種類を解く
+        solver.clear_cache()
+        solver.type_odds(INITIAL_PLAYER_HP, INITIAL_PLAYER_ATK, (2, 1))
+    return run
+
+
+# --- GUI (tkinter をスタブに置き換えて描画の手間だけを測る) ---
+
+class StubWidget:
+    """どんな呼び出しも受け付け、create_* には連番の ID を返すウィジェットの代わり"""
+
+    _next_id = 0
+
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def _create(self, *args, **kwargs):
+        StubWidget._next_id += 1
+        return StubWidget._next_id
+
+    create_rectangle = create_text = _create
+
+    def winfo_children(self):
+        return []
+
+    def cget(self, option):
+        return ""
+
+    def after(self, ms, func, *args):
+        return None # アニメーションは進めない (1 フレームで描き終える)
+
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: None
+
+
+def _stub_gui_module():
+    """tkinter をスタブにした treasure_hunter_gui モジュール
+
+    treasure_hunter_gui は tkinter を TreasureHunterGUI を作るときまで読み込まないので、
+    先にスタブを入れておけば tkinter のない環境でも測れる。
+    """
+    import treasure_hunter_gui as gui
+    constants = dict(BOTH="both", LEFT="left", RIGHT="right", X="x", Y="y", W="w", NW="nw",
+                     SUNKEN="sunken", DISABLED="disabled", NORMAL="normal", END="end", WORD="word")
+    gui.tk = types.SimpleNamespace(Frame=StubWidget, Canvas=StubWidget, Label=StubWidget,
+                                   Button=StubWidget, Text=StubWidget, Scrollbar=StubWidget,
+                                   **constants)
+    gui.font = types.SimpleNamespace(nametofont=lambda *args: StubWidget(), Font=StubWidget)
+    gui.messagebox = StubWidget()
+    gui.simpledialog = StubWidget()
+    return gui
+
+
+def _make_gui(size):
+    gui = _stub_gui_module()
+    count = size * size // 10
+    return gui.TreasureHunterGUI(StubWidget(), size, size, count // 3, count - count // 3, seed=0)
+
+
+@benchmark("gui/draw_map/full-repaint-64x64")
+def _draw_map_full():
+    app = _make_gui(64)
+    visible = list(app.map_cells_gui)
+
+    def run():
+        app.mark_dirty(*visible)
+        app.draw_map()
+    return run
+
+
+@benchmark("gui/update_display/64x64")
+def _update_display():
+    app = _make_gui(64)
+    app.current_monster = None
+
+    def run():
+        app.mark_dirty((app.player.x, app.player.y))
+        app.update_display()
+    return run
+
+
+@benchmark("gui/scroll/64x64")
+def _scroll():
+    app = _make_gui(64)
+
+    def run():
+        # 表示範囲を端から端まで 1 セルずつ動かす
+        for x in range(app.map_width):
+            app.player.x = x
+            app.follow_player(smooth=False)
+            app.draw_map()
+    return run
+
+
+# --- 起動時間 (新しいインタープリタでモジュールを import するまで) ---
+# startup/python は何も import しない起動だけの時間なので、差がそのモジュールの import 時間。
+# GUI・CLI・ヘッドレスの処理が、使わないモジュール (tkinter など) を読み込んでいないかを見る。
+
+def _startup(module):
+    code = f"import {module}" if module else "pass"
+    here = os.path.dirname(os.path.abspath(__file__))
+
+    def run():
+        subprocess.run([sys.executable, "-c", code], cwd=here, check=True)
+    return run
+
+
+for _module in [None, "treasure_hunter_engine", "treasure_hunter", "treasure_hunter_gui",
+                "treasure_hunter_tournament", "treasure_hunter_server"]:
+    benchmark(f"startup/{_module or 'python'}")(lambda m=_module: _startup(m))
+
+
+# --- 実行と比較 ---
+
+def run_benchmarks(names=None, progress=None):
+    """名前 -> 1 回あたりの秒数 (準備できなかったものは None)"""
+    results = {}
+    for name, make in BENCHMARKS.items():
+        if names and not any(pattern in name for pattern in names):
+            continue
+        fn = make()
+        results[name] = time_callable(fn) if fn is not None else None
+        if progress is not None:
+            progress(name, results[name])
+    return results
+
+
+def load_baseline(path=BASELINE_FILE):
+    """保存してあるベースライン (なければ空の辞書)"""
+    try:
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+    except FileNotFoundError:
+        return {}
+    if data.get("version") != BASELINE_VERSION:
+        raise ValueError(f"対応していないベースラインのバージョンです: {data.get('version')}")
+    return data["results"]
+
+
+def save_baseline(results, path=BASELINE_FILE):
+    data = {
+        "version": BASELINE_VERSION,
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "results": {name: t for name, t in sorted(results.items()) if t is not None},
+    }
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2, ensure_ascii=False)
+        f.write("\n")
+
+
+def compare(results, baseline, threshold=DEFAULT_THRESHOLD):
+    """(名前, 今回, ベースライン, 比, 遅くなったか) のリスト"""
+    rows = []
+    for name, t in results.items():
+        base = baseline.get(name)
+        ratio = t / base if t is not None and base else None
+        rows.append((name, t, base, ratio, ratio is not None and ratio > 1 + threshold))
+    return rows
+
+
+def _format_time(t):
+    if t is None:
+        return "-"
+    for unit, scale in (("s", 1), ("ms", 1e-3), ("µs", 1e-6)):
+        if t >= scale:
+            return f"{t / scale:.2f}{unit}"
+    return f"{t * 1e9:.0f}ns"
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="ゲームの主な処理の速さを測る")
+    parser.add_argument("names", nargs="*", help="この文字列を含むベンチマークだけを測る")
+    parser.add_argument("--update", action="store_true", help="結果をベースラインとして保存する")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="この割合より遅くなったら失敗にする (0.25 = 25%%)")
+    parser.add_argument("--baseline", default=BASELINE_FILE)
+    args = parser.parse_args()
+
+    results = run_benchmarks(args.names)
+    if args.update:
+        baseline = load_baseline(args.baseline)
+        baseline.update({name: t for name, t in results.items() if t is not None})
+        save_baseline(baseline, args.baseline)
+        for name, t in results.items():
+            print(f"{name:<36} {_format_time(t):>10}")
+        print(f"\n{args.baseline} を更新した。")
+        sys.exit(0)
+
+    baseline = load_baseline(args.baseline)
+    regressions = 0
+    print(f"{'ベンチマーク':<30} {'今回':>10} {'ベース':>10} {'比':>7}")
+    for name, t, base, ratio, regressed in compare(results, baseline, args.threshold):
+        status = "遅くなった!" if regressed else "(スキップ)" if t is None else ""
+        ratio_text = f"{ratio:.2f}x" if ratio is not None else "-"
+        print(f"{name:<36} {_format_time(t):>10} {_format_time(base):>10} {ratio_text:>7} {status}")
+        regressions += regressed
+    if regressions:
+        print(f"\n{regressions} 件がベースラインより {args.threshold:.0%} 以上遅くなった。")
+        sys.exit(1)
@@ -0,0 +1,84 @@
+from collections import namedtuple
+
+import numpy as np
+
+from treasure_hunter_engine import REGISTRY
+
+# --- まとめて戦闘を解決する (NumPy 版) ---
+# Player.attack / Monster.attack と同じルール (ダメージは atk//2 〜 atk) で、
+# 独立した N 回の戦闘を配列演算で一度に進める。
+
+# N 回分の戦闘結果 (どれも長さ N の配列)
+FightResults = namedtuple("FightResults", ["player_won", "turns", "player_hp", "monster_hp"])
+
+# モンスターの種類ごとの HP / ATK (モンスター番号の並び)
+MONSTER_HP = np.array(REGISTRY.monster_hp, dtype=np.int32)
+MONSTER_ATK = np.array(REGISTRY.monster_atk, dtype=np.int32)
+
+DEFAULT_MAX_ROUNDS = 1000
+
+
+def monster_stats(type_ids):
+    """モンスター番号の配列から (HP, ATK) の配列を作る"""
+    type_ids = np.asarray(type_ids)
+    return MONSTER_HP[type_ids], MONSTER_ATK[type_ids]
+
+
+def resolve_fights(player_hp, player_atk, monster_hp, monster_atk, rng=None,
+                   max_rounds=DEFAULT_MAX_ROUNDS):
+    """N 回の「たたかう」だけの戦闘をまとめて解決する
+
+    各ラウンドでプレイヤーが先に攻撃し、モンスターが生き残っていれば反撃する。
+    引数はスカラーでも配列でもよく、長さ N にブロードキャストされる。
+    max_rounds で決着がつかなかった戦闘は player_won=False のまま残る。
+    """
+    if rng is None:
+        rng = np.random.default_rng()
+    player_hp, player_atk, monster_hp, monster_atk = (
+        a.astype(np.int32) for a in
+        np.broadcast_arrays(player_hp, player_atk, monster_hp, monster_atk))
+    n = player_hp.shape[0] if player_hp.ndim else 1
+    player_hp = player_hp.reshape(n)
+    monster_hp = monster_hp.reshape(n)
+    player_atk = player_atk.reshape(n)
+    monster_atk = monster_atk.reshape(n)
+
+    player_won = np.zeros(n, dtype=bool)
+    turns = np.zeros(n, dtype=np.int32)
+
+    # まだ決着していない戦闘の番号。ラウンドごとに縮めていく
+    active = np.flatnonzero((player_hp > 0) & (monster_hp > 0))
+    for _ in range(max_rounds):
+        if active.size == 0:
+            break
+        turns[active] += 1
+
+        # プレイヤーの攻撃
+        atk = player_atk[active]
+        m_hp = monster_hp[active] - rng.integers(atk // 2, atk, endpoint=True)
+        monster_hp[active] = m_hp
+        killed = m_hp <= 0
+        player_won[active[killed]] = True
+        active = active[~killed]
+
+        # モンスターの反撃
+        atk = monster_atk[active]
+        p_hp = player_hp[active] - rng.integers(atk // 2, atk, endpoint=True)
+        player_hp[active] = p_hp
+        active = active[p_hp > 0]
+
+    return FightResults(player_won, turns, player_hp, monster_hp)
+
+
+if __name__ == "__main__":
+    import time
+    from treasure_hunter_engine import INITIAL_PLAYER_HP, INITIAL_PLAYER_ATK
+
+    rng = np.random.default_rng(0)
+    n = 1_000_000
+    hp, atk = monster_stats(rng.integers(0, len(REGISTRY.monster_types), n))
+    start = time.perf_counter()
+    results = resolve_fights(INITIAL_PLAYER_HP, INITIAL_PLAYER_ATK, hp, atk, rng)
+    elapsed = time.perf_counter() - start
+    print(f"{n:,} 戦闘を {elapsed:.3f} 秒で解決 ({n / elapsed:,.0f} 戦闘/秒)")
+    print(f"勝率: {results.player_won.mean():.1%}  平均ターン: {results.turns.mean():.2f}")
@@ -0,0 +1,468 @@
+import random
+from collections import namedtuple
+
+from treasure_hunter_events import (NULL_SINK, PLAYER_NAME, PrintSink, Moved, WallBump,
+                                    Damage, Kill, Pickup, ItemUsed, ItemMissing, GameOver,
+                                    Status, Encounter, Escape, Vacated, InvalidCommand, Quit,
+                                    NoTarget, Hint)
+from treasure_hunter_grid import GridMap
+from treasure_hunter_monsters import MonsterStore, MonsterView
+from treasure_hunter_path import DistanceField, FLOOR_COST, MONSTER_COST
+from treasure_hunter_placement import place_entities
+from treasure_hunter_registry import REGISTRY, Item, MonsterType
+
+# --- ゲームエンジン ---
+# CLI (treasure_hunter.py) と GUI (treasure_hunter_gui.py) が共通で使う
+# データ構造・ルール・マップの生成・ゲームの進行。
+# 表示の仕方には関わらない (メッセージはイベントとしてシンクに出す) ので、
+# リプレイ・サーバー・シミュレーションなどヘッドレスの処理もこれだけを読み込めばよい。
+
+# --- データ構造の定義 ---
+
+# マップの各セルの情報を格納する名前付きタプル
+MapCell = namedtuple("MapCell", ["description", "item", "monster"])
+
+# --- 定数の定義 ---
+MAP_WIDTH = 5
+MAP_HEIGHT = 5
+INITIAL_PLAYER_HP = 30
+INITIAL_PLAYER_ATK = 5
+NUM_TREASURES = 5
+NUM_MONSTERS = 3
+
+# アイテムとモンスターの種類は treasure_hunter_data.tsv で定義する (番号は REGISTRY が振る)
+# 名前で引く表 (表示・入力用)
+ITEMS = {item.name: item for item in REGISTRY.items}
+# モンスターの種類 (MonsterType(名前, HP, ATK) のリスト、並びが番号)
+MONSTER_TYPES = REGISTRY.monster_types
+
+# --- クラスの定義 ---
+
+class Player:
+    """プレイヤーを表すクラス
+
+    行動の結果は events (シンク) にイベントとして渡す。
+    既定の NULL_SINK なら何も表示しない。
+    持ち物はアイテム番号 (registry の番号) ごとの個数の Inventory。
+    """
+    __slots__ = ("x", "y", "hp", "atk", "inventory", "max_hp", "events", "registry")
+
+    def __init__(self, x, y, hp, atk, events=NULL_SINK, registry=REGISTRY):
+        self.x = x
+        self.y = y
+        self.hp = hp
+        self.atk = atk
+        self.registry = registry
+        self.inventory = registry.new_inventory()
+        self.max_hp = hp
+        self.events = events
+
+    def move(self, dx, dy, game_map):
+        """プレイヤーを移動させる"""
+        new_x, new_y = self.x + dx, self.y + dy
+
+        # マップ範囲内かチェック
+        if game_map.in_bounds(new_x, new_y):
+            self.x, self.y = new_x, new_y
+            if self.events.enabled:
+                self.events.emit(Moved(self.x, self.y))
+            return True
+        else:
+            if self.events.enabled:
+                self.events.emit(WallBump(new_x, new_y))
+            return False
+
+    def attack(self, monster, rng=random):
+        """モンスターを攻撃する"""
+        damage = rng.randint(self.atk // 2, self.atk) # ダメージに少し揺らぎを
+        monster.hp -= damage
+        if self.events.enabled:
+            self.events.emit(Damage(PLAYER_NAME, monster.name, damage, monster.hp))
+        if monster.hp <= 0:
+            if self.events.enabled:
+                self.events.emit(Kill(monster.name))
+            return True # 倒した
+        else:
+            return False # まだ生きている
+
+    def use_item(self, item_id):
+        """アイテム番号 item_id のアイテムを使用する (使えたら True)"""
+        if self.inventory.remove(item_id):
+            self.hp += self.registry.item_effects[item_id]
+            if self.hp > self.max_hp:
+                self.hp = self.max_hp # 最大HPを超えない
+            if self.events.enabled:
+                self.events.emit(ItemUsed(self.registry.items[item_id], self.hp))
+            return True
+        if self.events.enabled:
+            self.events.emit(ItemMissing(self.registry.item_names[item_id], True))
+        return False
+
+    def use_item_named(self, item_name):
+        """名前で入力されたアイテムを使う (入力を受け取る UI 用。ない名前なら False)"""
+        item_id = self.registry.item_ids.get(item_name)
+        if item_id is None:
+            if self.events.enabled:
+                self.events.emit(ItemMissing(item_name, False))
+            return False
+        return self.use_item(item_id)
+
+    def pickup_item(self, item):
+        """アイテムを拾う"""
+        if self.events.enabled:
+            self.events.emit(Pickup(item))
+        self.inventory.add(item.id)
+
+    def named_inventory(self):
+        """持ち物を 名前 -> 個数 の dict で (表示用)"""
+        return self.registry.named(self.inventory)
+
+    def is_alive(self):
+        """プレイヤーが生きているか"""
+        return self.hp > 0
+
+class Monster:
+    """モンスターを表すクラス"""
+    __slots__ = ("name", "hp", "atk", "x", "y")
+
+    def __init__(self, name, hp, atk, x, y):
+        self.name = name
+        self.hp = hp
+        self.atk = atk
+        self.x = x
+        self.y = y
+
+    def attack(self, player, rng=random):
+        """プレイヤーを攻撃する (イベントはプレイヤーのシンクへ)"""
+        damage = rng.randint(self.atk // 2, self.atk)
+        player.hp -= damage
+        if player.events.enabled:
+            player.events.emit(Damage(self.name, PLAYER_NAME, damage, player.hp))
+
+    def is_alive(self):
+        """モンスターが生きているか"""
+        return self.hp > 0
+
+class StoredMonster(MonsterView):
+    """MonsterStore に入っているモンスター (Monster と同じように使える)"""
+    __slots__ = ()
+
+    attack = Monster.attack
+    is_alive = Monster.is_alive
+
+# --- ゲームのセットアップ ---
+
+def setup_game(verbose=True, width=MAP_WIDTH, height=MAP_HEIGHT,
+               num_treasures=NUM_TREASURES, num_monsters=NUM_MONSTERS, events=None,
+               rng=random):
+    """ゲームの初期設定を行う (verbose=False なら何も表示しない)
+
+    events はプレイヤーの行動イベントを受け取るシンク。省略すると
+    verbose なら PrintSink、そうでなければ NULL_SINK になる。
+    rng に random.Random(seed) を渡すと同じマップを作り直せる。
+    """
+    if events is None:
+        events = PrintSink() if verbose else NULL_SINK
+    if verbose:
+        print("ようこそ『コレクト・トレジャーハンター』へ！")
+        print("洞窟を探検し、「伝説のオーブ」を見つけ出そう。\n")
+
+    # 配列で持つマップを生成。デフォルトは「何もない空間」
+    # モンスターは MonsterStore に配列で持つ (list と同じように使える)
+    monsters = MonsterStore(StoredMonster)
+    game_map = GridMap(width, height, MapCell, ITEMS.values(), monster_store=monsters)
+
+    # 開始位置 (0, 0)
+    player_start_x, player_start_y = 0, 0
+    player = Player(player_start_x, player_start_y, INITIAL_PLAYER_HP, INITIAL_PLAYER_ATK, events)
+
+    # 配置する座標をまとめて決める (オーブはスタート地点から遠い場所に)
+    # 条件を満たせない設定なら PlacementError になる
+    treasure_coords, monster_coords, orb_coord = place_entities(
+        width, height, (player_start_x, player_start_y), num_treasures, num_monsters, rng=rng)
+    populate(game_map, monsters, treasure_coords, monster_coords, orb_coord, rng)
+    if verbose:
+        print(f"DEBUG: Orb at {orb_coord}") # デバッグ用
+
+    return player, game_map, monsters
+
+
+def populate(game_map, monsters, treasure_coords, monster_coords, orb_coord=None, rng=random,
+             origin=(0, 0)):
+    """決めた座標に宝箱・モンスター・オーブを置く (オープンワールドのチャンクでも使う)
+
+    orb_coord が None ならオーブは置かない。origin はモンスターの x, y に足す
+    (チャンクの中の座標からワールドの座標にするため)。
+    """
+    # アイテムを配置 (伝説のオーブ以外)
+    available_items = REGISTRY.consumable_ids
+    for coord in treasure_coords:
+        item_id = rng.choice(available_items)
+        game_map[coord] = MapCell("宝箱がある！", REGISTRY.items[item_id], None)
+        # print(f"DEBUG: Item {item_name} at {coord}") # デバッグ用
+
+    # モンスターを配置
+    ox, oy = origin
+    for coord in monster_coords:
+        monster_type = rng.choice(MONSTER_TYPES)
+        monster = monsters.add(monster_type.name, monster_type.hp, monster_type.atk,
+                               coord[0] + ox, coord[1] + oy)
+        game_map[coord] = MapCell(f"{monster.name} が待ち構えている！", None, monster)
+        # print(f"DEBUG: Monster {monster.name} at {coord}") # デバッグ用
+
+    # 伝説のオーブを配置
+    if orb_coord is not None:
+        game_map[orb_coord] = MapCell("祭壇があり、まばゆい光を放つオーブが置かれている！",
+                                      REGISTRY.items[REGISTRY.goal_id], None)
+
+# --- ゲームの進行 ---
+
+class GameSession:
+    """1ゲーム分の進行を、コマンドを 1 つずつ受け取って進めるクラス
+
+    input() を使わないので、CLI の game_loop() だけでなく
+    リプレイやサーバーからも同じルールで動かせる。
+    メッセージはすべて player.events にイベントとして出る。
+    ai に MonsterAI (treasure_hunter_ai) を渡すと、プレイヤーが動くたびにモンスターも動く。
+    """
+    MODE_EXPLORE = "explore"
+    MODE_COMBAT = "combat"
+    MODE_ITEM = "item" # アイテム名の入力待ち
+    MODE_OVER = "over"
+
+    PROMPTS = {
+        MODE_EXPLORE: "\nどうする？ (移動[w/a/s/d] / 自動探索[x] / アイテム[i] / やめる[q]): ",
+        MODE_COMBAT: "戦闘！ どうする？ (たたかう[a] / アイテム[i] / にげる[r] / ヒント[h]): ",
+        MODE_ITEM: "どのアイテムを使う？ (名前を入力): ",
+        MODE_OVER: "",
+    }
+
+    MOVES = {"w": (0, -1), "s": (0, 1), "a": (-1, 0), "d": (1, 0)}
+
+    def __init__(self, player, game_map, monsters, rng=random, recorder=None, start=True,
+                 ai=None):
+        self.player = player
+        self.game_map = game_map
+        self.monsters = monsters
+        self.rng = rng
+        self.recorder = recorder # record(command, is_item_name) を持つオブジェクト
+        self.mode = self.MODE_EXPLORE
+        self.item_return_mode = None # アイテム使用後に戻るモード
+        self.monster = None # 戦闘中のモンスター
+        self.outcome = None # "win" / "loss" / "quit"
+        self.turns = 0 # 受け取ったコマンドの数
+        self.steps = 0 # 進んだゲームのターン数 (歩いた回数。自動探索は 1 歩ずつ数える)
+        self.max_steps = None # steps がこれに達したら自動探索を途中で止める (None なら止めない)
+        self.explore_field = None # 自動探索用の距離の場 (最初に使うときに作る)
+        self.ai = ai # take_turn(x, y) を持つオブジェクト (None ならモンスターは動かない)
+        # 動いたモンスターの下のセルの説明文番号 (handle -> 番号)。セーブデータに保存する。
+        # MonsterAI と同じ dict を共有する
+        self.monster_under = ai.under if ai is not None else {}
+        self._spatial_index = None
+        if start: # start=False はセーブデータから続きを始めるとき
+            self.begin_turn()
+
+    @property
+    def finished(self):
+        return self.mode == self.MODE_OVER
+
+    def prompt(self):
+        """今の入力待ちの案内文"""
+        return self.PROMPTS[self.mode]
+
+    def end(self, outcome):
+        """ゲームを終える"""
+        self.mode = self.MODE_OVER
+        self.outcome = outcome
+        if outcome != "quit":
+            self.player.events.emit(GameOver(outcome == "win"))
+
+    def spatial_index(self):
+        """マップの SpatialIndex (ai が持っていればそれを、なければ最初に使うときに作る)"""
+        if self._spatial_index is None:
+            index = getattr(self.ai, "index", None)
+            if index is None:
+                from treasure_hunter_spatial import SpatialIndex
+                index = SpatialIndex(self.game_map)
+            self._spatial_index = index
+        return self._spatial_index
+
+    def end_turn(self):
+        """プレイヤーの行動のあと: モンスターを動かしてから次のターンを始める"""
+        self.steps += 1
+        if self.ai is not None:
+            self.move_monsters()
+        self.begin_turn()
+
+    def move_monsters(self):
+        """ai にモンスターを 1 ターン分動かさせる (自動探索の距離の場も合わせる)"""
+        moves = self.ai.take_turn(self.player.x, self.player.y)
+        if self.explore_field is not None:
+            for old, new in moves:
+                self.explore_field.set_cost(old, FLOOR_COST)
+                self.explore_field.set_cost(new, MONSTER_COST)
+
+    def begin_turn(self):
+        """ターンの始まり: 現在地のイベントを処理する"""
+        player = self.player
+        events = player.events
+        if not player.is_alive():
+            self.end("loss")
+            return
+        current_coord = (player.x, player.y)
+        cell = self.game_map[current_coord] # 何もないセルでもエラーにならない
+        if events.enabled:
+            events.emit(Status(player.x, player.y, player.hp, player.max_hp, player.atk,
+                               player.named_inventory(), cell.description))
+
+        # アイテムがあれば拾う
+        if cell.item:
+            player.pickup_item(cell.item)
+            # 目的のアイテム (伝説のオーブ) ならゲームクリア
+            if player.registry.is_goal(cell.item):
+                self.end("win")
+                return
+            # アイテムを拾ったらセルから削除 (Noneにする)
+            self.game_map[current_coord] = cell._replace(item=None, description="空っぽの宝箱がある。") # namedtupleは不変なので_replaceで新しいのを作る
+            if self.explore_field is not None:
+                self.explore_field.remove_goal(current_coord)
+
+        # モンスターがいれば戦闘
+        elif cell.monster and cell.monster.is_alive():
+            self.monster = cell.monster
+            self.mode = self.MODE_COMBAT
+            if events.enabled:
+                events.emit(Encounter(self.monster.name, self.monster.hp, self.monster.atk))
+
+    def handle(self, command):
+        """コマンドを 1 つ処理する"""
+        if self.mode == self.MODE_OVER:
+            return
+        if self.recorder is not None:
+            self.recorder.record(command, self.mode == self.MODE_ITEM)
+        self.turns += 1
+        if self.mode == self.MODE_ITEM:
+            self.handle_item(command)
+        elif self.mode == self.MODE_COMBAT:
+            self.handle_combat(command.lower())
+        else:
+            self.handle_explore(command.lower())
+
+    def handle_explore(self, action):
+        """移動中のコマンド"""
+        player = self.player
+        if action in self.MOVES:
+            dx, dy = self.MOVES[action]
+            player.move(dx, dy, self.game_map)
+            self.end_turn()
+            return
+        elif action == 'x':
+            self.auto_explore()
+            return
+        elif action == 'i':
+            self.item_return_mode = self.MODE_EXPLORE
+            self.mode = self.MODE_ITEM
+            return
+        elif action == 'q':
+            player.events.emit(Quit())
+            self.end("quit")
+            return
+        else:
+            player.events.emit(InvalidCommand(action))
+        self.begin_turn()
+
+    def auto_explore(self):
+        """いちばん近い宝箱 (かオーブ) へ、着くかモンスターに出会うまで歩く
+
+        モンスターのいるセルはなるべく避ける。1 歩ごとに普通のターンと同じ処理をする。
+        ai があるときは、近くのモンスターが動いたら (追いかけてきたら) そこで止まる。
+        モンスターが動くと距離の場も変わるので、念のためマップのセル数の歩数で打ち切る。
+        max_steps があれば、steps がそこに達したところでも止まる。
+        """
+        player = self.player
+        if not isinstance(self.game_map, GridMap):
+            player.events.emit(NoTarget()) # 果てのないマップ (オープンワールド) では使えない
+            return
+        if self.explore_field is None:
+            self.explore_field = DistanceField.from_map(self.game_map)
+        field = self.explore_field
+        step = field.next_step((player.x, player.y))
+        if step is None:
+            player.events.emit(NoTarget())
+            return
+        steps_left = self.game_map.width * self.game_map.height
+        while step is not None and self.mode == self.MODE_EXPLORE and steps_left:
+            if self.max_steps is not None and self.steps >= self.max_steps:
+                break
+            steps_left -= 1
+            player.move(step[0], step[1], self.game_map)
+            arrived = field.distance((player.x, player.y)) == 0
+            self.end_turn()
+            if arrived or (self.ai is not None and self.ai.nearby):
+                break
+            step = field.next_step((player.x, player.y))
+
+    def handle_combat(self, action):
+        """戦闘中のコマンド"""
+        player = self.player
+        monster = self.monster
+        if action == 'a':
+            # プレイヤーの攻撃
+            if player.attack(monster, self.rng): # モンスターを倒したか？
+                player.events.emit(Vacated(monster.name))
+                current_coord = (player.x, player.y)
+                cell = self.game_map[current_coord]
+                self.game_map[current_coord] = cell._replace(monster=None, description=f"{monster.name}の残骸が転がっている。")
+                self.monsters.remove(monster) # モンスターの一覧からも削除 (MonsterStore なら O(1))
+                if self.explore_field is not None:
+                    self.explore_field.set_cost(current_coord, FLOOR_COST)
+                self.leave_combat()
+                return
+        elif action == 'i':
+            self.item_return_mode = self.MODE_COMBAT
+            self.mode = self.MODE_ITEM
+            return
+        elif action == 'r':
+            if self.rng.random() < 0.5: # 50%の確率で逃げる成功
+                player.events.emit(Escape(True))
+                # ここではシンプルに戦闘を抜けるだけ (次のターンにまた出会う)
+                self.leave_combat()
+                return
+            player.events.emit(Escape(False))
+        elif action == 'h':
+            self.hint()
+            return # ヒントを見るだけならモンスターは動かない
+        else:
+            player.events.emit(InvalidCommand(action))
+            return # 再度入力を促す
+        self.monster_turn()
+
+    def hint(self):
+        """今の戦闘の最善の行動を出す (乱数は使わないので、リプレイの結果は変わらない)"""
+        from treasure_hunter_solver import advise
+        advice = advise(self.player, self.monster)
+        self.player.events.emit(Hint(advice.action, advice.win, advice.flee, advice.death))
+
+    def handle_item(self, item_name):
+        """アイテム名の入力"""
+        self.mode = self.item_return_mode
+        self.player.use_item_named(item_name)
+        if self.mode == self.MODE_EXPLORE:
+            self.end_turn()
+        elif not self.player.is_alive():
+            # アイテム使用後、HPが0以下になった場合も考慮 (毒キノコなど)
+            self.end("loss")
+        else:
+            self.monster_turn()
+
+    def monster_turn(self):
+        """モンスターが生きていれば攻撃してくる"""
+        if self.monster.is_alive():
+            self.monster.attack(self.player, self.rng)
+        if not self.player.is_alive():
+            self.end("loss")
+
+    def leave_combat(self):
+        """戦闘を終えて移動コマンド待ちに戻る"""
+        self.monster = None
+        self.mode = self.MODE_EXPLORE
@@ -0,0 +1,164 @@
+from collections import namedtuple
+
+# --- ゲーム内イベント ---
+# Player / Monster は行動のたびに文字列を作らず、軽いイベントを
+# シンク (sink) に渡す。文字にするのは表示する側 (render) の仕事。
+
+PLAYER_NAME = "プレイヤー"
+
+Moved = namedtuple("Moved", ["x", "y"])
+WallBump = namedtuple("WallBump", ["x", "y"])
+# attacker / target は名前 (プレイヤーなら PLAYER_NAME)
+Damage = namedtuple("Damage", ["attacker", "target", "amount", "hp_left"])
+Kill = namedtuple("Kill", ["name"])
+Pickup = namedtuple("Pickup", ["item"])
+ItemUsed = namedtuple("ItemUsed", ["item", "hp"])
+# exists が False なら ITEMS にないアイテム
+ItemMissing = namedtuple("ItemMissing", ["name", "exists"])
+GameOver = namedtuple("GameOver", ["win"])
+# CLI の 1 ターンの始まり (現在地・HP・持ち物・周りの様子)
+Status = namedtuple("Status", ["x", "y", "hp", "max_hp", "atk", "inventory", "description"])
+Encounter = namedtuple("Encounter", ["name", "hp", "atk"])
+Escape = namedtuple("Escape", ["success"])
+# 倒したモンスターのいたセルが空いた
+Vacated = namedtuple("Vacated", ["name"])
+InvalidCommand = namedtuple("InvalidCommand", ["command"])
+Quit = namedtuple("Quit", [])
+# 自動探索で向かう先 (宝箱・オーブ) がない
+NoTarget = namedtuple("NoTarget", [])
+# 戦闘のヒント (treasure_hunter_solver の最善の行動と、そのときの確率)
+Hint = namedtuple("Hint", ["action", "win", "flee", "death"])
+
+
+def render(event):
+    """イベントを表示用の文字列にする"""
+    kind = type(event)
+    if kind is Moved:
+        return f"({event.x}, {event.y}) へ移動した。"
+    if kind is WallBump:
+        return "壁だ！そちらへは移動できない。"
+    if kind is Damage:
+        if event.attacker == PLAYER_NAME:
+            text = f"プレイヤーの攻撃！ {event.target} に {event.amount} のダメージ！"
+            if event.hp_left > 0:
+                text += f"\n{event.target} の残りHP: {event.hp_left}"
+            return text
+        return (f"{event.attacker} の攻撃！ プレイヤーに {event.amount} のダメージ！\n"
+                f"プレイヤーの残りHP: {event.hp_left}")
+    if kind is Kill:
+        return f"{event.name} を倒した！"
+    if kind is Pickup:
+        return f"{event.item.name} を拾った！ ({event.item.description})"
+    if kind is ItemUsed:
+        text = f"{event.item.name} を使った。{event.item.description}"
+        if event.item.effect < 0:
+            text += f"\nHPが {abs(event.item.effect)} 減った..."
+        return text + f"\n現在のHP: {event.hp}"
+    if kind is ItemMissing:
+        if event.exists:
+            return f"{event.name} は持っていない。"
+        return "そんなアイテムは存在しないようだ..."
+    if kind is GameOver:
+        if event.win:
+            return "伝説のオーブを手に入れた！ あなたの勝利だ！"
+        return "あなたは力尽きてしまった..."
+    if kind is Status:
+        return ("-" * 20 + "\n"
+                f"現在地: ({event.x}, {event.y}) HP: {event.hp}/{event.max_hp} ATK: {event.atk}\n"
+                f"持ち物: {event.inventory}\n"
+                f"周りの様子: {event.description}")
+    if kind is Encounter:
+        return f"{event.name}が現れた！ (HP: {event.hp}, ATK: {event.atk})"
+    if kind is Escape:
+        return "うまく逃げ出した！" if event.success else "逃げきれなかった！"
+    if kind is Vacated:
+        return f"{event.name}のいた場所は空っぽになった。"
+    if kind is InvalidCommand:
+        return "有効なコマンドを入力してください。"
+    if kind is Quit:
+        return "冒険をあきらめた..."
+    if kind is NoTarget:
+        return "もう探索する場所はない。"
+    if kind is Hint:
+        if event.action == "a":
+            action = "たたかう[a]"
+        elif event.action == "r":
+            action = "にげる[r]"
+        else:
+            action = f"{event.action}を使う[i]"
+        return (f"ヒント: {action} のがよさそうだ。"
+                f" (勝ち {event.win:.0%} / 逃げる {event.flee:.0%} / 負け {event.death:.0%})")
+    return repr(event)
+
+
+# --- シンク ---
+# emit(event) を持つオブジェクト。enabled が False のシンクには
+# 呼び出し側がイベントを作らずに済ませる (if events.enabled: ...)。
+
+class NullSink:
+    """イベントを捨てるシンク (シミュレーション・ボット用)"""
+    enabled = False
+
+    def emit(self, event):
+        pass
+
+
+NULL_SINK = NullSink()
+
+
+class ListSink:
+    """イベントをためておき、あとでまとめて取り出すシンク"""
+    enabled = True
+
+    def __init__(self):
+        self.events = []
+
+    def emit(self, event):
+        self.events.append(event)
+
+    def drain(self):
+        """たまったイベントを返して空にする"""
+        events = self.events
+        self.events = []
+        return events
+
+
+def render_block(event):
+    """CLI で表示するとおりの文字列 (ゲームオーバーの枠や前の空行を含む)"""
+    kind = type(event)
+    if kind is GameOver:
+        line = "★" * 20 if event.win else "-" * 20
+        lines = [f"\n{line}"]
+        if not event.win:
+            lines.append("GAME OVER...")
+        lines.append(render(event))
+        lines.append(f"{line}\n")
+        return "\n".join(lines)
+    if kind is Moved or kind is WallBump or kind is Encounter:
+        return "\n" + render(event)
+    return render(event)
+
+
+class PrintSink:
+    """イベントをその場で print() するシンク (CLI 用)"""
+    enabled = True
+
+    def emit(self, event):
+        print(render_block(event))
+
+
+class TextSink:
+    """CLI と同じ表示の文字列をためておくシンク (サーバー用)"""
+    enabled = True
+
+    def __init__(self):
+        self.lines = []
+
+    def emit(self, event):
+        self.lines.append(render_block(event))
+
+    def take(self):
+        """たまった文字列を 1 つにつなげて返し、空にする"""
+        text = "\n".join(self.lines)
+        self.lines = []
+        return text
@@ -0,0 +1,380 @@
+from bisect import bisect_left, bisect_right
+from math import isqrt
+
+# --- 視界 (フォグ・オブ・ウォー) ---
+# プレイヤーから半径 radius 以内 (dx² + dy² <= radius * (radius + 1)) のセルが見える。
+# 壁はないので、視線をさえぎるのはモンスターのいるセルだけ
+# (モンスターのセル自体は見えるが、その向こうは影になる)。
+# 影の計算は 8 つの八分円ごとの再帰シャドウキャスティングと同じ結果になるが、
+# 1 セルずつではなく行ごとの傾きの区間で進め、さえぎるもののない区間のセルは
+# 配列のスライスと range でまとめて扱う。
+#
+# 見えているセル (visible) と一度でも見たセル (explored) はビットセットで持ち、
+# update() は見え方が変わったセルの番号だけを返す (GUI はそこだけ描き直す)。
+# 視界の中にモンスターがいなければ見える範囲はただの円なので、1 歩動いたときは
+# 行ごとの区間の差だけを求める (O(radius))。モンスターがいるときだけ
+# シャドウキャスティングで作り直す。どちらもマップの広さにはよらない。
+# GridMap の listeners に登録し、視線をさえぎるかどうかが変わったセル (見えているセルに
+# モンスターが現れた・影を落としていたモンスターがいなくなった) だけを覚えておく。
+# プレイヤーが動いていなければ、次の update() ではそのセルを含む八分円だけを作り直す
+# (八分円どうしの影は互いに影響しない)。
+
+DEFAULT_RADIUS = 6
+
+# 八分円ごとの座標変換 (xx, xy, yx, yy)
+_OCTANTS = [(1, 0, 0, 1), (0, 1, 1, 0), (0, -1, 1, 0), (-1, 0, 0, 1),
+            (-1, 0, 0, -1), (0, -1, -1, 0), (0, 1, -1, 0), (1, 0, 0, -1)]
+
+
+class FieldOfView:
+    """GridMap の上のプレイヤーの視界と、探索済みのセル"""
+
+    def __init__(self, game_map, radius=DEFAULT_RADIUS, monsters_block=True):
+        self.game_map = game_map
+        self.radius = radius
+        self.r2 = radius * (radius + 1)
+        self.monsters_block = monsters_block
+        size = game_map.width * game_map.height
+        self.explored = bytearray((size + 7) >> 3)
+        self.visible = bytearray((size + 7) >> 3)
+        self.visible_cells = set() # visible と同じ中身 (差を取るため)
+        # 中心から dy 行離れた行の、円の半分の幅 (half_widths[dy + radius])
+        self.half_widths = [isqrt(self.r2 - dy * dy) for dy in range(-radius, radius + 1)]
+        # 八分円の j 行目の u 番目のセルの傾きの範囲 (再帰シャドウキャスティングの left / right)
+        self.lefts = [[(-u - 0.5) / (-j + 0.5) for u in range(j + 1)] for j in range(radius + 1)]
+        self.rights = [[(-u + 0.5) / (-j - 0.5) for u in range(j + 1)] for j in range(radius + 1)]
+        self.center = None
+        self.disc = False # visible_cells が center を中心とする円そのものか
+        # シャドウキャスティングで作ったとき、八分円ごとの見えるセルと影を落とすセル
+        # (円のときは None)
+        self.octant_cells = None
+        self.octant_opaque = None
+        self.opaque = set() # 影を落としているセル (octant_opaque をすべて合わせたもの)
+        self.changed = set() # 前の update() のあと、視線をさえぎるかどうかが変わったセル
+        self.full_updates = 0 # シャドウキャスティング・円の作り直しの回数
+        self.partial_updates = 0 # 書き換わったセルの八分円だけ作り直した回数
+        self.fast_updates = 0 # 区間の差だけで済んだ回数
+        game_map.listeners.append(self)
+
+    def detach(self):
+        """マップの書き換えを追うのをやめる"""
+        self.game_map.listeners.remove(self)
+
+    def cell_changed(self, i):
+        if self.center is None or not self.monsters_block:
+            return
+        cx, cy = self.center
+        # プレイヤーのいるセル (拾う・倒す) は視線をさえぎらないので影響しない。
+        # 影の中のセルにモンスターが現れても、その向こうはもともと影なので変わらない
+        if i == cy * self.game_map.width + cx:
+            return
+        if self.game_map.monster_ids[i]:
+            if i not in self.opaque and i in self.visible_cells:
+                self.changed.add(i)
+        elif i in self.opaque:
+            self.changed.add(i)
+
+    def is_visible(self, x, y):
+        i = y * self.game_map.width + x
+        return self.visible[i >> 3] >> (i & 7) & 1
+
+    def is_explored(self, x, y):
+        i = y * self.game_map.width + x
+        return self.explored[i >> 3] >> (i & 7) & 1
+
+    # --- 更新 ---
+
+    def update(self, x, y):
+        """(x, y) から見た視界にして、見え方が変わったセルの番号のリストを返す"""
+        moved = (x, y) != self.center
+        if not moved and not self.changed:
+            return []
+        old = self.visible_cells
+        if not moved and self.octant_cells is not None:
+            new = self._recast(x, y, self._octants_of(self.changed))
+            added, removed = new - old, old - new
+            self.partial_updates += 1
+        elif not self.monsters_block or self._disc_is_clear(x, y):
+            if self.disc and not self.changed:
+                added, removed = self._disc_diff(self.center, (x, y))
+                self.fast_updates += 1
+            else:
+                new = set(self._disc_cells(x, y))
+                added, removed = new - old, old - new
+                self.full_updates += 1
+            self.disc = True
+            self.octant_cells = self.octant_opaque = None
+            self.opaque = set()
+        else:
+            new = self._recast(x, y, range(len(_OCTANTS)))
+            added, removed = new - old, old - new
+            self.full_updates += 1
+
+        visible = self.visible
+        explored = self.explored
+        for i in removed:
+            visible[i >> 3] &= ~(1 << (i & 7))
+        for i in added:
+            bit = 1 << (i & 7)
+            visible[i >> 3] |= bit
+            explored[i >> 3] |= bit
+        old.difference_update(removed)
+        old.update(added)
+        self.center = (x, y)
+        self.changed.clear()
+        return list(removed) + list(added)
+
+    def _recast(self, x, y, octants):
+        """八分円 octants だけシャドウキャスティングし直して、見えるセルの集合を返す"""
+        if self.octant_cells is None:
+            self.octant_cells = [set() for _ in _OCTANTS]
+            self.octant_opaque = [set() for _ in _OCTANTS]
+        for k in octants:
+            self.octant_cells[k], self.octant_opaque[k] = self._shadowcast(x, y, _OCTANTS[k])
+        self.opaque = set().union(*self.octant_opaque)
+        self.disc = False
+        return set().union({y * self.game_map.width + x}, *self.octant_cells)
+
+    def _octants_of(self, cells):
+        """cells (中心からの位置) を含む八分円の番号"""
+        width = self.game_map.width
+        cx, cy = self.center
+        octants = set()
+        for i in cells:
+            dx = i % width - cx
+            dy = i // width - cy
+            for k, (xx, xy, yx, yy) in enumerate(_OCTANTS):
+                # _shadowcast の j 行目の u 番目のセル (0 <= u <= j)
+                if xx:
+                    j, u = -dy * yy, -dx * xx
+                else:
+                    j, u = -dx * xy, -dy * yx
+                if 0 <= u <= j:
+                    octants.add(k)
+        return octants
+
+    def _row_span(self, cx, cy, y):
+        """中心 (cx, cy) の円の、行 y の (左端, 右端)。マップの外や円の外の行は None"""
+        dy = y - cy
+        if not (-self.radius <= dy <= self.radius) or not (0 <= y < self.game_map.height):
+            return None
+        half = self.half_widths[dy + self.radius]
+        x0 = max(0, cx - half)
+        x1 = min(self.game_map.width - 1, cx + half)
+        return (x0, x1) if x0 <= x1 else None
+
+    def _disc_is_clear(self, x, y):
+        """円の中 (中心を除く) にモンスターがいないか"""
+        monster_ids = self.game_map.monster_ids
+        width = self.game_map.width
+        for row in range(y - self.radius, y + self.radius + 1):
+            span = self._row_span(x, y, row)
+            if span is None:
+                continue
+            start = row * width
+            if row == y:
+                # プレイヤーのいるセル (戦闘中のモンスター) は視線をさえぎらない
+                if any(monster_ids[start + span[0]:start + x]) or \
+                        any(monster_ids[start + x + 1:start + span[1] + 1]):
+                    return False
+            elif any(monster_ids[start + span[0]:start + span[1] + 1]):
+                return False
+        return True
+
+    def _disc_cells(self, x, y):
+        width = self.game_map.width
+        for row in range(y - self.radius, y + self.radius + 1):
+            span = self._row_span(x, y, row)
+            if span is not None:
+                start = row * width
+                yield from range(start + span[0], start + span[1] + 1)
+
+    def _disc_diff(self, old_center, new_center):
+        """円を old_center から new_center に動かしたときの (増えたセル, 減ったセル)"""
+        width = self.game_map.width
+        ox, oy = old_center
+        nx, ny = new_center
+        added = []
+        removed = []
+        top = min(oy, ny) - self.radius
+        bottom = max(oy, ny) + self.radius
+        for row in range(top, bottom + 1):
+            old = self._row_span(ox, oy, row)
+            new = self._row_span(nx, ny, row)
+            if old == new:
+                continue
+            start = row * width
+            _span_minus(new, old, start, added)
+            _span_minus(old, new, start, removed)
+        return added, removed
+
+    def _shadowcast(self, x, y, octant):
+        """八分円 1 つの再帰シャドウキャスティングと同じ結果を、行ごとの傾きの区間で求める
+
+        八分円の j 行目で、見える傾きの区間 (start, end) ごとに見えるセルの範囲を
+        まとめて足し、その範囲のモンスター (とマップの外) の並びで区間を割る。
+        再帰版の 1 回の呼び出しが区間 1 つに当たるので、1 セルずつ調べなくてよい。
+        (見えるセル, 影を落としたモンスターのセル) を返す (中心のセルは含まない)。
+        """
+        game_map = self.game_map
+        width = game_map.width
+        height = game_map.height
+        monster_ids = game_map.monster_ids
+        radius = self.radius
+        half_widths = self.half_widths
+        lefts = self.lefts
+        rights = self.rights
+        cells = set()
+        opaque = set()
+        xx, xy, yx, yy = octant
+        intervals = [(1.0, 0.0)]
+        for j in range(1, radius + 1):
+            if not intervals:
+                break
+            # j 行目の u (中心の行・列からのずれ 0〜j) 番目のセルの番号は base + u * step
+            if xx:
+                row = y - j * yy
+                row_in_map = 0 <= row < height
+                base = row * width + x
+                step = -xx
+                u_lo, u_hi = (x - width + 1, x) if xx > 0 else (-x, width - 1 - x)
+            else:
+                col = x - j * xy
+                row_in_map = 0 <= col < width
+                base = y * width + col
+                step = -yx * width
+                u_lo, u_hi = (y - height + 1, y) if yx > 0 else (-y, height - 1 - y)
+            if not row_in_map:
+                u_lo, u_hi = j + 1, j # 行ごとマップの外
+            else:
+                u_lo = u_lo if u_lo > 0 else 0
+                u_hi = u_hi if u_hi < j else j
+            u_disc = half_widths[radius - j]
+            row_lefts = lefts[j]
+            row_rights = rights[j]
+            last_row = j == radius
+            next_intervals = []
+            for start, end in intervals:
+                # right <= start かつ left >= end のセルが見える (再帰版と同じ判定)
+                u_min = bisect_left(row_lefts, end)
+                u_max = bisect_right(row_rights, start) - 1
+                if u_min > u_max:
+                    next_intervals.append((start, end))
+                    continue
+                lo = u_min if u_min > u_lo else u_lo
+                hi = u_max if u_max < u_hi else u_hi
+                seen_hi = hi if hi < u_disc else u_disc
+                if lo <= seen_hi:
+                    if step > 0:
+                        cells.update(range(base + lo * step, base + seen_hi * step + 1, step))
+                    else:
+                        cells.update(range(base + seen_hi * step, base + lo * step + 1, -step))
+                if last_row:
+                    continue
+                if lo <= hi:
+                    if step > 0:
+                        ids = monster_ids[base + lo * step:base + hi * step + 1:step]
+                    else:
+                        ids = monster_ids[base + hi * step:base + lo * step + 1:-step]
+                    if lo == u_min and hi == u_max and not any(ids):
+                        next_intervals.append((start, end)) # さえぎるものがない
+                        continue
+                    first = base + lo * step if step > 0 else base + hi * step
+                    stride = abs(step)
+                    opaque.update(first + k * stride for k, monster_id in enumerate(ids)
+                                  if monster_id)
+                else:
+                    ids = ()
+                # 不透明なセルの並びごとに、手前までの区間を次の行へ送る (再帰版の子の呼び出し)
+                runs = _opaque_runs(ids, step, u_min, u_max, lo, hi)
+                for run_hi, run_lo in runs:
+                    left = row_lefts[run_hi]
+                    if start >= left:
+                        next_intervals.append((start, left))
+                    start = row_rights[run_lo]
+                # 行の最後のセルが不透明なら、この区間はここで終わり
+                if runs[-1][1] != u_min:
+                    next_intervals.append((start, end))
+            intervals = next_intervals
+        return cells, opaque
+
+
+def _opaque_runs(ids, step, u_min, u_max, lo, hi):
+    """u_max〜u_min の不透明なセルの並びを、u の大きい順の [上端, 下端] で返す
+
+    ids は u が lo〜hi のセル (マップの中) のモンスター番号で、その外はマップの外 (不透明)。
+    """
+    if step > 0:
+        opaque = [lo + k for k, monster_id in enumerate(ids) if monster_id]
+        opaque.reverse()
+    else:
+        opaque = [hi - k for k, monster_id in enumerate(ids) if monster_id]
+    runs = []
+    if u_max > hi:
+        runs.append([u_max, max(hi + 1, u_min)])
+    for u in opaque:
+        if runs and runs[-1][1] == u + 1:
+            runs[-1][1] = u
+        else:
+            runs.append([u, u])
+    if u_min < lo:
+        low = min(lo - 1, u_max)
+        if runs and runs[-1][1] == low + 1:
+            runs[-1][1] = u_min
+        else:
+            runs.append([low, u_min])
+    return runs
+
+
+def _span_minus(a, b, start, out):
+    """区間 a から区間 b を除いたセルの番号を out に足す (区間は (左端, 右端) か None)"""
+    if a is None:
+        return
+    a0, a1 = a
+    if b is None or b[1] < a0 or b[0] > a1:
+        out.extend(range(start + a0, start + a1 + 1))
+        return
+    b0, b1 = b
+    if a0 < b0:
+        out.extend(range(start + a0, start + b0))
+    if b1 < a1:
+        out.extend(range(start + b1 + 1, start + a1 + 1))
+
+
+if __name__ == "__main__":
+    import argparse
+    import random
+    import time
+
+    from treasure_hunter_engine import setup_game
+
+    parser = argparse.ArgumentParser(description="大きなマップを歩いて、1 歩あたりの視界の更新時間を測る")
+    parser.add_argument("--size", type=int, default=1000)
+    parser.add_argument("--radius", type=int, nargs="*", default=[4, 8, 16, 32])
+    parser.add_argument("--steps", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    size = args.size
+    # モンスターの密度は既定のマップ (10x10 に 15 体) と、その 1/10
+    for label, monsters in (("モンスター 15%", size * size * 15 // 100),
+                            ("モンスター 1.5%", size * size * 15 // 1000)):
+        player, game_map, _ = setup_game(verbose=False, width=size, height=size,
+                                         num_treasures=size * size // 10, num_monsters=monsters,
+                                         rng=random.Random(args.seed))
+        for radius in args.radius:
+            fov = FieldOfView(game_map, radius)
+            walk = random.Random(args.seed)
+            x, y = size // 2, size // 2
+            changed = 0
+            start = time.perf_counter()
+            for _ in range(args.steps):
+                dx, dy = walk.choice(((1, 0), (-1, 0), (0, 1), (0, -1)))
+                if 0 <= x + dx < size and 0 <= y + dy < size:
+                    x, y = x + dx, y + dy
+                changed += len(fov.update(x, y))
+            elapsed = time.perf_counter() - start
+            fov.detach()
+            print(f"{size}x{size} {label} 半径 {radius:>2}: {elapsed / args.steps * 1e6:7.1f} µs/歩  "
+                  f"描き直し {changed / args.steps:6.1f} セル/歩  "
+                  f"(差分 {fov.fast_updates} 回 / 作り直し {fov.full_updates} 回)")
@@ -0,0 +1,180 @@
+from array import array
+
+# --- 配列で持つマップ ---
+# defaultdict(lambda: MapCell(...)) の代わりに、セルごとの情報を
+# 型付き配列 (種類・アイテム番号・モンスター番号・説明文番号) で持つ。
+# game_map[coord] で MapCell を返し、game_map[coord] = cell._replace(...) で
+# 書き換えられるので、既存のコードはそのまま使える。
+# monster_store (MonsterStore) を渡すと、モンスター番号は handle + 1 になり、
+# モンスターのオブジェクトをマップ側で持たずに済む。
+# listeners に登録したオブジェクトには、セルを書き換えるたびに
+# cell_changed(セル番号) が呼ばれる (空間インデックスなどを最新に保つため)。
+
+EMPTY_DESCRIPTION = "何もない空間だ。"
+
+# セルの種類
+KIND_EMPTY = 0
+KIND_ITEM = 1
+KIND_MONSTER = 2
+
+
+class GridMap:
+    """幅 x 高さ の固定サイズのマップ
+
+    cell_type は読み出し時に作る MapCell の型、items は最初から番号を
+    振っておくアイテムの一覧 (ITEMS.values())。
+    monster_store を渡すと、セルに置くモンスターはそのストアのビューに限られる。
+    """
+
+    def __init__(self, width, height, cell_type, items=(),
+                 default_description=EMPTY_DESCRIPTION, monster_store=None):
+        self.width = width
+        self.height = height
+        size = width * height
+        self.kinds = array("B", bytes(size))
+        self.item_ids = array("H", bytes(2 * size)) # 0 はアイテムなし
+        self.monster_ids = array("I", bytes(4 * size)) # 0 はモンスターなし
+        self.description_ids = array("H", bytes(2 * size)) # 0 は既定の説明文
+
+        # 番号 -> 実体 の表。説明文は同じ文字列を一つだけ持つ (インターン)
+        self.descriptions = [default_description]
+        self._description_ids = {default_description: 0}
+        self.items = [None] + list(items)
+        self._item_ids = {item: i for i, item in enumerate(self.items) if item}
+        self.monsters = [None]
+        self._monster_ids = {} # id(monster) -> モンスター番号
+        self.monster_store = monster_store
+        self.listeners = []
+
+        # 何もないセルはいつも同じ MapCell を返す
+        self.cell_type = cell_type
+        self.empty_cell = cell_type(default_description, None, None)
+
+    @classmethod
+    def from_arrays(cls, width, height, cell_type, kinds, item_ids, monster_ids,
+                    description_ids, descriptions, items, monsters=(None,), monster_store=None):
+        """保存しておいた配列と表からマップを作る (配列はコピーしない)
+
+        配列は array でも、mmap を cast した memoryview でもよい。
+        items と monsters は先頭 (番号 0) が None の表。
+        monster_store を渡すときは monsters は使わない。
+        """
+        game_map = cls(0, 0, cell_type, (), descriptions[0], monster_store)
+        game_map.width = width
+        game_map.height = height
+        game_map.kinds = kinds
+        game_map.item_ids = item_ids
+        game_map.monster_ids = monster_ids
+        game_map.description_ids = description_ids
+        game_map.descriptions = list(descriptions)
+        game_map._description_ids = {desc: i for i, desc in enumerate(game_map.descriptions)}
+        game_map.items = list(items)
+        game_map._item_ids = {item: i for i, item in enumerate(game_map.items) if item}
+        game_map.monsters = list(monsters)
+        game_map._monster_ids = {id(m): i for i, m in enumerate(game_map.monsters) if m is not None}
+        return game_map
+
+    def in_bounds(self, x, y):
+        """座標がマップ内かどうか"""
+        return 0 <= x < self.width and 0 <= y < self.height
+
+    def __getitem__(self, coord):
+        x, y = coord
+        if not (0 <= x < self.width and 0 <= y < self.height):
+            return self.empty_cell # defaultdict と同じく範囲外でもエラーにしない
+        i = y * self.width + x
+        desc_id = self.description_ids[i]
+        if not self.kinds[i] and not desc_id:
+            return self.empty_cell
+        monster_id = self.monster_ids[i]
+        if self.monster_store is None:
+            monster = self.monsters[monster_id]
+        else:
+            monster = self.monster_store.view(monster_id - 1) if monster_id else None
+        return self.cell_type(self.descriptions[desc_id],
+                              self.items[self.item_ids[i]],
+                              monster)
+
+    def __setitem__(self, coord, cell):
+        x, y = coord
+        if not (0 <= x < self.width and 0 <= y < self.height):
+            raise IndexError(f"座標 {coord} はマップの外です")
+        i = y * self.width + x
+
+        desc_id = self._description_ids.get(cell.description)
+        if desc_id is None:
+            desc_id = self._description_ids[cell.description] = len(self.descriptions)
+            self.descriptions.append(cell.description)
+        self.description_ids[i] = desc_id
+
+        item_id = 0
+        if cell.item is not None:
+            item_id = self._item_ids.get(cell.item)
+            if item_id is None:
+                item_id = self._item_ids[cell.item] = len(self.items)
+                self.items.append(cell.item)
+        self.item_ids[i] = item_id
+
+        monster_id = 0
+        if cell.monster is not None:
+            monster_id = self.monster_id(cell.monster)
+        self.monster_ids[i] = monster_id
+
+        self.kinds[i] = KIND_ITEM if item_id else KIND_MONSTER if monster_id else KIND_EMPTY
+        for listener in self.listeners:
+            listener.cell_changed(i)
+
+    def monster_id(self, monster):
+        """モンスターの番号 (セル配列に入る値)。初めてのモンスターなら番号を振る"""
+        if self.monster_store is not None:
+            return monster.handle + 1
+        monster_id = self._monster_ids.get(id(monster))
+        if monster_id is None:
+            monster_id = self._monster_ids[id(monster)] = len(self.monsters)
+            self.monsters.append(monster)
+        return monster_id
+
+    def registered_monsters(self):
+        """番号 1 から順に、番号を振ったモンスターの一覧"""
+        if self.monster_store is not None:
+            store = self.monster_store
+            return [store.view(handle) for handle in range(len(store.slots))]
+        return self.monsters[1:]
+
+    def __contains__(self, coord):
+        """一度でも書き込まれたセルかどうか (defaultdict のキーと同じ意味)"""
+        x, y = coord
+        if not (0 <= x < self.width and 0 <= y < self.height):
+            return False
+        i = y * self.width + x
+        return bool(self.kinds[i] or self.description_ids[i])
+
+    def __iter__(self):
+        """書き込まれたセルの座標を順に返す"""
+        kinds = self.kinds
+        description_ids = self.description_ids
+        width = self.width
+        for i in range(width * self.height):
+            if kinds[i] or description_ids[i]:
+                yield (i % width, i // width)
+
+    def nbytes(self):
+        """セル配列が使っているバイト数"""
+        return sum(a.itemsize * len(a) for a in
+                   (self.kinds, self.item_ids, self.monster_ids, self.description_ids))
+
+    def bytes_per_million_cells(self):
+        """100万セルあたりのメモリ使用量 (バイト)"""
+        return self.nbytes() * 1_000_000 // (self.width * self.height)
+
+
+if __name__ == "__main__":
+    import time
+    from treasure_hunter_engine import MapCell, ITEMS
+
+    start = time.perf_counter()
+    game_map = GridMap(4096, 4096, MapCell, ITEMS.values())
+    elapsed = time.perf_counter() - start
+    print(f"4096x4096 のマップを {elapsed:.3f} 秒で作成")
+    print(f"セル配列: {game_map.nbytes() / 2**20:.1f} MiB "
+          f"({game_map.bytes_per_million_cells() / 2**20:.2f} MiB / 100万セル)")
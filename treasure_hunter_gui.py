@@ -1,105 +1,30 @@
-import tkinter as tk
-from tkinter import messagebox, simpledialog, font
 import random
-from collections import namedtuple, defaultdict, Counter
-
-# --- 既存のゲームロジック (クラス、定数、データ構造) ---
-# (変更なし)
-
-Item = namedtuple("Item", ["name", "description", "effect"])
-MapCell = namedtuple("MapCell", ["description", "item", "monster"])
-
-MAP_WIDTH = 5
-MAP_HEIGHT = 5
-INITIAL_PLAYER_HP = 30
-INITIAL_PLAYER_ATK = 5
-NUM_TREASURES = 5
-NUM_MONSTERS = 3
-
-ITEMS = {
-    "ポーション": Item("ポーション", "HPを10回復する。", 10),
-    "すごいポーション": Item("すごいポーション", "HPを20回復する。", 20),
-    "毒キノコ": Item("毒キノコ", "食べるとHPが5減る。", -5),
-    "伝説のオーブ": Item("伝説のオーブ", "まばゆい光を放つ。これが目的の品だ！", 0)
-}
-
-MONSTER_TYPES = [
-    ("スライム", 10, 3),
-    ("ゴブリン", 15, 5),
-    ("スケルトン", 12, 4)
-]
-
-class Player:
-    def __init__(self, x, y, hp, atk):
-        self.x = x
-        self.y = y
-        self.hp = hp
-        self.atk = atk
-        self.inventory = Counter()
-        self.max_hp = hp
-
-    def move(self, dx, dy):
-        new_x, new_y = self.x + dx, self.y + dy
-        if 0 <= new_x < MAP_WIDTH and 0 <= new_y < MAP_HEIGHT:
-            self.x, self.y = new_x, new_y
-            return True, f"({self.x}, {self.y}) へ移動した。"
-        else:
-            return False, "壁だ！そちらへは移動できない。"
-
-    def attack(self, monster):
-        damage = random.randint(self.atk // 2, self.atk)
-        log_msg = f"プレイヤーの攻撃！ {monster.name} に {damage} のダメージ！\n"
-        monster.hp -= damage
-        if monster.hp <= 0:
-            log_msg += f"{monster.name} を倒した！"
-            return True, log_msg
-        else:
-            log_msg += f"{monster.name} の残りHP: {monster.hp}"
-            return False, log_msg
-
-    def use_item(self, item_name):
-        if self.inventory[item_name] > 0:
-            item = ITEMS.get(item_name)
-            if item:
-                log_msg = f"{item.name} を使った。{item.description}\n"
-                self.hp += item.effect
-                if self.hp > self.max_hp: self.hp = self.max_hp
-                if item.effect < 0: log_msg += f"HPが {abs(item.effect)} 減った...\n"
-                log_msg += f"現在のHP: {self.hp}"
-                self.inventory[item_name] -= 1
-                if self.inventory[item_name] == 0:
-                    del self.inventory[item_name]
-                return True, log_msg
-            else:
-                return False, "そんなアイテムは存在しないようだ..."
-        else:
-            return False, f"{item_name} は持っていない。"
-
-    def pickup_item(self, item):
-        log_msg = f"{item.name} を拾った！ ({item.description})"
-        self.inventory[item.name] += 1
-        return log_msg
-
-    def is_alive(self):
-        return self.hp > 0
-
-class Monster:
-    def __init__(self, name, hp, atk, x, y):
-        self.name = name
-        self.hp = hp
-        self.atk = atk
-        self.x = x
-        self.y = y
-
-    def attack(self, player):
-        damage = random.randint(self.atk // 2, self.atk)
-        log_msg = f"{self.name} の攻撃！ プレイヤーに {damage} のダメージ！\n"
-        player.hp -= damage
-        log_msg += f"プレイヤーの残りHP: {player.hp}"
-        return log_msg
-
-    def is_alive(self):
-        return self.hp > 0
+import time
+from collections import deque
+
+from treasure_hunter_engine import (MapCell, MAP_WIDTH, MAP_HEIGHT, NUM_TREASURES, NUM_MONSTERS,
+                                    setup_game)
+from treasure_hunter_events import ListSink, Moved, Hint, render
+from treasure_hunter_fov import DEFAULT_RADIUS, FieldOfView
+from treasure_hunter_metrics import NULL_METRICS, Metrics
+from treasure_hunter_path import DistanceField, FLOOR_COST, find_path
+
+# tkinter は GUI を起動するときに load_tkinter() で読み込む
+# (このモジュールを import するだけのベンチマークなどでは読み込まない)
+tk = messagebox = simpledialog = font = None
+
+
+def load_tkinter():
+    """tkinter を読み込んで tk, messagebox, simpledialog, font に入れる"""
+    global tk, messagebox, simpledialog, font
+    if tk is None:
+        import tkinter
+        import tkinter.font
+        import tkinter.messagebox
+        import tkinter.simpledialog
+        tk, messagebox = tkinter, tkinter.messagebox
+        simpledialog, font = tkinter.simpledialog, tkinter.font
+    return tk
 
 # --- GUI アプリケーションクラス ---
 
@@ -113,10 +38,46 @@ class TreasureHunterGUI:
     COLOR_MONSTER = "#e74c3c"
     COLOR_ORB = "#9b59b6"
     COLOR_TEXT = "#ecf0f1"
-
-    def __init__(self, root):
+    COLOR_FOG = "#1b2631" # まだ見たことのないセル
+    COLOR_REMEMBERED = "#5d6d7e" # 見たことはあるが、今は視界の外のセル
+    # 一度に表示するセル数 (これより大きいマップはスクロールする)
+    VIEW_COLS = 11
+    VIEW_ROWS = 9
+    PAN_FRAME_MS = 16
+    TRAVEL_STEP_MS = 80 # 自動探索・クリック移動で 1 歩進む間隔
+    LOG_LINES = 6 # メッセージ欄に出す行数
+    HISTORY_LINES = 5000 # 履歴に残す行数 (古いものから捨てる)
+    FRAME_MS = 16 # キー操作のときの描き直しの最短間隔 (約 60fps)
+    INPUT_QUEUE_MAX = 32 # ためておけるキー入力の数 (あふれた分は捨てる)
+    KEY_MOVES = {
+        "w": (0, -1), "W": (0, -1), "Up": (0, -1),
+        "s": (0, 1), "S": (0, 1), "Down": (0, 1),
+        "a": (-1, 0), "A": (-1, 0), "Left": (-1, 0),
+        "d": (1, 0), "D": (1, 0), "Right": (1, 0),
+    }
+
+    def __init__(self, root, map_width=MAP_WIDTH, map_height=MAP_HEIGHT,
+                 num_treasures=NUM_TREASURES, num_monsters=NUM_MONSTERS, seed=None,
+                 metrics=NULL_METRICS, sight_radius=DEFAULT_RADIUS):
+        if tk is None:
+            load_tkinter()
         self.root = root
-        self.root.title("コレクト・トレジャーハンター GUI")
+        # 計測するときは、ボタンに渡す前にハンドラと描画処理を計測用に差し替える
+        self.metrics = metrics
+        metrics.instrument(self, ["handle_move", "handle_attack", "handle_run", "handle_use_item",
+                                  "handle_auto_explore", "handle_click"], turn=True)
+        metrics.instrument(self, ["update_display", "render", "draw_map", "show_window", "log_events",
+                                  "update_fov"])
+        # ゲームごとの乱数 (seed を渡すと同じゲームを再現できる)
+        self.seed = seed if seed is not None else random.randrange(2**32)
+        self.rng = random.Random(self.seed)
+        self.map_width = map_width
+        self.map_height = map_height
+        self.num_treasures = num_treasures
+        self.num_monsters = num_monsters
+        self.sight_radius = sight_radius # None ならフォグ・オブ・ウォーなし (マップ全体が見える)
+        self.fov = None
+        self.root.title(f"コレクト・トレジャーハンター GUI (シード: {self.seed})")
         self.root.configure(bg=self.COLOR_BG)
 
         self.default_font = font.nametofont("TkDefaultFont")
@@ -125,6 +86,24 @@ class TreasureHunterGUI:
         self.map_font = font.Font(family="Arial", size=16, weight="bold")
 
         self.player = None
+        self.events = ListSink() # プレイヤーの行動イベント (表示するときに文字にする)
+        metrics.instrument(self.events, ["emit"])
+
+        # メッセージは行のリングバッファにためて、ラベルへの反映はアイドル時に 1 回だけ
+        self.log_lines = deque(["ゲーム開始！"], maxlen=self.LOG_LINES)
+        self.history = deque(maxlen=self.HISTORY_LINES) # 全メッセージの履歴
+        self.history_pending = [] # まだ履歴に反映していない行
+        self.log_flush_job = None
+        self.history_frame = None # 履歴ペイン (開いているときだけ作る)
+        self.history_text = None
+        self.history_shown = 0 # 履歴ペインに表示している行数
+
+        # キー入力はキューにためてまとめて処理し、描き直しはフレームに 1 回まで
+        self.input_queue = deque(maxlen=self.INPUT_QUEUE_MAX)
+        self.input_job = None
+        self.redraw_job = None
+        self.last_redraw = 0.0
+        root.bind("<KeyPress>", self.on_key)
         self.game_map = None
         self.monsters = None
         self.current_monster = None
@@ -135,13 +114,33 @@ class TreasureHunterGUI:
 
         self.map_frame = tk.Frame(self.main_frame, bg=self.COLOR_BG)
         self.map_frame.pack(side=tk.LEFT, fill=tk.BOTH, expand=True, padx=(0, 10))
+        # キャンバスは表示範囲の大きさだけ作り、マップ全体はスクロール領域にする
+        self.view_cols = min(map_width, self.VIEW_COLS)
+        self.view_rows = min(map_height, self.VIEW_ROWS)
         self.canvas = tk.Canvas(self.map_frame,
-                               width=MAP_WIDTH * self.CELL_SIZE,
-                               height=MAP_HEIGHT * self.CELL_SIZE,
+                               width=self.view_cols * self.CELL_SIZE,
+                               height=self.view_rows * self.CELL_SIZE,
+                               scrollregion=(0, 0, map_width * self.CELL_SIZE, map_height * self.CELL_SIZE),
                                bg=self.COLOR_WALL,
                                highlightthickness=0)
         self.canvas.pack(pady=(0, 10))
-        self.map_cells_gui = {}
+        # 履歴ペインはキャンバスの下に開く (toggle_history)
+        self.map_cells_gui = {} # 表示中の座標 -> (rect_id, text_id)
+        self.dirty_cells = set() # 次の draw_map() で描き直すセル
+
+        # 表示範囲を覆うだけのキャンバスアイテムを使い回す (スクロール中は 1 列/行多く要る)
+        self.pool_cols = self.view_cols + (1 if map_width > self.view_cols else 0)
+        self.pool_rows = self.view_rows + (1 if map_height > self.view_rows else 0)
+        self.pool = {} # (列, 行) -> (rect_id, text_id)
+        self.pool_coords = {} # (列, 行) -> 今表示している座標
+        self.view_x = self.view_y = 0 # 表示中の左上 (ピクセル)
+        self.target_x = self.target_y = 0 # スクロール先の左上 (ピクセル)
+        self.pan_job = None
+        # 自動探索・クリック移動
+        self.explore_field = None # 宝箱までの距離の場 (最初に使うときに作る)
+        self.travel_path = [] # クリック移動で残っている座標
+        self.travel_job = None
+        self.canvas.bind("<Button-1>", self.handle_click)
 
         self.info_frame = tk.Frame(self.main_frame, bg=self.COLOR_BG)
         self.info_frame.pack(side=tk.RIGHT, fill=tk.Y)
@@ -178,6 +177,10 @@ class TreasureHunterGUI:
         self.action_frame.pack(pady=5)
         self.item_button = tk.Button(self.action_frame, text="アイテム使用", command=self.handle_use_item)
         self.item_button.pack(fill=tk.X)
+        self.explore_button = tk.Button(self.action_frame, text="自動探索", command=self.handle_auto_explore)
+        self.explore_button.pack(fill=tk.X, pady=(5, 0))
+        self.history_button = tk.Button(self.action_frame, text="履歴", command=self.toggle_history)
+        self.history_button.pack(fill=tk.X, pady=(5, 0))
 
         # 戦闘用ボタン
         self.combat_frame = tk.Frame(self.info_frame, bg=self.COLOR_BG)
@@ -185,149 +188,257 @@ class TreasureHunterGUI:
         self.attack_button.pack(side=tk.LEFT, padx=5)
         self.run_button = tk.Button(self.combat_frame, text="にげる", command=self.handle_run)
         self.run_button.pack(side=tk.LEFT, padx=5)
+        self.hint_button = tk.Button(self.combat_frame, text="ヒント", command=self.handle_hint)
+        self.hint_button.pack(side=tk.LEFT, padx=5)
 
         self.setup_game()
         self.draw_map()
         self.update_display()
 
     def setup_game(self):
-        # (変更なし)
-        self.game_map = defaultdict(lambda: MapCell("何もない空間だ。", None, None))
-        self.monsters = []
-        occupied_coords = set()
-
-        player_start_x, player_start_y = 0, 0
-        self.player = Player(player_start_x, player_start_y, INITIAL_PLAYER_HP, INITIAL_PLAYER_ATK)
-        occupied_coords.add((player_start_x, player_start_y))
-        self.game_map[(player_start_x, player_start_y)] = MapCell("冒険の始まりの場所だ。", None, None)
-
-        def get_random_coords(exclude_coords):
-            while True:
-                x = random.randint(0, MAP_WIDTH - 1)
-                y = random.randint(0, MAP_HEIGHT - 1)
-                coord = (x, y)
-                if coord != exclude_coords and coord not in occupied_coords:
-                    return coord
-
-        available_items = [name for name in ITEMS if name != "伝説のオーブ"]
-        for _ in range(NUM_TREASURES):
-            coord = get_random_coords((player_start_x, player_start_y))
-            item_name = random.choice(available_items)
-            self.game_map[coord] = MapCell("宝箱がある！", ITEMS[item_name], None)
-            occupied_coords.add(coord)
-
-        for _ in range(NUM_MONSTERS):
-            coord = get_random_coords((player_start_x, player_start_y))
-            monster_type = random.choice(MONSTER_TYPES)
-            monster = Monster(monster_type[0], monster_type[1], monster_type[2], coord[0], coord[1])
-            self.game_map[coord] = MapCell(f"{monster.name} が待ち構えている！", None, monster)
-            self.monsters.append(monster)
-            occupied_coords.add(coord)
-
-        while True:
-           orb_coord = get_random_coords((player_start_x, player_start_y))
-           if abs(orb_coord[0] - player_start_x) + abs(orb_coord[1] - player_start_y) > (MAP_WIDTH + MAP_HEIGHT) // 3:
-               break
-        self.game_map[orb_coord] = MapCell("祭壇があり、まばゆい光を放つオーブが置かれている！", ITEMS["伝説のオーブ"], None)
-        occupied_coords.add(orb_coord)
-
-        for y in range(MAP_HEIGHT):
-            for x in range(MAP_WIDTH):
-                if (x, y) not in occupied_coords:
-                     self.game_map[(x, y)] = MapCell("何もない空間だ。", None, None)
+        """マップを作る (CLI と同じ treasure_hunter_engine.setup_game を使う)"""
+        self.player, self.game_map, self.monsters = setup_game(
+            verbose=False, width=self.map_width, height=self.map_height,
+            num_treasures=self.num_treasures, num_monsters=self.num_monsters,
+            events=self.events, rng=self.rng)
+        start = (self.player.x, self.player.y)
+        self.game_map[start] = MapCell("冒険の始まりの場所だ。", None, None)
+        if self.sight_radius is not None:
+            self.fov = FieldOfView(self.game_map, self.sight_radius)
+            self.update_fov()
 
         self.game_over = False
         self.current_monster = None
         self.log_message("洞窟を探検し、伝説のオーブを見つけよう！")
 
 
-    def draw_map(self):
-        # (変更なし)
-        self.canvas.delete("all")
-        self.map_cells_gui.clear()
+    def mark_dirty(self, *coords):
+        """描き直しが必要なセルを記録する"""
+        self.dirty_cells.update(coords)
+
+    def update_fov(self):
+        """視界をプレイヤーの位置に合わせ、見え方が変わったセルだけ描き直しに回す"""
+        if self.fov is None: return
+        width = self.map_width
+        changed = self.fov.update(self.player.x, self.player.y)
+        self.dirty_cells.update((i % width, i // width) for i in changed)
+
+    def cell_style(self, coord):
+        """セルの (塗りつぶし色, 文字) を決める"""
+        # 見たことのないセルは塗りつぶし、視界の外のセルは覚えている宝箱だけ薄く出す
+        in_sight = True
+        if self.fov is not None:
+            if not self.fov.is_explored(*coord):
+                return self.COLOR_FOG, ""
+            in_sight = self.fov.is_visible(*coord)
+        map_cell_data = self.game_map[coord]
+
+        fill_color = self.COLOR_FLOOR if in_sight else self.COLOR_REMEMBERED
+        text_char = ""
+
+        if map_cell_data.item:
+            fill_color = self.COLOR_TREASURE if in_sight else self.COLOR_REMEMBERED
+            text_char = "T"
+        elif in_sight and map_cell_data.monster and map_cell_data.monster.is_alive():
+            fill_color = self.COLOR_MONSTER
+            text_char = "M"
+
+        if self.player and (self.player.x, self.player.y) == coord:
+            fill_color = self.COLOR_PLAYER
+            text_char = "P"
+        return fill_color, text_char
 
-        for y in range(MAP_HEIGHT):
-            for x in range(MAP_WIDTH):
+    def draw_map(self):
+        # 表示範囲に入ったセルにはプールのアイテムを割り当て直し、
+        # それ以外は mark_dirty() されたセルだけ itemconfig で書き換える
+        if not self.pool:
+            self.canvas.delete("all")
+            for row in range(self.pool_rows):
+                for col in range(self.pool_cols):
+                    rect_id = self.canvas.create_rectangle(0, 0, self.CELL_SIZE, self.CELL_SIZE, outline="#bdc3c7")
+                    text_id = self.canvas.create_text(0, 0, fill=self.COLOR_TEXT, font=self.map_font)
+                    self.pool[(col, row)] = (rect_id, text_id)
+            self.follow_player(smooth=False)
+        else:
+            self.follow_player()
+
+        for coord in self.dirty_cells:
+            if coord in self.map_cells_gui:
+                self.paint_cell(coord)
+        self.dirty_cells.clear()
+
+    def paint_cell(self, coord):
+        """表示中のセルの色と文字を更新する"""
+        fill_color, text_char = self.cell_style(coord)
+        rect_id, text_id = self.map_cells_gui[coord]
+        self.canvas.itemconfig(rect_id, fill=fill_color)
+        self.canvas.itemconfig(text_id, text=text_char)
+
+    def follow_player(self, smooth=True):
+        """プレイヤーが中央に来るようにスクロール先を決める"""
+        max_x = (self.map_width - self.view_cols) * self.CELL_SIZE
+        max_y = (self.map_height - self.view_rows) * self.CELL_SIZE
+        self.target_x = min(max(0, (self.player.x - self.view_cols // 2) * self.CELL_SIZE), max_x)
+        self.target_y = min(max(0, (self.player.y - self.view_rows // 2) * self.CELL_SIZE), max_y)
+        if not smooth:
+            self.view_x, self.view_y = self.target_x, self.target_y
+        if self.pan_job is None:
+            self.pan_step()
+
+    def pan_step(self):
+        """スクロール先に向かって少しずつ表示範囲を動かす"""
+        self.pan_job = None
+        self.view_x = self.approach(self.view_x, self.target_x)
+        self.view_y = self.approach(self.view_y, self.target_y)
+        self.canvas.xview_moveto(self.view_x / (self.map_width * self.CELL_SIZE))
+        self.canvas.yview_moveto(self.view_y / (self.map_height * self.CELL_SIZE))
+        self.show_window()
+        if (self.view_x, self.view_y) != (self.target_x, self.target_y):
+            self.pan_job = self.root.after(self.PAN_FRAME_MS, self.pan_step)
+
+    @staticmethod
+    def approach(current, target):
+        """current を target に 1 フレーム分近づける (残りの 1/3、最低 4 ピクセル)"""
+        distance = target - current
+        step = max(4, abs(distance) // 3)
+        if abs(distance) <= step:
+            return target
+        return current + step if distance > 0 else current - step
+
+    def show_window(self):
+        """今の表示範囲に入っているセルへプールのアイテムを割り当てる"""
+        first_x = self.view_x // self.CELL_SIZE
+        first_y = self.view_y // self.CELL_SIZE
+        for y in range(first_y, min(first_y + self.pool_rows, self.map_height)):
+            for x in range(first_x, min(first_x + self.pool_cols, self.map_width)):
+                slot = (x % self.pool_cols, y % self.pool_rows)
+                coord = (x, y)
+                old_coord = self.pool_coords.get(slot)
+                if old_coord == coord:
+                    continue
+                if old_coord is not None:
+                    del self.map_cells_gui[old_coord]
+                rect_id, text_id = self.pool[slot]
                 cell_x1 = x * self.CELL_SIZE
                 cell_y1 = y * self.CELL_SIZE
-                cell_x2 = cell_x1 + self.CELL_SIZE
-                cell_y2 = cell_y1 + self.CELL_SIZE
-                coord = (x, y)
-                map_cell_data = self.game_map[coord]
-
-                fill_color = self.COLOR_WALL
-                text_char = ""
-                text_color = self.COLOR_TEXT
-
-                if map_cell_data.item:
-                    fill_color = self.COLOR_TREASURE
-                    text_char = "T"
-                elif map_cell_data.monster and map_cell_data.monster.is_alive():
-                    fill_color = self.COLOR_MONSTER
-                    text_char = "M"
-                elif map_cell_data.description != "何もない空間だ。":
-                     fill_color = self.COLOR_FLOOR
-                else:
-                     fill_color = self.COLOR_FLOOR
-
-                if self.player and self.player.x == x and self.player.y == y:
-                    fill_color = self.COLOR_PLAYER
-                    text_char = "P"
-
-                rect_id = self.canvas.create_rectangle(cell_x1, cell_y1, cell_x2, cell_y2, fill=fill_color, outline="#bdc3c7")
-                text_id = self.canvas.create_text(cell_x1 + self.CELL_SIZE / 2,
-                                                 cell_y1 + self.CELL_SIZE / 2,
-                                                 text=text_char, fill=text_color, font=self.map_font)
+                self.canvas.coords(rect_id, cell_x1, cell_y1, cell_x1 + self.CELL_SIZE, cell_y1 + self.CELL_SIZE)
+                self.canvas.coords(text_id, cell_x1 + self.CELL_SIZE / 2, cell_y1 + self.CELL_SIZE / 2)
+                self.pool_coords[slot] = coord
                 self.map_cells_gui[coord] = (rect_id, text_id)
+                self.paint_cell(coord)
 
     def update_display(self):
-        # (変更なし)
+        """現在地のセルの処理 (戦闘開始・ゲームオーバー) をして、すぐに描き直す"""
         if not self.player: return
+        self.check_cell()
+        self.render()
 
-        self.hp_label.config(text=f"HP: {self.player.hp}/{self.player.max_hp}")
-        self.atk_label.config(text=f"ATK: {self.player.atk}")
-        inv_text = "\n".join([f"- {name}: {count}" for name, count in self.player.inventory.items()])
-        if not inv_text: inv_text = "何も持っていない"
-        self.inventory_label.config(text=inv_text)
-
-        self.draw_map()
-
+    def check_cell(self):
+        """現在地のセルを見て、力尽きたか・戦闘が始まるかを決める (描き直しはしない)"""
         if not self.player.is_alive():
             self.handle_game_over("あなたは力尽きてしまった...")
-        elif self.game_over:
-            pass
 
         current_cell = self.game_map[(self.player.x, self.player.y)]
         if current_cell.monster and current_cell.monster.is_alive() and not self.game_over:
             self.current_monster = current_cell.monster
             # 戦闘開始時は既存のログに追加
             self.log_message(f"\n{self.current_monster.name}(HP:{self.current_monster.hp}) と戦闘！")
-            self.show_combat_buttons(True)
-        else:
+        elif not self.game_over and not self.current_monster:
             # 戦闘中でなければ、現在地の説明を表示（上書き）
-            if not self.game_over and not self.current_monster:
-                 self.log_message(current_cell.description, add_log=False)
-            # 戦闘が終わったらボタンを隠す
-            if self.current_monster is None:
-                 self.show_combat_buttons(False)
+            self.log_message(current_cell.description, add_log=False)
 
+    def render(self):
+        """ステータス・マップ・ボタンの状態を今のゲームの状態に合わせる"""
+        self.hp_label.config(text=f"HP: {self.player.hp}/{self.player.max_hp}")
+        self.atk_label.config(text=f"ATK: {self.player.atk}")
+        inv_text = "\n".join([f"- {name}: {count}" for name, count in self.player.named_inventory().items()])
+        if not inv_text: inv_text = "何も持っていない"
+        self.inventory_label.config(text=inv_text)
 
+        self.update_fov() # 倒したモンスターの向こうが見えるようになる、など
+        self.draw_map()
+
+        # 戦闘中だけ戦闘用ボタンを出す
+        self.show_combat_buttons(self.current_monster is not None and not self.game_over)
         state = tk.DISABLED if self.game_over or self.current_monster else tk.NORMAL
         for child in self.control_frame.winfo_children():
              child.config(state=state)
         self.item_button.config(state=tk.NORMAL if not self.game_over else tk.DISABLED)
 
+    def request_redraw(self):
+        """render() を次のフレームで 1 回だけ呼ぶよう予約する"""
+        if self.redraw_job is not None:
+            return
+        wait = self.FRAME_MS - (time.perf_counter() - self.last_redraw) * 1000
+        self.redraw_job = self.root.after(max(0, int(wait)), self.redraw)
+
+    def redraw(self):
+        self.redraw_job = None
+        self.last_redraw = time.perf_counter()
+        self.render()
+
     def log_message(self, msg, add_log=True):
-        # (変更なし)
-        if add_log:
-            current_log = self.message_label.cget("text")
-            log_lines = current_log.split('\n')
-            if len(log_lines) > 4:
-                log_lines = log_lines[-4:]
-            new_log = "\n".join(log_lines) + "\n" + msg
-            self.message_label.config(text=new_log.strip())
-        else:
-             self.message_label.config(text=msg)
+        """メッセージを追加する (add_log=False ならメッセージ欄を msg だけにする)
+
+        ラベルはここでは書き換えず、flush_log() をアイドル時に 1 回だけ呼ぶ。
+        """
+        lines = msg.split("\n")
+        if not add_log:
+            self.log_lines.clear()
+        self.log_lines.extend(lines)
+        self.history_pending.extend(line for line in lines if line)
+        if self.log_flush_job is None:
+            self.log_flush_job = self.root.after_idle(self.flush_log)
+
+    def flush_log(self):
+        """たまったメッセージをメッセージ欄と履歴ペインに反映する"""
+        self.log_flush_job = None
+        self.message_label.config(text="\n".join(self.log_lines).strip())
+        if self.history_pending:
+            pending = self.history_pending
+            self.history_pending = []
+            self.history.extend(pending)
+            if self.history_text is not None:
+                self.append_history(pending)
+
+    def toggle_history(self):
+        """全メッセージの履歴ペイン (スクロールできる) を開く・閉じる"""
+        if self.history_frame is not None:
+            self.history_frame.destroy()
+            self.history_frame = self.history_text = None
+            return
+        self.history_frame = tk.Frame(self.map_frame, bg=self.COLOR_BG)
+        self.history_frame.pack(fill=tk.BOTH, expand=True)
+        scrollbar = tk.Scrollbar(self.history_frame)
+        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.history_text = tk.Text(self.history_frame, height=10, wrap=tk.WORD, state=tk.DISABLED,
+                                    fg=self.COLOR_TEXT, bg=self.COLOR_BG, yscrollcommand=scrollbar.set)
+        self.history_text.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        scrollbar.config(command=self.history_text.yview)
+        self.history_shown = 0
+        self.flush_log()
+        self.append_history(self.history)
+
+    def append_history(self, lines):
+        """履歴ペインの末尾に行を足す (HISTORY_LINES を超えた分は先頭から消す)"""
+        if not lines:
+            return
+        text = self.history_text
+        text.config(state=tk.NORMAL)
+        text.insert(tk.END, "\n".join(lines) + "\n")
+        self.history_shown += len(lines)
+        excess = self.history_shown - self.HISTORY_LINES
+        if excess > 0:
+            text.delete("1.0", f"{excess + 1}.0")
+            self.history_shown -= excess
+        text.config(state=tk.DISABLED)
+        text.see(tk.END)
+
+    def log_events(self, add_log=True):
+        """たまったイベントを文字にしてメッセージ欄に出す (移動は出さない)"""
+        lines = [render(event) for event in self.events.drain() if type(event) is not Moved]
+        if lines:
+            self.log_message("\n".join(lines), add_log)
 
     def show_combat_buttons(self, show):
         # (変更なし)
@@ -338,34 +449,119 @@ class TreasureHunterGUI:
 
     # --- イベントハンドラ ---
 
-    def handle_move(self, dx, dy):
-        # (変更なし)
+    def handle_move(self, dx, dy, redraw=True):
+        """1 マス動く。redraw=False なら描き直しは request_redraw() で予約するだけ"""
         if self.game_over or self.current_monster: return
 
-        moved, msg = self.player.move(dx, dy)
-        # 移動メッセージはログに追加せず、update_displayでセル情報が表示されるようにする
-        # self.log_message(msg) # 移動メッセージは必須ではないのでコメントアウトしても良い
+        old_coord = (self.player.x, self.player.y)
+        moved = self.player.move(dx, dy, self.game_map)
 
         if moved:
+            # 移動メッセージはログに追加せず、update_displayでセル情報が表示されるようにする
+            self.events.drain()
             current_coord = (self.player.x, self.player.y)
+            self.mark_dirty(old_coord, current_coord)
+            self.update_fov()
             cell = self.game_map[current_coord]
 
             if cell.item:
                 item = cell.item
-                pickup_msg = self.player.pickup_item(item)
-                self.log_message(pickup_msg)
+                self.player.pickup_item(item)
+                self.log_events()
                 self.game_map[current_coord] = cell._replace(item=None, description="空っぽの宝箱がある。")
+                self.mark_dirty(current_coord)
+                if self.explore_field is not None:
+                    self.explore_field.remove_goal(current_coord)
 
-                if item.name == "伝説のオーブ":
+                if self.player.registry.is_goal(item):
                     self.handle_game_over("伝説のオーブを手に入れた！ あなたの勝利だ！", win=True)
                     return
 
-            self.update_display()
+            if redraw:
+                self.update_display()
+            else:
+                self.check_cell()
+                self.request_redraw()
         else:
             # 移動失敗時のみメッセージ表示
-            self.log_message(msg, add_log=False)
+            self.log_events(add_log=False)
 
 
+    def on_key(self, event):
+        """WASD・矢印キー: 移動をキューに積み、アイドル時にまとめて処理する"""
+        move = self.KEY_MOVES.get(event.keysym)
+        if move is None:
+            return
+        if self.travel_job is not None: # 自動で歩いている途中ならやめる
+            self.root.after_cancel(self.travel_job)
+            self.travel_job = None
+            self.travel_path = []
+        self.input_queue.append(move)
+        if self.input_job is None:
+            self.input_job = self.root.after_idle(self.process_input)
+
+    def process_input(self):
+        """キューの移動をすべて処理する (描き直しは最後にフレーム 1 回分だけ予約)"""
+        self.input_job = None
+        while self.input_queue:
+            if self.game_over or self.current_monster:
+                self.input_queue.clear() # 戦闘が始まったら残りの移動は捨てる
+                break
+            dx, dy = self.input_queue.popleft()
+            self.handle_move(dx, dy, redraw=False)
+        self.request_redraw()
+
+    def handle_auto_explore(self):
+        """いちばん近い宝箱 (かオーブ) へ 1 歩ずつ歩いていく"""
+        if self.game_over or self.current_monster: return
+        if self.explore_field is None:
+            self.explore_field = DistanceField.from_map(self.game_map)
+        if self.explore_field.next_step((self.player.x, self.player.y)) is None:
+            self.log_message("もう探索する場所はない。", add_log=False)
+            return
+        self.travel_path = []
+        self.start_travel()
+
+    def handle_click(self, event):
+        """クリックしたセルまで、モンスターをなるべく避けて歩いていく"""
+        if self.game_over or self.current_monster: return
+        x = int(self.canvas.canvasx(event.x)) // self.CELL_SIZE
+        y = int(self.canvas.canvasy(event.y)) // self.CELL_SIZE
+        if not self.game_map.in_bounds(x, y) or (x, y) == (self.player.x, self.player.y):
+            return
+        if self.explore_field is None:
+            self.explore_field = DistanceField.from_map(self.game_map)
+        path = find_path(self.map_width, self.map_height, self.explore_field.costs,
+                         (self.player.x, self.player.y), (x, y))
+        if not path:
+            return
+        self.travel_path = path
+        self.start_travel()
+
+    def start_travel(self):
+        if self.travel_job is not None:
+            self.root.after_cancel(self.travel_job)
+        self.travel_job = None
+        self.travel_step()
+
+    def travel_step(self):
+        """自動探索・クリック移動の 1 歩 (戦闘・ゲーム終了・到着で止まる)"""
+        self.travel_job = None
+        if self.game_over or self.current_monster: return
+        x, y = self.player.x, self.player.y
+        if self.travel_path:
+            nx, ny = self.travel_path.pop(0)
+            step = (nx - x, ny - y)
+            last = not self.travel_path
+        else:
+            step = self.explore_field.next_step((x, y))
+            if step is None:
+                return
+            last = self.explore_field.distance((x + step[0], y + step[1])) == 0
+        self.handle_move(*step)
+        if not last:
+            self.travel_job = self.root.after(self.TRAVEL_STEP_MS, self.travel_step)
+
     def handle_use_item(self):
         # (変更なし)
         if self.game_over: return
@@ -373,11 +569,11 @@ class TreasureHunterGUI:
             messagebox.showinfo("アイテム", "何も持っていません。")
             return
 
-        item_name = simpledialog.askstring("アイテム使用", "どのアイテムを使いますか？\n" + "\n".join([f"- {name}: {count}" for name, count in self.player.inventory.items()]))
+        item_name = simpledialog.askstring("アイテム使用", "どのアイテムを使いますか？\n" + "\n".join([f"- {name}: {count}" for name, count in self.player.named_inventory().items()]))
 
         if item_name:
-            used, msg = self.player.use_item(item_name)
-            self.log_message(msg)
+            used = self.player.use_item_named(item_name)
+            self.log_events()
             if used:
                 self.update_display()
 
@@ -389,22 +585,32 @@ class TreasureHunterGUI:
         cell_desc = self.game_map[(self.player.x, self.player.y)].description
         self.log_message(f"{cell_desc}\n--------------------", add_log=False) # 戦闘ログの前に区切り
 
-        defeated, player_attack_msg = self.player.attack(self.current_monster)
-        self.log_message(player_attack_msg) # プレイヤー攻撃ログを追加
+        defeated = self.player.attack(self.current_monster, self.rng)
+        self.log_events() # プレイヤー攻撃ログを追加
 
         if defeated:
             coord = (self.current_monster.x, self.current_monster.y)
             cell = self.game_map[coord]
             self.game_map[coord] = cell._replace(monster=None, description=f"{self.current_monster.name}の残骸が転がっている。")
-            # self.monsters.remove(self.current_monster) # リストからの削除は必須ではない
+            self.mark_dirty(coord)
+            if self.explore_field is not None:
+                self.explore_field.set_cost(coord, FLOOR_COST)
+            self.monsters.remove(self.current_monster) # MonsterStore からも消す (O(1))
             self.current_monster = None # 戦闘終了
             self.update_display()
         else:
-            monster_attack_msg = self.current_monster.attack(self.player)
-            self.log_message(monster_attack_msg) # モンスター攻撃ログを追加
+            self.current_monster.attack(self.player, self.rng)
+            self.log_events() # モンスター攻撃ログを追加
             self.update_display()
 
 
+    def handle_hint(self):
+        """戦闘の最善の行動と、勝つ・逃げる・負ける確率をメッセージ欄に出す"""
+        if not self.current_monster or self.game_over: return
+        from treasure_hunter_solver import advise
+        advice = advise(self.player, self.current_monster)
+        self.log_message(render(Hint(advice.action, advice.win, advice.flee, advice.death)))
+
     def handle_run(self):
         # (ログメッセージ処理を微調整)
         if not self.current_monster or self.game_over: return
@@ -412,14 +618,14 @@ class TreasureHunterGUI:
         cell_desc = self.game_map[(self.player.x, self.player.y)].description
         self.log_message(f"{cell_desc}\n--------------------", add_log=False) # ログの前に区切り
 
-        if random.random() < 0.5:
+        if self.rng.random() < 0.5:
             self.log_message("うまく逃げ出した！")
             self.current_monster = None
             self.update_display()
         else:
             self.log_message("逃げきれなかった！")
-            monster_attack_msg = self.current_monster.attack(self.player)
-            self.log_message(monster_attack_msg)
+            self.current_monster.attack(self.player, self.rng)
+            self.log_events()
             self.update_display()
 
 
@@ -431,6 +637,7 @@ class TreasureHunterGUI:
         for child in self.control_frame.winfo_children():
              child.config(state=tk.DISABLED)
         self.item_button.config(state=tk.DISABLED)
+        self.explore_button.config(state=tk.DISABLED)
         for child in self.combat_frame.winfo_children():
              child.config(state=tk.DISABLED)
 
@@ -442,6 +649,28 @@ class TreasureHunterGUI:
 
 # --- アプリケーションの実行 ---
 if __name__ == "__main__":
-    root = tk.Tk()
-    app = TreasureHunterGUI(root)
+    import argparse
+    parser = argparse.ArgumentParser(description="コレクト・トレジャーハンター GUI")
+    # 大きなマップ: python treasure_hunter_gui.py 幅 高さ (宝箱とモンスターは面積に比例)
+    parser.add_argument("size", nargs="*", type=int, metavar="幅 高さ")
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--metrics", metavar="FILE", help="ウィンドウを閉じたときに計測結果を JSON で保存する")
+    parser.add_argument("--trace-memory", action="store_true")
+    parser.add_argument("--sight", type=int, default=DEFAULT_RADIUS, help="視界の半径")
+    parser.add_argument("--no-fog", action="store_true", help="フォグ・オブ・ウォーなしでマップ全体を見せる")
+    args = parser.parse_args()
+    sight_radius = None if args.no_fog else args.sight
+    metrics = Metrics(args.trace_memory) if args.metrics else NULL_METRICS
+
+    root = load_tkinter().Tk()
+    if len(args.size) == 2:
+        width, height = args.size
+        scale = width * height / (MAP_WIDTH * MAP_HEIGHT)
+        app = TreasureHunterGUI(root, width, height,
+                                int(NUM_TREASURES * scale), int(NUM_MONSTERS * scale),
+                                seed=args.seed, metrics=metrics, sight_radius=sight_radius)
+    else:
+        app = TreasureHunterGUI(root, seed=args.seed, metrics=metrics, sight_radius=sight_radius)
     root.mainloop()
+    if args.metrics:
+        metrics.to_json(args.metrics)
@@ -0,0 +1,185 @@
+import functools
+import time
+
+# --- 計測 (プロファイリング) ---
+# どこに時間がかかっているかを、ゲームを動かしたまま調べるための仕組み。
+# Metrics.instrument() は、オブジェクトのメソッドを時間を測るラッパーに
+# インスタンスごとに差し替える。計測しないとき (NULL_METRICS) は何も差し替えないので、
+# ゲームの処理には一切手が入らない。
+# 時間はフェーズ (メソッド) ごとに 2 のべき乗 µs 刻みのヒストグラムにためる。
+# json と tracemalloc は使うときに読み込む (計測しないときの起動を遅くしないため)。
+
+HISTOGRAM_BUCKETS = 32 # 2^31 µs (約 36 分) まで
+TURN = "turn" # 1 ターン (コマンド 1 つ・GUI の操作 1 つ) 全体のフェーズ名
+
+
+class PhaseStats:
+    """1 つのフェーズの呼び出し回数・合計時間・ヒストグラム"""
+    __slots__ = ("count", "total", "max", "buckets")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        # buckets[b] は 2^(b-1) <= µs < 2^b の回数 (b = 0 は 1µs 未満)
+        self.buckets = [0] * HISTOGRAM_BUCKETS
+
+    def add(self, seconds):
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+        b = int(seconds * 1e6).bit_length()
+        self.buckets[min(b, HISTOGRAM_BUCKETS - 1)] += 1
+
+    def percentile(self, q):
+        """q (0-1) 分位点の上限 (µs)。ヒストグラムから見積もる"""
+        target = q * self.count
+        seen = 0
+        for b, n in enumerate(self.buckets):
+            seen += n
+            if n and seen >= target:
+                return float(1 << b)
+        return 0.0
+
+    def snapshot(self):
+        return {
+            "count": self.count,
+            "total_ms": self.total * 1e3,
+            "mean_us": self.total / self.count * 1e6 if self.count else 0.0,
+            "max_us": self.max * 1e6,
+            "p50_us": self.percentile(0.5),
+            "p99_us": self.percentile(0.99),
+            # "<2^b µs": 回数 (0 の区間は省く)
+            "histogram": {f"<{1 << b}us": n for b, n in enumerate(self.buckets) if n},
+        }
+
+
+class NullMetrics:
+    """何も計測しない (既定)"""
+    enabled = False
+
+    def instrument(self, obj, names, turn=False):
+        pass
+
+    def snapshot(self):
+        return {}
+
+
+NULL_METRICS = NullMetrics()
+
+
+class Metrics:
+    """フェーズごとの時間とターンごとのメモリ確保量を記録する
+
+    trace_memory=True なら tracemalloc を使い、1 ターンで増えたメモリ量
+    (バイト) もヒストグラムにする (tracemalloc の分だけ全体が遅くなる)。
+    """
+    enabled = True
+
+    def __init__(self, trace_memory=False):
+        self.phases = {}
+        self.trace_memory = trace_memory
+        self.alloc = {"count": 0, "total_bytes": 0, "max_bytes": 0, "min_bytes": 0}
+        self._depth = 0 # ターンのラッパーの入れ子の深さ (いちばん外側だけをターンと数える)
+        self.started = time.time()
+        if trace_memory:
+            import tracemalloc
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+
+    def phase(self, name):
+        stats = self.phases.get(name)
+        if stats is None:
+            stats = self.phases[name] = PhaseStats()
+        return stats
+
+    def instrument(self, obj, names, turn=False):
+        """obj のメソッド names を、時間を測るラッパーに差し替える
+
+        turn=True のメソッドは 1 回の呼び出しを 1 ターンとしても数える。
+        ボタンの command などに渡す前に呼ぶこと (渡したあとでは差し替わらない)。
+        """
+        for name in names:
+            method = getattr(obj, name)
+            wrapper = self._wrap_turn(method, name) if turn else self._wrap(method, name)
+            setattr(obj, name, wrapper)
+
+    def _wrap(self, method, name):
+        stats = self.phase(name)
+        perf_counter = time.perf_counter
+
+        @functools.wraps(method)
+        def timed(*args, **kwargs):
+            start = perf_counter()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                stats.add(perf_counter() - start)
+        return timed
+
+    def _wrap_turn(self, method, name):
+        stats = self.phase(name)
+        turn_stats = self.phase(TURN)
+        perf_counter = time.perf_counter
+        trace_memory = self.trace_memory
+        if trace_memory:
+            from tracemalloc import get_traced_memory
+
+        @functools.wraps(method)
+        def timed_turn(*args, **kwargs):
+            outermost = self._depth == 0
+            self._depth += 1
+            before = get_traced_memory()[0] if trace_memory and outermost else 0
+            start = perf_counter()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                elapsed = perf_counter() - start
+                self._depth -= 1
+                stats.add(elapsed)
+                if outermost:
+                    turn_stats.add(elapsed)
+                    if trace_memory:
+                        self._add_alloc(get_traced_memory()[0] - before)
+        return timed_turn
+
+    def _add_alloc(self, delta):
+        alloc = self.alloc
+        alloc["count"] += 1
+        alloc["total_bytes"] += delta
+        alloc["max_bytes"] = max(alloc["max_bytes"], delta)
+        alloc["min_bytes"] = min(alloc["min_bytes"], delta)
+
+    def snapshot(self):
+        """今までの計測結果を dict で返す (JSON にできる)"""
+        data = {
+            "elapsed_s": time.time() - self.started,
+            "turns": self.phases[TURN].count if TURN in self.phases else 0,
+            "phases": {name: stats.snapshot() for name, stats in sorted(self.phases.items())},
+        }
+        if self.trace_memory:
+            alloc = dict(self.alloc)
+            alloc["mean_bytes"] = alloc["total_bytes"] / alloc["count"] if alloc["count"] else 0.0
+            data["alloc_per_turn"] = alloc
+        return data
+
+    def to_json(self, path=None):
+        """snapshot() を JSON 文字列にする (path を渡すとファイルにも書く)"""
+        import json
+        text = json.dumps(self.snapshot(), indent=2, ensure_ascii=False)
+        if path is not None:
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(text + "\n")
+        return text
+
+
+def instrument_session(metrics, session):
+    """GameSession の各フェーズを計測する (CLI・リプレイ・サーバーで共通)"""
+    metrics.instrument(session, ["handle"], turn=True)
+    metrics.instrument(session, ["begin_turn", "handle_explore", "handle_combat",
+                                 "handle_item", "monster_turn", "auto_explore",
+                                 "move_monsters"])
+    events = session.player.events
+    if events.enabled: # 共有の NULL_SINK は差し替えない
+        metrics.instrument(events, ["emit"])
@@ -0,0 +1,195 @@
+from array import array
+
+# --- モンスターの配列ストア ---
+# モンスター 1 体ごとにオブジェクト (と __dict__) を持つ代わりに、
+# HP・ATK・座標を型付き配列 (struct of arrays) で持つ。
+# 生きているモンスターは配列の先頭から詰めて並べ、倒したモンスターは
+# 最後の 1 体をその位置へ移して消す (O(1))。
+# 外からは番号 (handle) だけを持つ MonsterView を通して Monster と同じように使う。
+# handle はモンスターを追加した順の番号で、倒されても使い回さない。
+
+
+class MonsterView:
+    """MonsterStore の中の 1 体を Monster と同じ属性で読み書きするビュー
+
+    ビューは必要なときに作る使い捨てのオブジェクトで、同じ handle の
+    ビューどうしは == で等しくなる。取り除かれたモンスターは name と
+    hp (0) だけ読める。
+    """
+    __slots__ = ("store", "handle")
+
+    def __init__(self, store, handle):
+        self.store = store
+        self.handle = handle
+
+    def _slot(self):
+        slot = self.store.slots[self.handle]
+        if slot < 0:
+            raise LookupError(f"モンスター {self.handle} はもういません")
+        return slot
+
+    @property
+    def name(self):
+        store = self.store
+        return store.type_names[store.type_ids[self.handle]]
+
+    @property
+    def hp(self):
+        slot = self.store.slots[self.handle]
+        return self.store.hp[slot] if slot >= 0 else 0
+
+    @hp.setter
+    def hp(self, value):
+        self.store.hp[self._slot()] = value
+
+    @property
+    def atk(self):
+        return self.store.atk[self._slot()]
+
+    @atk.setter
+    def atk(self, value):
+        self.store.atk[self._slot()] = value
+
+    @property
+    def x(self):
+        return self.store.xs[self._slot()]
+
+    @x.setter
+    def x(self, value):
+        self.store.xs[self._slot()] = value
+
+    @property
+    def y(self):
+        return self.store.ys[self._slot()]
+
+    @y.setter
+    def y(self, value):
+        self.store.ys[self._slot()] = value
+
+    def __eq__(self, other):
+        if not isinstance(other, MonsterView):
+            return NotImplemented
+        return self.store is other.store and self.handle == other.handle
+
+    def __hash__(self):
+        return hash(self.handle)
+
+    def __repr__(self):
+        return f"<{type(self).__name__} {self.handle} {self.name} HP:{self.hp}>"
+
+
+class MonsterStore:
+    """モンスターの一覧 (list の代わりに使える)
+
+    add() で追加してビューを受け取り、remove() で取り除く。
+    for で回すと生きているモンスターのビューを順に返す。
+    view_type はビューのクラス (MonsterView を継承して attack() などを足したもの)。
+    """
+
+    def __init__(self, view_type=MonsterView):
+        self.view_type = view_type
+        # 種類の名前は番号にして持つ
+        self.type_names = []
+        self._type_ids = {}
+        # handle ごと: 配列上の位置 (取り除いたら -1) と種類
+        self.slots = array("i")
+        self.type_ids = array("H")
+        # 生きているモンスターごと (位置 0 .. len - 1)
+        self.handles = array("I")
+        self.hp = array("i")
+        self.atk = array("i")
+        self.xs = array("i")
+        self.ys = array("i")
+
+    def add(self, name, hp, atk, x, y):
+        """モンスターを 1 体追加してビューを返す"""
+        type_id = self._type_ids.get(name)
+        if type_id is None:
+            type_id = self._type_ids[name] = len(self.type_names)
+            self.type_names.append(name)
+        handle = len(self.slots)
+        self.slots.append(len(self.handles))
+        self.type_ids.append(type_id)
+        self.handles.append(handle)
+        self.hp.append(hp)
+        self.atk.append(atk)
+        self.xs.append(x)
+        self.ys.append(y)
+        return self.view_type(self, handle)
+
+    def view(self, handle):
+        """handle のモンスターのビュー"""
+        return self.view_type(self, handle)
+
+    def remove(self, monster):
+        """モンスターを取り除く (最後の 1 体と入れ替えるので O(1))"""
+        handle = monster.handle
+        slot = self.slots[handle]
+        if slot < 0:
+            raise ValueError(f"モンスター {handle} はもういません")
+        columns = (self.handles, self.hp, self.atk, self.xs, self.ys)
+        last = len(self.handles) - 1
+        if slot != last:
+            for column in columns:
+                column[slot] = column[last]
+            self.slots[self.handles[slot]] = slot
+        for column in columns:
+            column.pop()
+        self.slots[handle] = -1
+
+    def __contains__(self, monster):
+        return (isinstance(monster, MonsterView) and monster.store is self
+                and self.slots[monster.handle] >= 0)
+
+    def __len__(self):
+        return len(self.handles)
+
+    def __iter__(self):
+        view_type = self.view_type
+        for handle in self.handles.tolist():
+            yield view_type(self, handle)
+
+    def nbytes(self):
+        """配列が使っているバイト数"""
+        return sum(a.itemsize * len(a) for a in
+                   (self.slots, self.type_ids, self.handles,
+                    self.hp, self.atk, self.xs, self.ys))
+
+    def bytes_per_monster(self):
+        """1 体あたりのメモリ使用量 (バイト)"""
+        return self.nbytes() / max(len(self.slots), 1)
+
+
+if __name__ == "__main__":
+    import random
+    import sys
+    import time
+    import tracemalloc
+    from treasure_hunter_engine import MONSTER_TYPES, Monster
+
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    rng = random.Random(0)
+    types = [rng.choice(MONSTER_TYPES) for _ in range(n)]
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    store = MonsterStore()
+    for i, (name, hp, atk) in enumerate(types):
+        store.add(name, hp, atk, i % 1000, i // 1000)
+    elapsed = time.perf_counter() - start
+    store_bytes = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    print(f"MonsterStore: {n} 体を {elapsed:.3f} 秒で追加 "
+          f"({store_bytes / n:.1f} バイト/体, 配列 {store.bytes_per_monster():.1f} バイト/体)")
+
+    tracemalloc.start()
+    monsters = [Monster(name, hp, atk, i % 1000, i // 1000) for i, (name, hp, atk) in enumerate(types)]
+    list_bytes = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    print(f"Monster のリスト: {list_bytes / n:.1f} バイト/体")
+
+    start = time.perf_counter()
+    for handle in rng.sample(range(n), n // 2):
+        store.remove(store.view(handle))
+    elapsed = time.perf_counter() - start
+    print(f"半分を取り除く: {elapsed * 1e9 / (n // 2):.0f} ns/体 (残り {len(store)} 体)")
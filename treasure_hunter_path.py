@@ -0,0 +1,196 @@
+import heapq
+from array import array
+
+from treasure_hunter_grid import KIND_ITEM, KIND_MONSTER
+
+# --- 経路探索 ---
+# DistanceField は「いちばん近いゴールまでのコスト」をセルごとに持つ。
+# ゴールを 1 つ消したりセルのコストが変わったりしたときは、
+# 影響を受けるセルだけを計算し直す (全体を作り直さない)。
+# find_path() は 2 点間の A* 探索。
+
+INF = 2**31 - 1
+FLOOR_COST = 1
+MONSTER_COST = 8 # モンスターのいるセルはなるべく避ける
+
+NEIGHBORS = ((0, -1), (0, 1), (-1, 0), (1, 0))
+
+
+def map_costs(game_map):
+    """GridMap からセルに入るコストの配列を作る"""
+    costs = array("B", [FLOOR_COST]) * (game_map.width * game_map.height)
+    for i, kind in enumerate(game_map.kinds):
+        if kind == KIND_MONSTER:
+            costs[i] = MONSTER_COST
+    return costs
+
+
+class DistanceField:
+    """ゴールまでの距離の場 (セル c の値 = c からゴールまでの最小コスト)
+
+    隣のセル n へ進むコストは costs[n]。ゴールの値は 0。
+    """
+
+    def __init__(self, width, height, goals, costs):
+        self.width = width
+        self.height = height
+        self.costs = costs
+        self.goals = set(goals) # セル番号 (y * width + x)
+        self.dist = array("i", [INF]) * (width * height)
+        for g in self.goals:
+            self.dist[g] = 0
+        self._propagate([(0, g) for g in self.goals])
+
+    @classmethod
+    def from_map(cls, game_map):
+        """宝箱 (とオーブ) のあるセルをゴールにした距離の場を作る"""
+        goals = [i for i, kind in enumerate(game_map.kinds) if kind == KIND_ITEM]
+        return cls(game_map.width, game_map.height, goals, map_costs(game_map))
+
+    def _neighbors(self, i):
+        x, y = i % self.width, i // self.width
+        if x > 0:
+            yield i - 1
+        if x < self.width - 1:
+            yield i + 1
+        if y > 0:
+            yield i - self.width
+        if y < self.height - 1:
+            yield i + self.width
+
+    def _propagate(self, heap):
+        """heap にあるセルから距離が縮む方向へ広げる (Dijkstra)"""
+        dist = self.dist
+        costs = self.costs
+        heapq.heapify(heap)
+        while heap:
+            d, i = heapq.heappop(heap)
+            if d > dist[i]:
+                continue
+            nd = d + costs[i]
+            for n in self._neighbors(i):
+                if nd < dist[n]:
+                    dist[n] = nd
+                    heapq.heappush(heap, (nd, n))
+
+    def _invalidate(self, seeds):
+        """支えを失ったかもしれないセルから、距離を計算し直す範囲を決めて修復する"""
+        dist = self.dist
+        costs = self.costs
+        invalid = set()
+        heap = [(dist[s], s) for s in seeds if dist[s] != INF]
+        heapq.heapify(heap)
+        while heap:
+            d, i = heapq.heappop(heap)
+            if i in invalid or d != dist[i] or i in self.goals:
+                continue
+            # まだ有効な隣から同じ距離で来られるなら、このセルはそのまま
+            if any(n not in invalid and dist[n] != INF and dist[n] + costs[n] == d
+                   for n in self._neighbors(i)):
+                continue
+            invalid.add(i)
+            for n in self._neighbors(i):
+                if dist[n] != INF and dist[n] == d + costs[i]:
+                    heapq.heappush(heap, (dist[n], n))
+
+        # 無効になったセルは、有効な隣からの距離でもう一度広げる
+        for i in invalid:
+            dist[i] = INF
+        heap = []
+        for i in invalid:
+            best = INF
+            for n in self._neighbors(i):
+                if dist[n] != INF and dist[n] + costs[n] < best:
+                    best = dist[n] + costs[n]
+            if best != INF:
+                dist[i] = best
+                heap.append((best, i))
+        self._propagate(heap)
+        return len(invalid)
+
+    def add_goal(self, coord):
+        """ゴールを追加する"""
+        i = coord[1] * self.width + coord[0]
+        self.goals.add(i)
+        self.dist[i] = 0
+        self._propagate([(0, i)])
+
+    def remove_goal(self, coord):
+        """ゴールを消す (宝箱が空になったとき)"""
+        i = coord[1] * self.width + coord[0]
+        if i not in self.goals:
+            return
+        self.goals.discard(i)
+        self._invalidate([i])
+
+    def set_cost(self, coord, cost):
+        """セルに入るコストを変える (モンスターを倒したときなど)"""
+        i = coord[1] * self.width + coord[0]
+        old = self.costs[i]
+        if cost == old:
+            return
+        self.costs[i] = cost
+        if self.dist[i] == INF:
+            return
+        if cost < old:
+            # 近道ができただけなので、このセルから広げ直せば足りる
+            self._propagate([(self.dist[i], i)])
+        else:
+            self._invalidate([n for n in self._neighbors(i)
+                              if self.dist[n] == self.dist[i] + old])
+
+    def distance(self, coord):
+        """coord からいちばん近いゴールまでのコスト (届かなければ None)"""
+        d = self.dist[coord[1] * self.width + coord[0]]
+        return None if d == INF else d
+
+    def next_step(self, coord):
+        """ゴールへ近づく 1 歩 (dx, dy)。ゴール上か届かなければ None"""
+        x, y = coord
+        i = y * self.width + x
+        best = self.dist[i]
+        if best == 0 or best == INF:
+            return None
+        for dx, dy in NEIGHBORS:
+            nx, ny = x + dx, y + dy
+            if 0 <= nx < self.width and 0 <= ny < self.height:
+                n = ny * self.width + nx
+                if self.dist[n] != INF and self.dist[n] + self.costs[n] == best:
+                    return (dx, dy)
+        return None
+
+
+def find_path(width, height, costs, start, goal):
+    """start から goal までの最小コストの経路 (座標のリスト、start は含まない) を A* で探す
+
+    届かなければ None。
+    """
+    gx, gy = goal
+    start_i = start[1] * width + start[0]
+    goal_i = gy * width + gx
+    best = {start_i: 0}
+    came_from = {}
+    heap = [(abs(start[0] - gx) + abs(start[1] - gy), 0, start_i)]
+    while heap:
+        _, g, i = heapq.heappop(heap)
+        if i == goal_i:
+            path = []
+            while i != start_i:
+                path.append((i % width, i // width))
+                i = came_from[i]
+            path.reverse()
+            return path
+        if g > best[i]:
+            continue
+        x, y = i % width, i // width
+        for dx, dy in NEIGHBORS:
+            nx, ny = x + dx, y + dy
+            if 0 <= nx < width and 0 <= ny < height:
+                n = ny * width + nx
+                ng = g + costs[n]
+                if ng < best.get(n, INF):
+                    best[n] = ng
+                    came_from[n] = i
+                    # マンハッタン距離はコスト 1 以上なので許容的なヒューリスティック
+                    heapq.heappush(heap, (ng + abs(nx - gx) + abs(ny - gy), ng, n))
+    return None
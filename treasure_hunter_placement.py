@@ -0,0 +1,116 @@
+import random
+from bisect import bisect_right
+
+# --- エンティティの配置 ---
+# 空いているセルから重複なしで座標を選ぶ (何度も引き直さない)。
+# オーブは「スタート地点から十分遠いセル」の中から選ぶ。
+# どちらも配置する数に比例した時間で終わり、条件を満たせないときは
+# PlacementError を送出する。
+
+
+class PlacementError(ValueError):
+    """配置の条件を満たせないときのエラー"""
+
+
+def default_orb_distance(width, height):
+    """オーブとスタート地点の最小距離 (これより遠い必要がある)"""
+    return (width + height) // 3
+
+
+class FarCells:
+    """スタート地点からマンハッタン距離が distance より遠いセルの一覧
+
+    セルを列挙して持つ代わりに、行ごとの個数の累積和だけを持ち、
+    k 番目のセルを二分探索で求める。
+    """
+
+    def __init__(self, width, height, start, distance):
+        self.width = width
+        self.start = start
+        self.distance = distance
+        sx, sy = start
+        self.cumulative = [] # cumulative[y] = 0〜y 行目の遠いセルの数
+        total = 0
+        for y in range(height):
+            total += width - self._near_count(abs(y - sy), sx)
+            self.cumulative.append(total)
+
+    def _near_count(self, dy, sx):
+        """ある行で「近い」セルの数"""
+        r = self.distance - dy
+        if r < 0:
+            return 0
+        return min(self.width - 1, sx + r) - max(0, sx - r) + 1
+
+    def __len__(self):
+        return self.cumulative[-1] if self.cumulative else 0
+
+    def __getitem__(self, k):
+        """k 番目の遠いセルの座標"""
+        if not 0 <= k < len(self):
+            raise IndexError(k)
+        y = bisect_right(self.cumulative, k)
+        j = k - (self.cumulative[y - 1] if y else 0)
+        sx, sy = self.start
+        r = self.distance - abs(y - sy)
+        if r < 0:
+            return (j, y)
+        left = max(0, sx - r) # 近いセルより左にある遠いセルの数
+        if j < left:
+            return (j, y)
+        return (sx + r + 1 + (j - left), y)
+
+
+def sample_free_cells(width, height, count, exclude, rng=random):
+    """exclude 以外のセルから count 個を重複なしで選ぶ"""
+    excluded = sorted({y * width + x for x, y in exclude})
+    free = width * height - len(excluded)
+    if count > free:
+        raise PlacementError(f"空いているセルが {free} 個しかないのに "
+                             f"{count} 個を配置しようとしました")
+    coords = []
+    for i in rng.sample(range(free), count):
+        # 除外したセルの分だけ番号をずらす
+        for e in excluded:
+            if i >= e:
+                i += 1
+            else:
+                break
+        coords.append((i % width, i // width))
+    return coords
+
+
+def check_placement(width, height, start, num_treasures, num_monsters, orb_distance=None):
+    """place_entities() で置ける数かどうか調べる (置けなければ PlacementError)
+
+    置く前に設定を確かめたいとき用 (乱数は使わない)。FarCells を返す。
+    """
+    if num_treasures < 0 or num_monsters < 0:
+        raise PlacementError(f"宝箱とモンスターの数は 0 以上にしてください "
+                             f"(宝箱 {num_treasures}・モンスター {num_monsters})")
+    if orb_distance is None:
+        orb_distance = default_orb_distance(width, height)
+    far_cells = FarCells(width, height, start, orb_distance)
+    if not far_cells:
+        raise PlacementError(f"{width}x{height} のマップには、スタート地点 {start} "
+                             f"からの距離が {orb_distance} より遠いセルがありません")
+    free = width * height - 2 # スタート地点とオーブのセルを除く
+    if num_treasures + num_monsters > free:
+        raise PlacementError(f"{width}x{height} のマップには宝箱とモンスターを合わせて "
+                             f"{free} 個までしか置けません "
+                             f"(宝箱 {num_treasures}・モンスター {num_monsters})")
+    return far_cells
+
+
+def place_entities(width, height, start, num_treasures, num_monsters,
+                   orb_distance=None, rng=random):
+    """宝箱・モンスター・オーブの座標を決める
+
+    戻り値は (宝箱の座標リスト, モンスターの座標リスト, オーブの座標)。
+    """
+    far_cells = check_placement(width, height, start, num_treasures, num_monsters,
+                                orb_distance)
+    orb_coord = far_cells[rng.randrange(len(far_cells))]
+    coords = sample_free_cells(width, height, num_treasures + num_monsters,
+                               (start, orb_coord), rng)
+    return coords[:num_treasures], coords[num_treasures:], orb_coord
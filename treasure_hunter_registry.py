@@ -0,0 +1,131 @@
+import os
+from array import array
+from collections import namedtuple
+
+# --- アイテムとモンスターの種類の表 ---
+# 種類の定義はデータファイル (treasure_hunter_data.tsv) から読み、
+# 種類ごとに 0 から詰めた番号を振る。効果や HP / ATK は番号で引ける配列にしておくので、
+# ゲームの中では名前の文字列を使わずに番号で扱える。
+# 名前を番号に直す (名前で入力されたアイテムなど) のも、番号を名前に直す (表示) のも、
+# 表示・入力をする側 (UI) だけでよい。
+#
+# 持ち物 (Inventory) はアイテム番号ごとの個数の固定長の配列なので、
+# 拾う・使う・持っているか調べるはどれも O(1) で、アイテムの種類がいくら多くても変わらない。
+
+DATA_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "treasure_hunter_data.tsv")
+
+# アイテム情報を格納する名前付きタプル
+# effect は仮に回復量とする (負の値ならダメージ)
+# id は Registry での番号 (Registry が振る。表にないアイテムは None)
+Item = namedtuple("Item", ["name", "description", "effect", "id"], defaults=[None])
+
+# モンスターの種類 (名前, HP, ATK)
+MonsterType = namedtuple("MonsterType", ["name", "hp", "atk"])
+
+
+class Registry:
+    """アイテムとモンスターの種類に番号を振った表
+
+    items は Item のリスト、monster_types は MonsterType のリストで、並びがそのまま番号になる
+    (items の各 Item の id はその番号に振り直す)。
+    goal はゲームの目的のアイテムの名前 (なければ None)。
+    """
+
+    def __init__(self, items, monster_types, goal=None):
+        self.items = [item._replace(id=i) for i, item in enumerate(items)]
+        self.item_names = [item.name for item in self.items]
+        self.item_ids = {name: i for i, name in enumerate(self.item_names)}
+        if len(self.item_ids) != len(self.items):
+            raise ValueError("アイテムの名前が重複しています")
+        self.item_effects = array("i", [item.effect for item in self.items])
+        self.goal_id = self.item_ids[goal] if goal is not None else -1
+        self.goal_item = self.items[self.goal_id] if goal is not None else None
+        # 宝箱に入れるアイテム (目的のアイテム以外) と、その中で回復するもの
+        self.consumable_ids = [i for i in range(len(self.items)) if i != self.goal_id]
+        self.heal_ids = [i for i in self.consumable_ids if self.item_effects[i] > 0]
+
+        self.monster_types = list(monster_types)
+        self.monster_names = [m.name for m in self.monster_types]
+        self.monster_ids = {name: i for i, name in enumerate(self.monster_names)}
+        self.monster_hp = array("i", [m.hp for m in self.monster_types])
+        self.monster_atk = array("i", [m.atk for m in self.monster_types])
+
+    @classmethod
+    def load(cls, path=DATA_FILE):
+        """データファイルを読む (形式はファイルの先頭のコメントを参照)"""
+        items = []
+        monster_types = []
+        goal = None
+        with open(path, encoding="utf-8") as f:
+            for lineno, line in enumerate(f, 1):
+                line = line.rstrip("\r\n")
+                if not line or line.startswith("#"):
+                    continue
+                fields = line.split("\t")
+                kind = fields[0]
+                try:
+                    if kind in ("item", "goal") and len(fields) == 4:
+                        items.append(Item(fields[1], fields[3], int(fields[2])))
+                        if kind == "goal":
+                            if goal is not None:
+                                raise ValueError("goal は 1 つだけにしてください")
+                            goal = fields[1]
+                    elif kind == "monster" and len(fields) == 4:
+                        monster_types.append(MonsterType(fields[1], int(fields[2]), int(fields[3])))
+                    else:
+                        raise ValueError(f"読めない行です: {line!r}")
+                except ValueError as e:
+                    raise ValueError(f"{path}:{lineno}: {e}") from None
+        return cls(items, monster_types, goal)
+
+    def is_goal(self, item):
+        """item (Item) がゲームの目的のアイテムか"""
+        return item.id is not None and item.id == self.goal_id
+
+    def new_inventory(self):
+        """このアイテムの表の大きさの、空の持ち物"""
+        return Inventory(len(self.items))
+
+    def named(self, inventory):
+        """持ち物を 名前 -> 個数 の dict にする (表示用。番号順)"""
+        names = self.item_names
+        return {names[i]: count for i, count in inventory.items()}
+
+
+class Inventory:
+    """アイテム番号ごとの個数を持つ固定長の配列"""
+    __slots__ = ("counts", "total")
+
+    def __init__(self, size):
+        self.counts = array("I", bytes(4 * size))
+        self.total = 0 # 持っているアイテムの合計の個数
+
+    def __getitem__(self, item_id):
+        return self.counts[item_id]
+
+    def __setitem__(self, item_id, count):
+        self.total += count - self.counts[item_id]
+        self.counts[item_id] = count
+
+    def __bool__(self):
+        return self.total > 0
+
+    def add(self, item_id, count=1):
+        self.counts[item_id] += count
+        self.total += count
+
+    def remove(self, item_id):
+        """1 個減らす (持っていなければ False)"""
+        if not self.counts[item_id]:
+            return False
+        self.counts[item_id] -= 1
+        self.total -= 1
+        return True
+
+    def items(self):
+        """持っているアイテムの (番号, 個数) を番号順に"""
+        return [(i, count) for i, count in enumerate(self.counts) if count]
+
+
+# ゲームで使う表 (データファイルから読む)
+REGISTRY = Registry.load()
@@ -0,0 +1,149 @@
+import random
+import struct
+
+from treasure_hunter_engine import (REGISTRY, MAP_WIDTH, MAP_HEIGHT, NUM_TREASURES, NUM_MONSTERS,
+                                    GameSession, setup_game)
+from treasure_hunter_events import NULL_SINK
+
+# --- 入力の記録とリプレイ ---
+# 1ゲームは「シード + コマンド列」で再現できる。コマンドはほとんど 1 バイト:
+#   移動・戦闘のコマンド (w/a/s/d/x/i/q/r/h) はその文字の ASCII コード、
+#   それ以外の無効な入力は "?"、アイテム名は 0x80 | アイテム番号 (REGISTRY の番号)
+#   (ない名前は 0xFF) で記録する。番号が 1 バイトに収まらないアイテム (126 以上) は
+#   0xFE のあとに 2 バイトの番号を続ける。
+
+MAGIC = b"THRP"
+VERSION = 2 # 1 はアイテム番号 126 以上を記録できなかった (読むのは同じ)
+# マジック, バージョン, シード, 幅, 高さ, 宝箱の数, モンスターの数, コマンド列のバイト数
+HEADER = struct.Struct("<4sBqHHIII")
+LONG_ITEM = struct.Struct("<H")
+SEED_RANGE = range(-2**63, 2**63)
+
+COMMAND_CHARS = "wasdxiqrh"
+INVALID_CODE = ord("?")
+ITEM_FLAG = 0x80
+LONG_ITEM_CODE = 0xFE
+UNKNOWN_ITEM_CODE = 0xFF
+SHORT_ITEM_LIMIT = LONG_ITEM_CODE & ~ITEM_FLAG
+ITEM_NAMES = REGISTRY.item_names
+
+
+def encode_command(command, is_item_name):
+    """コマンド 1 つをバイト列にする"""
+    if is_item_name:
+        item_id = REGISTRY.item_ids.get(command)
+        if item_id is None:
+            return bytes((UNKNOWN_ITEM_CODE,))
+        if item_id < SHORT_ITEM_LIMIT:
+            return bytes((ITEM_FLAG | item_id,))
+        return bytes((LONG_ITEM_CODE,)) + LONG_ITEM.pack(item_id)
+    command = command.lower()
+    if len(command) == 1 and command in COMMAND_CHARS:
+        return bytes((ord(command),))
+    return bytes((INVALID_CODE,))
+
+
+def decode_commands(data):
+    """バイト列をコマンド (またはアイテム名) に戻しながら 1 つずつ返す"""
+    pos = 0
+    while pos < len(data):
+        code = data[pos]
+        pos += 1
+        if code == UNKNOWN_ITEM_CODE:
+            yield "?" # 持っていないアイテムとして扱われる
+        elif code == LONG_ITEM_CODE:
+            if pos + LONG_ITEM.size > len(data):
+                raise ValueError("リプレイのコマンド列が途中で切れています")
+            item_id, = LONG_ITEM.unpack_from(data, pos)
+            pos += LONG_ITEM.size
+            yield ITEM_NAMES[item_id]
+        elif code & ITEM_FLAG:
+            yield ITEM_NAMES[code & ~ITEM_FLAG]
+        else:
+            yield chr(code)
+
+
+class GameRecord:
+    """シードとコマンド列によるゲームの記録 (GameSession の recorder になる)"""
+
+    def __init__(self, seed, commands=b"", width=MAP_WIDTH, height=MAP_HEIGHT,
+                 num_treasures=NUM_TREASURES, num_monsters=NUM_MONSTERS):
+        if seed not in SEED_RANGE:
+            raise ValueError(f"記録できるシードは 64 ビットの整数だけです: {seed}")
+        self.seed = seed
+        self.commands = bytearray(commands)
+        self.count = sum(1 for _ in decode_commands(self.commands))
+        self.width = width
+        self.height = height
+        self.num_treasures = num_treasures
+        self.num_monsters = num_monsters
+
+    def record(self, command, is_item_name):
+        self.commands += encode_command(command, is_item_name)
+        self.count += 1
+
+    def __len__(self):
+        return self.count
+
+    def to_bytes(self):
+        header = HEADER.pack(MAGIC, VERSION, self.seed, self.width, self.height,
+                             self.num_treasures, self.num_monsters, len(self.commands))
+        return header + bytes(self.commands)
+
+    @classmethod
+    def from_bytes(cls, data):
+        magic, version, seed, width, height, num_treasures, num_monsters, length = \
+            HEADER.unpack_from(data)
+        if magic != MAGIC:
+            raise ValueError("リプレイファイルではありません")
+        if version not in (1, VERSION):
+            raise ValueError(f"対応していないリプレイのバージョンです: {version}")
+        commands = data[HEADER.size:HEADER.size + length]
+        return cls(seed, commands, width, height, num_treasures, num_monsters)
+
+    def save(self, path):
+        with open(path, "wb") as f:
+            f.write(self.to_bytes())
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "rb") as f:
+            return cls.from_bytes(f.read())
+
+
+def replay(record, turn=None, events=NULL_SINK):
+    """記録をヘッドレスで再生し、turn 個目のコマンドまで進めた GameSession を返す
+
+    turn を省略すると最後まで再生する。events に PrintSink() を渡せば
+    CLI と同じ表示で確認できる。
+    """
+    rng = random.Random(record.seed)
+    player, game_map, monsters = setup_game(
+        verbose=False, width=record.width, height=record.height,
+        num_treasures=record.num_treasures, num_monsters=record.num_monsters,
+        events=events, rng=rng)
+    session = GameSession(player, game_map, monsters, rng)
+    for i, command in enumerate(decode_commands(record.commands)):
+        if session.finished or i == turn:
+            break
+        session.handle(command)
+    return session
+
+
+if __name__ == "__main__":
+    import argparse
+    from treasure_hunter_events import PrintSink
+
+    parser = argparse.ArgumentParser(description="記録したゲームを再生する")
+    parser.add_argument("file", help="treasure_hunter.py --record で保存したファイル")
+    parser.add_argument("--turn", type=int, help="このコマンド数まで進めて止める")
+    parser.add_argument("--show", action="store_true", help="途中経過を表示する")
+    args = parser.parse_args()
+
+    record = GameRecord.load(args.file)
+    session = replay(record, args.turn, PrintSink() if args.show else NULL_SINK)
+    player = session.player
+    print(f"シード: {record.seed}  コマンド: {session.turns}/{len(record)}")
+    print(f"現在地: ({player.x}, {player.y}) HP: {player.hp}/{player.max_hp} "
+          f"持ち物: {player.named_inventory()}")
+    print(f"状態: {session.outcome or session.mode}")
@@ -0,0 +1,256 @@
+import mmap
+import os
+import random
+import struct
+import sys
+import tempfile
+from array import array
+
+from treasure_hunter_engine import REGISTRY, Item, MapCell, Player, StoredMonster, GameSession
+from treasure_hunter_events import NULL_SINK
+from treasure_hunter_grid import GridMap
+from treasure_hunter_monsters import MonsterStore
+
+# --- セーブデータ (バイナリ形式) ---
+# すべてリトルエンディアン。先頭から順に:
+#   ヘッダ        マジック "THSV", バージョン, 幅, 高さ, セル配列の開始位置
+#   進行状況      プレイヤーの座標・HP・ATK、コマンド数、モード、戦闘中のモンスター番号
+#   乱数の状態    random.Random.getstate() の中身
+#   表            説明文・アイテム・持ち物・モンスター (長さ付き UTF-8 文字列)、
+#                 動いたモンスターの下のセルの説明文番号 (handle, 番号) (バージョン 2 から)
+#   セル配列      monster_ids (u32), item_ids (u16), description_ids (u16), kinds (u8)
+#                 を 8 バイト境界から並べる
+# セル配列は mmap でそのまま読むので、大きなマップでも読み込み時間が増えない。
+# ビッグエンディアンの環境では配列のバイト順を入れ替えて書き、読むときはコピーして
+# 入れ替える (mmap は使わない)。
+# 読み込んだゲームのセル配列はファイルを指したままなので、保存は同じディレクトリの
+# 一時ファイルに書いてから置き換える (同じファイルに上書き保存しても壊れない)。
+
+MAGIC = b"THSV"
+VERSION = 2 # 1 はモンスターの下のセルの説明文番号を持たない (そのまま読める)
+HEADER = struct.Struct("<4sHIIQ")
+PROGRESS = struct.Struct("<iiiiiIBBI")
+RNG_HEADER = struct.Struct("<BBd")
+MONSTER = struct.Struct("<iiiiB")
+U32 = struct.Struct("<I")
+UNDER = struct.Struct("<II")
+I32 = struct.Struct("<i")
+
+# これ以上のセル数なら mmap で読む (小さいマップは普通に読んだほうが速い)
+MMAP_THRESHOLD = 1 << 16
+# 配列 (セル配列と乱数の状態) のバイト順をファイルのリトルエンディアンと入れ替えるか
+SWAP_BYTES = sys.byteorder != "little"
+
+MODES = [GameSession.MODE_EXPLORE, GameSession.MODE_COMBAT,
+         GameSession.MODE_ITEM, GameSession.MODE_OVER]
+OUTCOMES = [None, "win", "loss", "quit"]
+
+
+def _pack_str(out, text):
+    data = text.encode("utf-8")
+    out += U32.pack(len(data))
+    out += data
+
+
+def _unpack_str(data, offset):
+    (length,) = U32.unpack_from(data, offset)
+    offset += U32.size
+    return bytes(data[offset:offset + length]).decode("utf-8"), offset + length
+
+
+def _little_endian(a):
+    """array をファイルにそのまま書ける (リトルエンディアンの) 形にする"""
+    if SWAP_BYTES:
+        a = array(a.typecode, a)
+        a.byteswap()
+    return a
+
+
+def save_game(path, session):
+    """GameSession の状態をまるごと保存する"""
+    player = session.player
+    game_map = session.game_map
+
+    out = bytearray(HEADER.size) # 最後に書き込む
+    mode = MODES.index(session.mode)
+    return_mode = MODES.index(session.item_return_mode) if session.item_return_mode else 0
+    monster_id = game_map.monster_id(session.monster) if session.monster else 0
+    out += PROGRESS.pack(player.x, player.y, player.hp, player.max_hp, player.atk,
+                         session.turns, mode * 16 + return_mode,
+                         OUTCOMES.index(session.outcome), monster_id)
+
+    # 乱数 (Mersenne Twister の 625 個の状態と gauss の予備)
+    version, state, gauss = session.rng.getstate()
+    out += RNG_HEADER.pack(version, gauss is not None, gauss or 0.0)
+    out += _little_endian(array("I", state)).tobytes()
+
+    out += U32.pack(len(game_map.descriptions))
+    for desc in game_map.descriptions:
+        _pack_str(out, desc)
+    out += U32.pack(len(game_map.items) - 1)
+    for item in game_map.items[1:]:
+        _pack_str(out, item.name)
+        _pack_str(out, item.description)
+        out += I32.pack(item.effect)
+    # 持ち物は番号ではなく名前で保存する (データファイルの並びが変わっても読めるように)
+    inventory = player.named_inventory()
+    out += U32.pack(len(inventory))
+    for name, count in inventory.items():
+        _pack_str(out, name)
+        out += U32.pack(count)
+    # 番号を振ったモンスターをすべて、番号順に (倒されたものは名前だけ)
+    alive = set(session.monsters)
+    registry = game_map.registered_monsters()
+    out += U32.pack(len(registry))
+    for monster in registry:
+        _pack_str(out, monster.name)
+        if monster in alive:
+            out += MONSTER.pack(monster.hp, monster.atk, monster.x, monster.y, True)
+        else:
+            out += MONSTER.pack(0, 0, 0, 0, False)
+    slots = game_map.monster_store.slots if game_map.monster_store is not None else None
+    under = [(handle, desc_id) for handle, desc_id in sorted(session.monster_under.items())
+             if slots is None or slots[handle] >= 0]
+    out += U32.pack(len(under))
+    for handle, desc_id in under:
+        out += UNDER.pack(handle, desc_id)
+
+    out += bytes(-len(out) % 8)
+    HEADER.pack_into(out, 0, MAGIC, VERSION, game_map.width, game_map.height, len(out))
+    fd, tmp_path = tempfile.mkstemp(prefix=".treasure_hunter_save_",
+                                    dir=os.path.dirname(os.path.abspath(path)))
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(out)
+            for a in (game_map.monster_ids, game_map.item_ids,
+                      game_map.description_ids, game_map.kinds):
+                f.write(_little_endian(a))
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+
+def load_game(path, events=NULL_SINK, use_mmap=None):
+    """save_game() で保存した状態から GameSession を作る
+
+    use_mmap を省略すると、セル数が MMAP_THRESHOLD 以上のときに
+    セル配列をコピーせず mmap (書き込みはファイルに反映されない) で読む
+    (ビッグエンディアンの環境ではいつもコピーする)。
+    セーブデータでないファイルや途中で切れたファイルは ValueError。
+    """
+    with open(path, "rb") as f:
+        header = f.read(HEADER.size)
+        if len(header) < HEADER.size:
+            raise ValueError("セーブデータが途中で切れています")
+        magic, version, width, height, cells_offset = HEADER.unpack(header)
+        if magic != MAGIC:
+            raise ValueError("セーブデータではありません")
+        if version not in (1, VERSION):
+            raise ValueError(f"対応していないセーブデータのバージョンです: {version}")
+        size = width * height
+        if os.fstat(f.fileno()).st_size < cells_offset + 9 * size:
+            raise ValueError("セーブデータが途中で切れています")
+        if use_mmap is None:
+            use_mmap = size >= MMAP_THRESHOLD
+        if SWAP_BYTES:
+            use_mmap = False
+        if use_mmap:
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY)
+        else:
+            f.seek(0)
+            data = f.read()
+    view = memoryview(data)
+
+    offset = HEADER.size
+    x, y, hp, max_hp, atk, turns, modes, outcome, monster_id = PROGRESS.unpack_from(view, offset)
+    offset += PROGRESS.size
+
+    rng_version, has_gauss, gauss = RNG_HEADER.unpack_from(view, offset)
+    offset += RNG_HEADER.size
+    state = array("I")
+    state.frombytes(view[offset:offset + 625 * 4])
+    if SWAP_BYTES:
+        state.byteswap()
+    offset += 625 * 4
+    rng = random.Random()
+    rng.setstate((rng_version, tuple(state), gauss if has_gauss else None))
+
+    (count,) = U32.unpack_from(view, offset)
+    offset += U32.size
+    descriptions = []
+    for _ in range(count):
+        desc, offset = _unpack_str(view, offset)
+        descriptions.append(desc)
+    (count,) = U32.unpack_from(view, offset)
+    offset += U32.size
+    items = [None] # アイテムの番号 (Item.id) はデータファイルの表から名前で引き直す
+    for _ in range(count):
+        name, offset = _unpack_str(view, offset)
+        description, offset = _unpack_str(view, offset)
+        (effect,) = I32.unpack_from(view, offset)
+        offset += I32.size
+        items.append(Item(name, description, effect, REGISTRY.item_ids.get(name)))
+    (count,) = U32.unpack_from(view, offset)
+    offset += U32.size
+    inventory = []
+    for _ in range(count):
+        name, offset = _unpack_str(view, offset)
+        inventory.append((name, U32.unpack_from(view, offset)[0]))
+        offset += U32.size
+    (count,) = U32.unpack_from(view, offset)
+    offset += U32.size
+    # 番号順に追加するので handle + 1 がセル配列の番号と一致する
+    monsters = MonsterStore(StoredMonster)
+    dead = []
+    for _ in range(count):
+        name, offset = _unpack_str(view, offset)
+        m_hp, m_atk, m_x, m_y, in_list = MONSTER.unpack_from(view, offset)
+        offset += MONSTER.size
+        monster = monsters.add(name, m_hp, m_atk, m_x, m_y)
+        if not in_list:
+            dead.append(monster)
+    for monster in dead:
+        monsters.remove(monster)
+    under = {}
+    if version >= 2:
+        (count,) = U32.unpack_from(view, offset)
+        offset += U32.size
+        for _ in range(count):
+            handle, desc_id = UNDER.unpack_from(view, offset)
+            offset += UNDER.size
+            under[handle] = desc_id
+
+    # セル配列
+    arrays = []
+    offset = cells_offset
+    for typecode, itemsize in (("I", 4), ("H", 2), ("H", 2), ("B", 1)):
+        chunk = view[offset:offset + size * itemsize]
+        if use_mmap:
+            arrays.append(chunk.cast(typecode))
+        else:
+            a = array(typecode)
+            a.frombytes(chunk)
+            if SWAP_BYTES:
+                a.byteswap()
+            arrays.append(a)
+        offset += size * itemsize
+    monster_ids, item_ids, description_ids, kinds = arrays
+    game_map = GridMap.from_arrays(width, height, MapCell, kinds, item_ids, monster_ids,
+                                   description_ids, descriptions, items, monster_store=monsters)
+
+    player = Player(x, y, max_hp, atk, events)
+    player.hp = hp
+    for name, item_count in inventory:
+        item_id = player.registry.item_ids.get(name)
+        if item_id is None:
+            raise ValueError(f"セーブデータに知らないアイテムがあります: {name}")
+        player.inventory[item_id] = item_count
+    session = GameSession(player, game_map, monsters, rng, start=False)
+    session.turns = turns
+    session.mode = MODES[modes // 16]
+    session.item_return_mode = MODES[modes % 16] if session.mode == GameSession.MODE_ITEM else None
+    session.outcome = OUTCOMES[outcome]
+    session.monster = monsters.view(monster_id - 1) if monster_id else None
+    session.monster_under = under
+    return session
@@ -0,0 +1,250 @@
+import asyncio
+import random
+import time
+from collections import deque
+
+from treasure_hunter_engine import (MAP_WIDTH, MAP_HEIGHT, NUM_TREASURES, NUM_MONSTERS,
+                                    GameSession, setup_game)
+from treasure_hunter_events import TextSink
+
+# --- ゲームサーバー ---
+# 1 プロセスで多数のゲームを同時に遊べるようにする asyncio の TCP サーバー。
+# プロトコルは 1 行 1 コマンド (UTF-8)。コマンドは CLI とまったく同じで、
+# サーバーは CLI と同じ表示を返したあと、入力待ちの案内を 1 行で送る。
+#   $ nc localhost 4000
+# 入力を待つあいだは接続ごとのコルーチンが止まっているだけなので、
+# input() のように他のプレイヤーを待たせることはない。
+
+DEFAULT_PORT = 4000
+DEFAULT_IDLE_TIMEOUT = 300.0 # これだけ入力がなければ切断する (秒)
+DEFAULT_MAX_SESSIONS = 10000
+# 送信バッファがこれを超えたら、相手が読むまでコマンドを受け付けない
+WRITE_BUFFER_HIGH = 64 * 1024
+LINE_LIMIT = 1024 # 1 行の最大バイト数
+LATENCY_SAMPLES = 100_000 # 遅延の統計に使う直近のコマンド数
+
+# 入力待ちの案内 (クライアントはこの行が来たら応答の終わりとみなせる)
+PROMPT_LINES = {prompt.strip() for prompt in GameSession.PROMPTS.values() if prompt}
+
+
+class ClientSession:
+    """接続 1 つ分の状態 (ゲームと最後に入力があった時刻)"""
+    __slots__ = ("session", "sink", "writer", "seed", "last_active")
+
+    def __init__(self, session, sink, writer, seed):
+        self.session = session
+        self.sink = sink
+        self.writer = writer
+        self.seed = seed
+        self.last_active = time.monotonic()
+
+
+class GameServer:
+    """GameSession をたくさん抱えるサーバー
+
+    max_sessions を超える接続は断る。idle_timeout 秒入力のないセッションは
+    reap_idle() が切断する。相手が受信しないまま送信バッファが
+    WRITE_BUFFER_HIGH を超えると、その接続のコマンドの処理を止めて待つ。
+    """
+
+    def __init__(self, max_sessions=DEFAULT_MAX_SESSIONS, idle_timeout=DEFAULT_IDLE_TIMEOUT,
+                 width=MAP_WIDTH, height=MAP_HEIGHT,
+                 num_treasures=NUM_TREASURES, num_monsters=NUM_MONSTERS):
+        self.max_sessions = max_sessions
+        self.idle_timeout = idle_timeout
+        self.world_options = dict(width=width, height=height,
+                                  num_treasures=num_treasures, num_monsters=num_monsters)
+        self.clients = set()
+        self.tasks = set() # 接続ごとのコルーチンのタスク
+        self.latencies = deque(maxlen=LATENCY_SAMPLES) # コマンド 1 つの処理時間 (秒)
+        self.rejected = 0
+        self.evicted = 0
+        self.server = None
+        self._reaper = None
+
+    async def start(self, host="127.0.0.1", port=DEFAULT_PORT):
+        """待ち受けを始める (port=0 なら空いているポート)"""
+        # 一度に大量の接続が来ても取りこぼさないよう、待ち行列は長めにとる
+        self.server = await asyncio.start_server(self.handle_client, host, port, limit=LINE_LIMIT,
+                                                 backlog=min(max(self.max_sessions, 100), 4096))
+        self._reaper = asyncio.create_task(self.reap_idle())
+        return self.server
+
+    @property
+    def port(self):
+        return self.server.sockets[0].getsockname()[1]
+
+    async def close(self):
+        """待ち受けをやめ、すべての接続を切って終わるのを待つ"""
+        self._reaper.cancel()
+        self.server.close()
+        for client in list(self.clients):
+            client.writer.close()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        await self.server.wait_closed()
+
+    def new_session(self, writer):
+        seed = random.randrange(2**32)
+        rng = random.Random(seed)
+        sink = TextSink()
+        player, game_map, monsters = setup_game(verbose=False, events=sink, rng=rng,
+                                                **self.world_options)
+        session = GameSession(player, game_map, monsters, rng)
+        return ClientSession(session, sink, writer, seed)
+
+    @staticmethod
+    def response(client):
+        """たまった表示と次の入力待ちの案内をまとめて 1 つの送信データにする"""
+        text = client.sink.take()
+        prompt = client.session.prompt().strip()
+        if prompt:
+            text = f"{text}\n{prompt}" if text else prompt
+        return (text + "\n").encode("utf-8")
+
+    async def handle_client(self, reader, writer):
+        if len(self.clients) >= self.max_sessions:
+            self.rejected += 1
+            writer.write("満員です。しばらくしてから接続してください。\n".encode("utf-8"))
+            writer.close()
+            return
+        writer.transport.set_write_buffer_limits(high=WRITE_BUFFER_HIGH)
+        client = self.new_session(writer)
+        self.clients.add(client)
+        task = asyncio.current_task()
+        self.tasks.add(task)
+        try:
+            writer.write((f"シード: {client.seed}\n"
+                          "ようこそ『コレクト・トレジャーハンター』へ！\n"
+                          "洞窟を探検し、「伝説のオーブ」を見つけ出そう。\n").encode("utf-8"))
+            writer.write(self.response(client))
+            await writer.drain()
+            session = client.session
+            while not session.finished:
+                try:
+                    line = await reader.readline()
+                except (ValueError, asyncio.LimitOverrunError):
+                    break # 長すぎる行
+                if not line:
+                    break # 切断 (か、放置で追い出された)
+                start = time.perf_counter()
+                client.last_active = time.monotonic()
+                session.handle(line.decode("utf-8", "replace").strip())
+                writer.write(self.response(client))
+                self.latencies.append(time.perf_counter() - start)
+                # 送信バッファがあふれていれば、相手が読むまでここで止まる (背圧)
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            self.clients.discard(client)
+            self.tasks.discard(task)
+            writer.close()
+
+    async def reap_idle(self):
+        """idle_timeout 秒以上入力のない接続を定期的に切る"""
+        interval = max(min(self.idle_timeout / 4, 5.0), 0.01)
+        while True:
+            await asyncio.sleep(interval)
+            deadline = time.monotonic() - self.idle_timeout
+            for client in [c for c in self.clients if c.last_active < deadline]:
+                self.evicted += 1
+                self.clients.discard(client)
+                client.writer.write("長いあいだ入力がなかったので切断した。\n".encode("utf-8"))
+                client.writer.close()
+
+    def latency_stats(self):
+        """コマンド 1 つの処理時間の統計 (ミリ秒)"""
+        samples = sorted(self.latencies)
+        if not samples:
+            return {"count": 0}
+        n = len(samples)
+        return {
+            "count": n,
+            "p50_ms": samples[n // 2] * 1000,
+            "p99_ms": samples[min(n - 1, n * 99 // 100)] * 1000,
+            "max_ms": samples[-1] * 1000,
+        }
+
+
+# --- 負荷試験 ---
+
+async def _bench_client(host, port, commands, rng, round_trips):
+    """1 つの接続でランダムなコマンドを送り、応答が返るまでの時間を記録する"""
+    reader, writer = await asyncio.open_connection(host, port, limit=1 << 20)
+
+    async def read_response():
+        while True:
+            line = await reader.readline()
+            if not line:
+                return False
+            if line.decode("utf-8").strip() in PROMPT_LINES:
+                return True
+
+    try:
+        if not await read_response():
+            return
+        for _ in range(commands):
+            start = time.perf_counter()
+            writer.write((rng.choice("wasdxar") + "\n").encode("utf-8"))
+            alive = await read_response()
+            round_trips.append(time.perf_counter() - start)
+            if not alive:
+                return # ゲームが終わった
+    finally:
+        writer.close()
+        await writer.wait_closed()
+
+
+async def run_bench(clients=1000, commands=20, **server_options):
+    """localhost でサーバーを立て、clients 個の同時接続から commands 個ずつ送る"""
+    server = GameServer(**server_options)
+    await server.start("127.0.0.1", 0)
+    rng = random.Random(0)
+    round_trips = []
+    start = time.perf_counter()
+    await asyncio.gather(*[
+        _bench_client("127.0.0.1", server.port, commands, random.Random(rng.random()), round_trips)
+        for _ in range(clients)])
+    elapsed = time.perf_counter() - start
+    await server.close()
+
+    round_trips.sort()
+    n = len(round_trips)
+    print(f"{clients} 接続 / {n} コマンド / {elapsed:.2f} 秒 ({n / elapsed:,.0f} コマンド/秒)")
+    print("サーバー内の処理時間: " + ", ".join(
+        f"{k}={v:.3f}" if isinstance(v, float) else f"{k}={v}"
+        for k, v in server.latency_stats().items()))
+    if n:
+        print(f"往復時間: p50={round_trips[n // 2] * 1000:.2f}ms "
+              f"p99={round_trips[min(n - 1, n * 99 // 100)] * 1000:.2f}ms")
+
+
+async def serve(host, port, **server_options):
+    server = GameServer(**server_options)
+    await server.start(host, port)
+    print(f"{host}:{server.port} で待ち受け中 (Ctrl+C で終了)")
+    async with server.server:
+        await server.server.serve_forever()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="コレクト・トレジャーハンターのゲームサーバー")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--max-sessions", type=int, default=DEFAULT_MAX_SESSIONS)
+    parser.add_argument("--idle-timeout", type=float, default=DEFAULT_IDLE_TIMEOUT)
+    parser.add_argument("--bench", type=int, metavar="N",
+                        help="サーバーを立てずに、N 個の同時接続で負荷試験をする")
+    parser.add_argument("--commands", type=int, default=20, help="負荷試験で 1 接続が送るコマンド数")
+    args = parser.parse_args()
+
+    options = dict(max_sessions=args.max_sessions, idle_timeout=args.idle_timeout)
+    if args.bench:
+        asyncio.run(run_bench(args.bench, args.commands, **options))
+    else:
+        try:
+            asyncio.run(serve(args.host, args.port, **options))
+        except KeyboardInterrupt:
+            pass
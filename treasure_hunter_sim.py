@@ -0,0 +1,475 @@
+import random
+import time
+from collections import namedtuple
+
+from treasure_hunter_engine import (REGISTRY, MONSTER_TYPES, MAP_WIDTH, MAP_HEIGHT,
+                                    INITIAL_PLAYER_HP, INITIAL_PLAYER_ATK,
+                                    NUM_TREASURES, NUM_MONSTERS)
+from treasure_hunter_placement import place_entities
+from treasure_hunter_solver import DEFAULT_FLEE_VALUE, HEAL_ITEMS, best_action
+
+# --- ヘッドレス・シミュレーション ---
+# input() も print() も使わずに 1 ゲームを最後まで進める。
+# バランス調整用に大量のゲームを回すためのエンジン。
+
+# 1ゲーム分の結果 (outcome は OUTCOME_* のどれか)
+GameResult = namedtuple("GameResult", ["outcome", "turns", "hp", "items_used"])
+
+OUTCOME_WIN = "win"
+OUTCOME_LOSS = "loss"
+OUTCOME_QUIT = "quit"
+
+# アイテムは番号で扱う (0 は「何もない」なので、REGISTRY のアイテム番号 + 1)
+ITEM_TABLE = [None] + REGISTRY.items
+ITEM_CODES = {item.name: code for code, item in enumerate(ITEM_TABLE) if item}
+ORB_CODE = REGISTRY.goal_id + 1 # 目的のアイテム (伝説のオーブ)
+CONSUMABLE_CODES = [code for code in range(1, len(ITEM_TABLE)) if code != ORB_CODE]
+# アイテム番号ごとの HP の増減 (バランス調整では SimState ごとに差し替えられる)
+ITEM_EFFECTS = [0] + [item.effect for item in ITEM_TABLE[1:]]
+
+# 移動コマンド -> (dx, dy)
+MOVES = {"w": (0, -1), "s": (0, 1), "a": (-1, 0), "d": (1, 0)}
+
+DEFAULT_MAX_TURNS = 1000
+THROUGHPUT_TARGET = 100_000 # 5x5 のゲームを 1 コアで 1 秒あたり何ゲーム回したいか
+ORB_TRIES = 32 # オーブの場所を乱数で引き直す回数 (だめなら place_entities() で選び直す)
+
+
+class SimState:
+    """シミュレーション中のゲーム状態 (ポリシーに渡される)
+
+    cells はマップを 1 次元にしたリスト。値が正ならアイテム番号、
+    負なら -(モンスター番号 + 1)、0 なら何もない。orb_x, orb_y はオーブの座標。
+    item_effects はアイテム番号ごとの HP の増減 (省略すると ITEM_EFFECTS)。
+    """
+    __slots__ = ("width", "height", "cells", "monster_hp", "monster_atk",
+                 "orb", "orb_x", "orb_y", "x", "y", "hp", "max_hp", "atk", "inventory",
+                 "items_used", "turns", "item_effects")
+
+    def __init__(self, width, height, cells, monster_hp, monster_atk, orb,
+                 hp=INITIAL_PLAYER_HP, atk=INITIAL_PLAYER_ATK, item_effects=ITEM_EFFECTS):
+        self.width = width
+        self.height = height
+        self.max_hp = hp
+        self.atk = atk
+        self.item_effects = item_effects
+        self.reset(cells, monster_hp, monster_atk, orb)
+
+    def reset(self, cells, monster_hp, monster_atk, orb):
+        """新しい配置のゲームの始めに戻す (run_games() は 1 つの SimState を使い回す)"""
+        self.cells = cells
+        self.monster_hp = monster_hp
+        self.monster_atk = monster_atk
+        self.orb = orb
+        self.orb_y, self.orb_x = divmod(orb, self.width)
+        self.x = 0
+        self.y = 0
+        self.hp = self.max_hp
+        self.inventory = [0] * len(ITEM_TABLE) # アイテム番号ごとの個数
+        self.items_used = 0
+        self.turns = 0
+
+
+_far_cells_cache = {}
+
+def _far_cells(width, height):
+    """オーブを置いてよいセル番号の一覧 (マップの大きさごとに一度だけ作る)"""
+    key = (width, height)
+    if key not in _far_cells_cache:
+        far = (width + height) // 3
+        _far_cells_cache[key] = [y * width + x for y in range(height)
+                                 for x in range(width) if x + y > far]
+    return _far_cells_cache[key]
+
+
+_step_tables = {}
+
+def _step_table(width, height):
+    """セル番号 -> {移動コマンド: 行き先のセル番号} のリスト (マップの外へは動かない)
+
+    マップの大きさごとに一度だけ作る。x, y はセル番号ごとの座標。
+    """
+    key = (width, height)
+    if key not in _step_tables:
+        steps = []
+        for i in range(width * height):
+            x, y = i % width, i // width
+            to = {}
+            for action, (dx, dy) in MOVES.items():
+                nx, ny = x + dx, y + dy
+                to[action] = ny * width + nx if 0 <= nx < width and 0 <= ny < height else i
+            steps.append(to)
+        xs = [i % width for i in range(width * height)]
+        ys = [i // width for i in range(width * height)]
+        _step_tables[key] = (steps, xs, ys)
+    return _step_tables[key]
+
+
+def _placer(rng, width, height, num_treasures, num_monsters, monster_types):
+    """新しいゲームを始める関数を作る (SimState に新しい配置を置き、プレイヤーを初めに戻す)
+
+    1 ゲームごとに変わらないもの (乱数のメソッド、表、オーブを置けるセル) は
+    ここで一度だけ用意しておく。1回の乱数で位置と種類を決める:
+    [0, セル数 × 種類数) の整数 k の商が位置、余りが種類 (k ごとの表を引く)。
+    マップの半分以上が埋まる設定や、オーブを置ける遠いセルがほとんど埋まった
+    小さいマップでは引き直しが増えるので、place_entities() で重複なしに選ぶ
+    (置けない設定なら PlacementError)。
+    """
+    if 2 * (num_treasures + num_monsters + 1) > width * height:
+        return lambda state: state.reset(*_place_dense(rng, width, height, num_treasures,
+                                                       num_monsters, monster_types))
+    rnd = rng.random
+    size = width * height
+    n_consumables = len(CONSUMABLE_CODES)
+    treasure_scale = size * n_consumables
+    treasure_cell = [k // n_consumables for k in range(treasure_scale)]
+    treasure_code = [CONSUMABLE_CODES[k % n_consumables] for k in range(treasure_scale)]
+    n_types = len(monster_types)
+    monster_scale = size * n_types
+    monster_cell = [k // n_types for k in range(monster_scale)]
+    monster_hp_of = [monster_types[k % n_types][1] for k in range(monster_scale)]
+    monster_atk_of = [monster_types[k % n_types][2] for k in range(monster_scale)]
+    no_monsters = [0] * num_monsters
+    far_cells = _far_cells(width, height)
+    n_far = len(far_cells)
+    empty = [0] * size
+    empty[0] = 1 # 開始位置 (0, 0) は埋まっている扱い (配置が終わったら 0 に戻す)
+    treasures = range(num_treasures)
+    monsters = range(num_monsters)
+    orb_tries = range(ORB_TRIES if n_far else 0)
+    n_items = len(ITEM_TABLE)
+
+    def place(state):
+        cells = empty[:]
+        for _ in treasures:
+            k = int(rnd() * treasure_scale)
+            while cells[treasure_cell[k]]:
+                k = int(rnd() * treasure_scale)
+            cells[treasure_cell[k]] = treasure_code[k]
+
+        monster_hp = no_monsters[:]
+        monster_atk = no_monsters[:]
+        for n in monsters:
+            k = int(rnd() * monster_scale)
+            while cells[monster_cell[k]]:
+                k = int(rnd() * monster_scale)
+            cells[monster_cell[k]] = ~n
+            monster_hp[n] = monster_hp_of[k]
+            monster_atk[n] = monster_atk_of[k]
+
+        # オーブはスタート地点からマンハッタン距離で遠い場所に置く
+        for _ in orb_tries:
+            i = far_cells[int(rnd() * n_far)]
+            if not cells[i]:
+                cells[0] = 0
+                cells[i] = ORB_CODE
+                # SimState.reset() と同じ (1 ゲームごとの呼び出しを省くためにここに展開)
+                state.cells = cells
+                state.monster_hp = monster_hp
+                state.monster_atk = monster_atk
+                state.orb = i
+                state.orb_y, state.orb_x = divmod(i, width)
+                state.x = 0
+                state.y = 0
+                state.hp = state.max_hp
+                state.inventory = [0] * n_items
+                state.items_used = 0
+                state.turns = 0
+                return
+        state.reset(*_place_dense(rng, width, height, num_treasures, num_monsters,
+                                  monster_types))
+    return place
+
+
+def _place_dense(rng, width, height, num_treasures, num_monsters, monster_types):
+    """エンティティの多いマップ用の配置 (place_entities() で重複なしに選ぶ)"""
+    rnd = rng.random
+    treasure_coords, monster_coords, (ox, oy) = place_entities(
+        width, height, (0, 0), num_treasures, num_monsters, rng=rng)
+    cells = [0] * (width * height)
+    for x, y in treasure_coords:
+        cells[y * width + x] = CONSUMABLE_CODES[int(rnd() * len(CONSUMABLE_CODES))]
+    monster_hp = []
+    monster_atk = []
+    for n, (x, y) in enumerate(monster_coords):
+        _, m_hp, m_atk = monster_types[int(rnd() * len(monster_types))]
+        monster_hp.append(m_hp)
+        monster_atk.append(m_atk)
+        cells[y * width + x] = ~n
+    orb = oy * width + ox
+    cells[orb] = ORB_CODE
+    return cells, monster_hp, monster_atk, orb
+
+
+def generate_world(rng=random, width=MAP_WIDTH, height=MAP_HEIGHT,
+                   num_treasures=NUM_TREASURES, num_monsters=NUM_MONSTERS,
+                   hp=INITIAL_PLAYER_HP, atk=INITIAL_PLAYER_ATK, monster_types=MONSTER_TYPES,
+                   item_effects=ITEM_EFFECTS):
+    """setup_game() と同じルールで配置した SimState を作る
+
+    hp 以降はバランス調整用で、プレイヤーの HP / ATK、(名前, HP, ATK) の
+    モンスターの種類、アイテム番号ごとの効果を差し替える。
+    たくさん作るなら run_games() のほうが速い (準備を 1 回で済ませる)。
+    """
+    state = SimState(width, height, None, None, None, -1, hp, atk, item_effects)
+    _placer(rng, width, height, num_treasures, num_monsters, monster_types)(state)
+    return state
+
+
+def world_from_setup(player, game_map, monsters, width=MAP_WIDTH, height=MAP_HEIGHT):
+    """setup_game() の戻り値を SimState に変換する"""
+    cells = [0] * (width * height)
+    monster_hp = []
+    monster_atk = []
+    orb = -1
+    for y in range(height):
+        for x in range(width):
+            if (x, y) not in game_map:
+                continue
+            cell = game_map[(x, y)]
+            i = y * width + x
+            if cell.item:
+                cells[i] = cell.item.id + 1
+                if cells[i] == ORB_CODE:
+                    orb = i
+            elif cell.monster and cell.monster.is_alive():
+                monster_hp.append(cell.monster.hp)
+                monster_atk.append(cell.monster.atk)
+                cells[i] = -len(monster_hp)
+    state = SimState(width, height, cells, monster_hp, monster_atk, orb,
+                     player.hp, player.atk)
+    state.x, state.y = player.x, player.y
+    state.max_hp = player.max_hp
+    for item_id, count in player.inventory.items():
+        state.inventory[item_id + 1] = count
+    return state
+
+
+# --- ポリシー ---
+# move(state) は "w"/"a"/"s"/"d"/"i"/"q" を、fight(state, monster) は
+# "a"/"i"/"r" を、item(state) は使うアイテム番号 (使わないなら 0) を返す。
+
+class GreedyPolicy:
+    """オーブへまっすぐ向かい、出会ったモンスターとは戦うポリシー"""
+
+    def __init__(self, potion_below=10):
+        self.potion_below = potion_below
+
+    def move(self, state):
+        ox = state.orb_x
+        if state.x < ox:
+            return "d"
+        if state.x > ox:
+            return "a"
+        return "s" if state.y < state.orb_y else "w"
+
+    def fight(self, state, monster):
+        if state.hp < self.potion_below and self.item(state):
+            return "i"
+        return "a"
+
+    def item(self, state):
+        inventory = state.inventory
+        for code in CONSUMABLE_CODES:
+            if inventory[code] and state.item_effects[code] > 0:
+                return code
+        return 0
+
+
+class RandomPolicy:
+    """ランダムに歩き回り、戦闘では半々で戦うか逃げるポリシー"""
+
+    def __init__(self, rng=random):
+        self.rng = rng
+
+    def move(self, state):
+        return "wasd"[int(self.rng.random() * 4)]
+
+    def fight(self, state, monster):
+        return "a" if self.rng.random() < 0.5 else "r"
+
+    def item(self, state):
+        return 0
+
+
+class OraclePolicy(GreedyPolicy):
+    """オーブへまっすぐ向かい、戦闘では treasure_hunter_solver の最善の行動をとるポリシー"""
+
+    def __init__(self, flee_value=DEFAULT_FLEE_VALUE):
+        super().__init__()
+        self.flee_value = flee_value
+        self.heal_codes = [ITEM_CODES[name] for name in HEAL_ITEMS]
+        self.next_item = 0 # fight() が選んだアイテム (item() で返す)
+
+    def fight(self, state, monster):
+        inventory = tuple(state.inventory[code] for code in self.heal_codes)
+        action = best_action(state.hp, state.atk, state.monster_hp[monster],
+                             state.monster_atk[monster], inventory, state.max_hp,
+                             self.flee_value).action
+        if action in ITEM_CODES:
+            self.next_item = ITEM_CODES[action]
+            return "i"
+        return action
+
+    def item(self, state):
+        code = self.next_item
+        self.next_item = 0
+        return code
+
+
+# --- エンジン本体 ---
+
+def _use_item(state, code):
+    """アイテムを使う (持っていなければ何もしない)"""
+    if code <= 0 or not state.inventory[code]:
+        return
+    state.inventory[code] -= 1
+    state.items_used += 1
+    state.hp += state.item_effects[code]
+    if state.hp > state.max_hp:
+        state.hp = state.max_hp
+
+
+def run_game(policy, rng=random, state=None, max_turns=DEFAULT_MAX_TURNS):
+    """1ゲームを最後まで進めて GameResult を返す
+
+    ルールは game_loop() と同じ。turns は入力したコマンドの数で、
+    max_turns を超えたら「やめる」扱いにする (state.turns は終了時に更新)。
+    """
+    if state is None:
+        state = generate_world(rng)
+    return _game_runner(policy, rng, max_turns)(state)
+
+
+def _game_runner(policy, rng, max_turns):
+    """SimState を 1 ゲーム進めて GameResult を返す関数を作る
+
+    ポリシーのメソッドや乱数はゲームごとに変わらないので、ここで一度だけ取り出しておく。
+    """
+    rnd = rng.random
+    choose_move = policy.move
+    choose_fight = policy.fight
+    choose_item = policy.item
+    new_result = tuple.__new__ # GameResult(...) より速い (namedtuple の __new__ を通らない)
+
+    def play(state):
+        cells = state.cells
+        width = state.width
+        steps, xs, ys = _step_table(width, state.height)
+        monster_hp = state.monster_hp
+        monster_atk = state.monster_atk
+        inventory = state.inventory
+        atk = state.atk
+        lo = atk // 2
+        span = atk - lo + 1
+        turns = state.turns
+        i = state.y * width + state.x
+        outcome = OUTCOME_QUIT
+
+        while turns < max_turns:
+            code = cells[i]
+
+            # --- 現在地のイベント処理 ---
+            if code > 0:
+                inventory[code] += 1
+                if code == ORB_CODE:
+                    outcome = OUTCOME_WIN
+                    break
+                cells[i] = 0
+            elif code < 0:
+                m = ~code
+                m_atk = monster_atk[m]
+                m_lo = m_atk // 2
+                m_span = m_atk - m_lo + 1
+                while turns < max_turns:
+                    action = choose_fight(state, m)
+                    turns += 1
+                    if action == "a":
+                        monster_hp[m] -= lo + int(rnd() * span)
+                        if monster_hp[m] <= 0:
+                            cells[i] = 0
+                            break
+                    elif action == "i":
+                        _use_item(state, choose_item(state))
+                        if state.hp <= 0:
+                            break
+                    elif action == "r":
+                        if rnd() < 0.5:
+                            break
+                    else:
+                        continue
+                    state.hp -= m_lo + int(rnd() * m_span)
+                    if state.hp <= 0:
+                        break
+                if state.hp <= 0:
+                    outcome = OUTCOME_LOSS
+                    break
+                if turns >= max_turns:
+                    break
+
+            # --- プレイヤーの行動選択 ---
+            action = choose_move(state)
+            turns += 1
+            to = steps[i].get(action)
+            if to is not None:
+                if to != i:
+                    i = to
+                    state.x = xs[i]
+                    state.y = ys[i]
+            elif action == "i":
+                _use_item(state, choose_item(state))
+                if state.hp <= 0:
+                    outcome = OUTCOME_LOSS
+                    break
+            elif action == "q":
+                break
+
+        state.turns = turns
+        return new_result(GameResult, (outcome, turns, state.hp, state.items_used))
+    return play
+
+
+def run_games(policy, n_games, seed=None, width=MAP_WIDTH, height=MAP_HEIGHT,
+              num_treasures=NUM_TREASURES, num_monsters=NUM_MONSTERS,
+              hp=INITIAL_PLAYER_HP, atk=INITIAL_PLAYER_ATK, monster_types=MONSTER_TYPES,
+              item_effects=ITEM_EFFECTS, max_turns=DEFAULT_MAX_TURNS):
+    """n_games 回のゲームを回して GameResult のリストを返す
+
+    結果は generate_world() と run_game() を 1 ゲームずつ呼んだときと同じ
+    (乱数を同じ順に使う)。配置の準備とポリシーのメソッドの取り出しは最初の 1 回だけで、
+    SimState も 1 つを使い回す。
+    """
+    rng = random.Random(seed)
+    place = _placer(rng, width, height, num_treasures, num_monsters, monster_types)
+    play = _game_runner(policy, rng, max_turns)
+    state = SimState(width, height, None, None, None, -1, hp, atk, item_effects)
+    results = []
+    append = results.append
+    for _ in range(n_games):
+        place(state)
+        append(play(state))
+    return results
+
+
+def measure_throughput(policy, n_games=20000, repeat=5, seed=0, **world_options):
+    """1秒あたりに回せるゲーム数を計測する
+
+    timeit と同じく repeat 回のうちいちばん速かった回で測る
+    (遅い回はほかのプロセスに CPU を取られた分で、シミュレーション自体の速さではない)。
+    """
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run_games(policy, n_games, seed, **world_options)
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return n_games / best
+
+
+if __name__ == "__main__":
+    results = run_games(GreedyPolicy(), 10000, seed=0)
+    wins = sum(1 for r in results if r.outcome == OUTCOME_WIN)
+    print(f"勝率: {wins / len(results):.1%}")
+    throughput = measure_throughput(GreedyPolicy())
+    print(f"スループット: {throughput:,.0f} ゲーム/秒 (目標 {THROUGHPUT_TARGET:,} ゲーム/秒)")
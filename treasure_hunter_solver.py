@@ -0,0 +1,276 @@
+from collections import OrderedDict, namedtuple
+
+from treasure_hunter_engine import MONSTER_TYPES, REGISTRY
+from treasure_hunter_registry import Inventory
+
+# --- 戦闘の厳密解 ---
+# 1 回の戦闘は (プレイヤーの HP, モンスターの HP, 持ち物) だけで決まる小さな
+# マルコフ決定過程なので、サンプリングせずに勝つ・逃げる・倒れる確率を
+# 動的計画法で正確に求められる (誤差は浮動小数点の丸めだけ)。
+# ルールは GameSession.handle_combat / handle_item と同じ:
+#   たたかう[a]  プレイヤーが atk//2〜atk のダメージ。倒せなければ反撃を受ける
+#   にげる[r]    ESCAPE_CHANCE で成功。失敗すると反撃を受ける
+#   アイテム     回復してから反撃を受ける
+# 反撃はモンスターの atk//2〜atk のダメージで、HP が 0 以下になったら負け。
+# 途中の状態の結果は LRU キャッシュ (CACHE_SIZE 件まで) で使い回す。
+# 状態の数は HP に比例して深くなるので、再帰は使わずに自前のスタックで
+# 行き先の状態を先に解く (HP 1000 でも RecursionError にならない。ただし状態が
+# 十数万あるので、HP 1000・ポーション 2 個で 10 秒ほどかかる)。
+# 1 回の解く処理の途中の結果は上限なしの dict に置き、解き終わってから
+# LRU キャッシュに入れる (途中で追い出されて同じ状態を何度も解き直さない)。
+#
+# 「最善」は value = 勝つ確率 + flee_value × 逃げる確率 を最大にする行動。
+# 逃げてもモンスターは残るので、既定では勝ちの半分の価値とする。
+# 戦闘のあとに残る HP やアイテムの価値は考えない。
+
+ACTION_ATTACK = "a"
+ACTION_RUN = "r"
+ESCAPE_CHANCE = 0.5 # GameSession.handle_combat と同じ
+DEFAULT_FLEE_VALUE = 0.5
+CACHE_SIZE = 1 << 18
+# 使う意味のあるアイテム (回復するもの)。効果が 0 以下のものは使っても得にならない
+# 行動としてはアイテムの名前 (そのまま入力するコマンド) で返す
+HEAL_IDS = REGISTRY.heal_ids
+HEAL_ITEMS = [REGISTRY.item_names[i] for i in HEAL_IDS]
+HEAL_EFFECTS = [REGISTRY.item_effects[i] for i in HEAL_IDS]
+# これより多く持っていても同じ数とみなす (1 回の戦闘でそこまで使うことはまずない)
+MAX_ITEM_COUNT = 16
+EPSILON = 1e-12 # 価値がこれ以内の差なら先に調べた行動を選ぶ
+
+# 1 つの行動を選んだとき (その後は最善を尽くす) の結果
+Advice = namedtuple("Advice", ["action", "win", "flee", "death", "value"])
+# functools.lru_cache の cache_info() と同じ形
+CacheInfo = namedtuple("CacheInfo", ["hits", "misses", "maxsize", "currsize"])
+
+_WIN = "win"
+_FLEE = "flee"
+_DEATH = "death"
+
+
+def inventory_key(inventory):
+    """持ち物 (Inventory か、名前 -> 個数の dict) を HEAL_ITEMS の並びの個数のタプルにする"""
+    if isinstance(inventory, dict):
+        return tuple(min(inventory.get(name, 0), MAX_ITEM_COUNT) for name in HEAL_ITEMS)
+    return tuple(min(inventory[i], MAX_ITEM_COUNT) for i in HEAL_IDS)
+
+
+def _inventory(inventory):
+    """Inventory / dict でもタプルでも、HEAL_ITEMS の長さのタプルにする"""
+    if isinstance(inventory, (Inventory, dict)):
+        return inventory_key(inventory)
+    inventory = tuple(min(count, MAX_ITEM_COUNT) for count in inventory)
+    return inventory + (0,) * (len(HEAL_ITEMS) - len(inventory))
+
+
+def _monster_turn(p, hp, monster_hp, inventory, monster_atk):
+    """確率 p で起きる反撃のあとの (確率, 行き先) を返す"""
+    lo = monster_atk // 2
+    q = p / (monster_atk - lo + 1)
+    for damage in range(lo, monster_atk + 1):
+        left = hp - damage
+        yield q, _DEATH if left <= 0 else (left, monster_hp, inventory)
+
+
+def _transitions(action, hp, monster_hp, inventory, max_hp, atk, monster_atk):
+    """行動 1 つの (確率, 行き先) を返す。行き先は _WIN などか次の状態"""
+    if action == ACTION_ATTACK:
+        lo = atk // 2
+        p = 1 / (atk - lo + 1)
+        for damage in range(lo, atk + 1):
+            left = monster_hp - damage
+            if left <= 0:
+                yield p, _WIN
+            else:
+                yield from _monster_turn(p, hp, left, inventory, monster_atk)
+    elif action == ACTION_RUN:
+        yield ESCAPE_CHANCE, _FLEE
+        yield from _monster_turn(1 - ESCAPE_CHANCE, hp, monster_hp, inventory, monster_atk)
+    else:
+        k = HEAL_ITEMS.index(action)
+        inventory = inventory[:k] + (inventory[k] - 1,) + inventory[k + 1:]
+        hp = min(hp + HEAL_EFFECTS[k], max_hp)
+        yield from _monster_turn(1.0, hp, monster_hp, inventory, monster_atk)
+
+
+def _actions(inventory):
+    """選べる行動 (たたかう・持っている回復アイテム・にげる の順)"""
+    yield ACTION_ATTACK
+    for name, count in zip(HEAL_ITEMS, inventory):
+        if count:
+            yield name
+    yield ACTION_RUN
+
+
+def _evaluate(action, hp, monster_hp, inventory, max_hp, atk, monster_atk, flee_value,
+              solved=None, missing=None):
+    """action をしてから最善を尽くしたときの (value, win, flee, death)
+
+    行き先の結果は solved (解いている途中の dict) か LRU キャッシュから取る。
+    missing にリストを渡すと、まだ解けていない行き先は解かずにその key を足す
+    (そのときの戻り値は使えない)。
+    """
+    state = (hp, monster_hp, inventory)
+    rest = (max_hp, atk, monster_atk, flee_value)
+    value = win = flee = death = 0.0
+    stay = 0.0 # 何も変わらない (0 ダメージどうし) 確率
+    for p, target in _transitions(action, hp, monster_hp, inventory, max_hp, atk, monster_atk):
+        if target is _WIN:
+            value += p
+            win += p
+        elif target is _FLEE:
+            value += p * flee_value
+            flee += p
+        elif target is _DEATH:
+            death += p
+        elif target == state:
+            stay += p
+        else:
+            key = target + rest
+            result = solved.get(key) if solved else None
+            if result is not None:
+                _stats[0] += 1
+            else:
+                result = _cache.get(key)
+                if result is not None:
+                    _cache.move_to_end(key)
+                    _stats[0] += 1
+                elif missing is not None:
+                    missing.append(key)
+                    continue
+                else:
+                    result = _solve(*key)
+            v, w, f, d, _ = result
+            value += p * v
+            win += p * w
+            flee += p * f
+            death += p * d
+    if stay:
+        # 同じ行動をくり返すので、決着がつくまでの分を足し合わせる (1 / (1 - stay) 倍)
+        if stay >= 1:
+            return 0.0, 0.0, 0.0, 0.0 # 決着がつかない
+        scale = 1 / (1 - stay)
+        value, win, flee, death = value * scale, win * scale, flee * scale, death * scale
+    return value, win, flee, death
+
+
+_cache = OrderedDict() # (hp, monster_hp, inventory, max_hp, atk, monster_atk, flee_value) -> 結果
+_stats = [0, 0] # hits, misses
+
+
+def _best(hp, monster_hp, inventory, max_hp, atk, monster_atk, flee_value, solved, missing):
+    """状態の最善の (value, win, flee, death, action)
+
+    まだ解けていない行き先があれば missing に足す (そのときの戻り値は使えない)。
+    """
+    best = None
+    for action in _actions(inventory):
+        result = _evaluate(action, hp, monster_hp, inventory, max_hp, atk, monster_atk,
+                           flee_value, solved, missing)
+        if best is None or result[0] > best[0] + EPSILON:
+            best = result + (action,)
+    return best
+
+
+def _solve(*key):
+    """状態の最善の (value, win, flee, death, action)"""
+    result = _cache.get(key)
+    if result is not None:
+        _cache.move_to_end(key)
+        _stats[0] += 1
+        return result
+    # 行き先を先に解く (帰りがけ順)。解けていない行き先があればそれを積んであとでやり直す
+    solved = {}
+    stack = [key]
+    while stack:
+        top = stack.pop()
+        if top in solved or top in _cache:
+            continue
+        missing = []
+        result = _best(*top, solved, missing)
+        if missing:
+            stack.append(top)
+            stack.extend(missing)
+            continue
+        _stats[1] += 1
+        solved[top] = result
+    # 解いた順 (最初に聞かれた状態が最後) に入れるので、古いほうから追い出される
+    for top, result in solved.items():
+        _cache[top] = result
+        if len(_cache) > CACHE_SIZE:
+            _cache.popitem(last=False)
+    return solved[key]
+
+
+def action_values(hp, atk, monster_hp, monster_atk, inventory=(), max_hp=None,
+                  flee_value=DEFAULT_FLEE_VALUE):
+    """選べる行動ごとの Advice のリスト (value の高い順)
+
+    inventory は inventory_key() のタプル (か Inventory / 名前 -> 個数の dict)。
+    max_hp を省略すると hp と同じとみなす。
+    """
+    inventory = _inventory(inventory)
+    if max_hp is None:
+        max_hp = hp
+    advice = []
+    for action in _actions(inventory):
+        value, win, flee, death = _evaluate(action, hp, monster_hp, inventory, max_hp, atk,
+                                            monster_atk, flee_value)
+        advice.append(Advice(action, win, flee, death, value))
+    advice.sort(key=lambda a: -a.value) # 同じ価値なら _actions() の順のまま
+    return advice
+
+
+def best_action(hp, atk, monster_hp, monster_atk, inventory=(), max_hp=None,
+                flee_value=DEFAULT_FLEE_VALUE):
+    """最善の行動の Advice"""
+    inventory = _inventory(inventory)
+    value, win, flee, death, action = _solve(hp, monster_hp, inventory,
+                                             hp if max_hp is None else max_hp,
+                                             atk, monster_atk, flee_value)
+    return Advice(action, win, flee, death, value)
+
+
+def advise(player, monster, flee_value=DEFAULT_FLEE_VALUE):
+    """戦闘中の player と monster (Player / Monster と同じ属性) の最善の行動"""
+    return best_action(player.hp, player.atk, monster.hp, monster.atk,
+                       inventory_key(player.inventory), player.max_hp, flee_value)
+
+
+def type_odds(hp, atk, inventory=(), max_hp=None, flee_value=DEFAULT_FLEE_VALUE):
+    """MONSTER_TYPES のそれぞれと戦い始めたときの最善の Advice (名前 -> Advice)"""
+    return {name: best_action(hp, atk, monster_hp, monster_atk, inventory, max_hp, flee_value)
+            for name, monster_hp, monster_atk in MONSTER_TYPES}
+
+
+def cache_info():
+    """LRU キャッシュの統計 (functools.lru_cache と同じ)"""
+    return CacheInfo(_stats[0], _stats[1], CACHE_SIZE, len(_cache))
+
+
+def clear_cache():
+    _cache.clear()
+    _stats[0] = _stats[1] = 0
+
+
+if __name__ == "__main__":
+    import time
+    from treasure_hunter_engine import INITIAL_PLAYER_HP, INITIAL_PLAYER_ATK
+
+    start = time.perf_counter()
+    for potions in range(3):
+        print(f"ポーション {potions} 個:")
+        for name, advice in type_odds(INITIAL_PLAYER_HP, INITIAL_PLAYER_ATK, (potions,)).items():
+            print(f"  {name:<6} 勝ち {advice.win:6.1%}  逃げ {advice.flee:6.1%}  "
+                  f"負け {advice.death:6.1%}  (最初の行動: {advice.action})")
+    print(f"{(time.perf_counter() - start) * 1000:.1f} ms  {cache_info()}")
+
+    # HP が減ったあとの判断 (最大 HP 30・ポーション 1 個でゴブリン (HP 15) と戦う)
+    print("\nHP   たたかう     ポーション   にげる       (勝ち/負け、* が最善)")
+    for hp in range(2, INITIAL_PLAYER_HP + 1, 4):
+        best = best_action(hp, INITIAL_PLAYER_ATK, 15, 5, (1,), INITIAL_PLAYER_HP).action
+        cells = []
+        for a in action_values(hp, INITIAL_PLAYER_ATK, 15, 5, (1,), INITIAL_PLAYER_HP):
+            mark = "*" if a.action == best else " "
+            cells.append((a.action, f"{a.win:5.1%}/{a.death:5.1%}{mark}"))
+        cells.sort(key=lambda c: (ACTION_ATTACK, "ポーション", ACTION_RUN).index(c[0]))
+        print(f"{hp:>2}   " + "  ".join(text for _, text in cells))
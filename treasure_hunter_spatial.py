@@ -0,0 +1,211 @@
+# --- 空間インデックス ---
+# マップを bucket_size x bucket_size のバケツに区切り、バケツごとに
+# モンスターのいるセルと宝箱 (アイテム) のあるセルの番号を集合で持つ。
+# 「半径 r 以内のモンスター」「いちばん近い宝箱」を、マップ全体や
+# モンスターの一覧を走査せずに、近くのバケツだけを見て答える。
+# GridMap の listeners に登録するので、cell._replace(...) で書き換えるたびに
+# 自動で最新になる。
+
+DEFAULT_BUCKET_SIZE = 16
+
+
+class SpatialIndex:
+    """GridMap のモンスターとアイテムの位置の索引"""
+
+    def __init__(self, game_map, bucket_size=DEFAULT_BUCKET_SIZE):
+        self.game_map = game_map
+        self.bucket_size = bucket_size
+        self.cols = -(-game_map.width // bucket_size)
+        self.rows = -(-game_map.height // bucket_size)
+        # バケツは中身ができたときに作る (空のバケツは None)
+        self.monster_buckets = [None] * (self.cols * self.rows)
+        self.item_buckets = [None] * (self.cols * self.rows)
+        self.monster_count = 0
+        self.item_count = 0
+
+        item_ids = game_map.item_ids
+        monster_ids = game_map.monster_ids
+        for i in range(game_map.width * game_map.height):
+            if item_ids[i]:
+                self._add(self.item_buckets, i)
+                self.item_count += 1
+            if monster_ids[i]:
+                self._add(self.monster_buckets, i)
+                self.monster_count += 1
+        game_map.listeners.append(self)
+
+    def detach(self):
+        """マップの書き換えを追うのをやめる"""
+        self.game_map.listeners.remove(self)
+
+    def _bucket(self, i):
+        width = self.game_map.width
+        size = self.bucket_size
+        return (i // width) // size * self.cols + (i % width) // size
+
+    def _add(self, buckets, i):
+        b = self._bucket(i)
+        bucket = buckets[b]
+        if bucket is None:
+            bucket = buckets[b] = set()
+        bucket.add(i)
+
+    def cell_changed(self, i):
+        """GridMap から呼ばれる: セル i の中身が変わった
+
+        モンスターが動くたびに 2 回ずつ呼ばれるので、バケツの番号は 1 回だけ計算する。
+        """
+        game_map = self.game_map
+        b = self._bucket(i)
+        items = self.item_buckets
+        bucket = items[b]
+        if game_map.item_ids[i]:
+            if bucket is None:
+                items[b] = {i}
+                self.item_count += 1
+            elif i not in bucket:
+                bucket.add(i)
+                self.item_count += 1
+        elif bucket is not None and i in bucket:
+            bucket.remove(i)
+            if not bucket:
+                items[b] = None
+            self.item_count -= 1
+        monsters = self.monster_buckets
+        bucket = monsters[b]
+        if game_map.monster_ids[i]:
+            if bucket is None:
+                monsters[b] = {i}
+                self.monster_count += 1
+            elif i not in bucket:
+                bucket.add(i)
+                self.monster_count += 1
+        elif bucket is not None and i in bucket:
+            bucket.remove(i)
+            if not bucket:
+                monsters[b] = None
+            self.monster_count -= 1
+
+    def at(self, x, y):
+        """(x, y) にいるモンスターと置いてあるアイテム (monster, item)。なければ None"""
+        cell = self.game_map[(x, y)]
+        return cell.monster, cell.item
+
+    def _buckets_in(self, x0, y0, x1, y1):
+        """矩形 (両端を含む) に重なるバケツの番号"""
+        size = self.bucket_size
+        bx0, by0 = max(x0, 0) // size, max(y0, 0) // size
+        bx1 = min(x1, self.game_map.width - 1) // size
+        by1 = min(y1, self.game_map.height - 1) // size
+        for by in range(by0, by1 + 1):
+            for bx in range(bx0, bx1 + 1):
+                yield by * self.cols + bx
+
+    def monsters_within(self, x, y, r):
+        """(x, y) からの距離 (ユークリッド) が r 以内のモンスターの座標の一覧"""
+        width = self.game_map.width
+        r2 = r * r
+        found = []
+        for b in self._buckets_in(x - r, y - r, x + r, y + r):
+            bucket = self.monster_buckets[b]
+            if bucket is None:
+                continue
+            for i in bucket:
+                mx, my = i % width, i // width
+                if (mx - x) ** 2 + (my - y) ** 2 <= r2:
+                    found.append((mx, my))
+        found.sort(key=lambda c: ((c[0] - x) ** 2 + (c[1] - y) ** 2, c[1], c[0]))
+        return found
+
+    def monsters_in(self, x0, y0, x1, y1):
+        """矩形 (両端を含む) の中にいるモンスターの座標の一覧 (順番は決まっていない)"""
+        width = self.game_map.width
+        found = []
+        for b in self._buckets_in(x0, y0, x1, y1):
+            bucket = self.monster_buckets[b]
+            if bucket is None:
+                continue
+            for i in bucket:
+                mx, my = i % width, i // width
+                if x0 <= mx <= x1 and y0 <= my <= y1:
+                    found.append((mx, my))
+        return found
+
+    def nearest_treasure(self, x, y):
+        """(x, y) からいちばん近い (マンハッタン距離) アイテムのあるセルの座標。なければ None
+
+        距離が同じなら y, x の小さいほう。自分のいるバケツから 1 周ずつ広げ、
+        見つけたものより近いものが残りの周にありえなくなったら止める。
+        """
+        if not self.item_count:
+            return None
+        game_map = self.game_map
+        width = game_map.width
+        size = self.bucket_size
+        bx, by = x // size, y // size
+        best = None
+        best_key = None
+        ring = 0
+        max_ring = max(self.cols, self.rows)
+        while ring <= max_ring:
+            # この周のバケツの中で、(x, y) にいちばん近い点までの距離は
+            # 少なくとも (ring - 1) * size + 1
+            if best_key is not None and (ring - 1) * size + 1 > best_key[0]:
+                break
+            for cx, cy in self._ring(bx, by, ring):
+                bucket = self.item_buckets[cy * self.cols + cx]
+                if bucket is None:
+                    continue
+                for i in bucket:
+                    ix, iy = i % width, i // width
+                    key = (abs(ix - x) + abs(iy - y), iy, ix)
+                    if best_key is None or key < best_key:
+                        best_key = key
+                        best = (ix, iy)
+            ring += 1
+        return best
+
+    def _ring(self, bx, by, ring):
+        """バケツ (bx, by) からチェビシェフ距離でちょうど ring 離れたバケツ (マップ内だけ)"""
+        if ring == 0:
+            yield bx, by
+            return
+        for cx in range(bx - ring, bx + ring + 1):
+            for cy in (by - ring, by + ring):
+                if 0 <= cx < self.cols and 0 <= cy < self.rows:
+                    yield cx, cy
+        for cy in range(by - ring + 1, by + ring):
+            for cx in (bx - ring, bx + ring):
+                if 0 <= cx < self.cols and 0 <= cy < self.rows:
+                    yield cx, cy
+
+
+if __name__ == "__main__":
+    import random
+    import time
+    from treasure_hunter_engine import setup_game
+
+    rng = random.Random(0)
+    player, game_map, monsters = setup_game(verbose=False, width=1000, height=1000,
+                                            num_treasures=2000, num_monsters=100_000, rng=rng)
+    start = time.perf_counter()
+    index = SpatialIndex(game_map)
+    print(f"インデックス作成: {time.perf_counter() - start:.3f} 秒")
+
+    points = [(rng.randrange(1000), rng.randrange(1000)) for _ in range(1000)]
+    start = time.perf_counter()
+    for x, y in points:
+        index.monsters_within(x, y, 8)
+    per_query = (time.perf_counter() - start) / len(points)
+    print(f"半径 8 のモンスター検索: {per_query * 1e6:.0f} µs/回")
+
+    start = time.perf_counter()
+    for x, y in points[:20]:
+        [m for m in monsters if (m.x - x) ** 2 + (m.y - y) ** 2 <= 64]
+    per_scan = (time.perf_counter() - start) / 20
+    print(f"  (一覧を全部見る場合: {per_scan * 1e6:.0f} µs/回)")
+
+    start = time.perf_counter()
+    for x, y in points:
+        index.nearest_treasure(x, y)
+    print(f"いちばん近い宝箱: {(time.perf_counter() - start) / len(points) * 1e6:.0f} µs/回")
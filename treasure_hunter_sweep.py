@@ -0,0 +1,221 @@
+import itertools
+import math
+import random
+from collections import namedtuple
+
+from treasure_hunter_engine import (REGISTRY, MONSTER_TYPES, MAP_WIDTH, MAP_HEIGHT,
+                                    INITIAL_PLAYER_HP, INITIAL_PLAYER_ATK,
+                                    NUM_TREASURES, NUM_MONSTERS)
+from treasure_hunter_placement import PlacementError, check_placement
+from treasure_hunter_sim import (ITEM_CODES, ITEM_EFFECTS, OUTCOME_WIN, DEFAULT_MAX_TURNS,
+                                 GreedyPolicy, RandomPolicy, generate_world, run_game)
+from treasure_hunter_tournament import Z_95, wilson_interval
+
+# --- バランス調整のスイープ ---
+# ゲームの定数 (宝箱・モンスターの数、プレイヤーの HP / ATK、モンスターの強さ、
+# アイテムの効果) の組み合わせの格子を、ヘッドレス・シミュレーションで回して比べる。
+#
+# 設定ごとに決まった回数を回すのではなく、batch ゲームごとに勝率の 95% 区間 (Wilson) を
+# 見て、区間の半分の幅が precision 以下になったらその設定は打ち切る
+# (Chow-Robbins の固定幅の逐次推定)。必要なゲーム数は勝率の分散 p(1-p) に比例するので、
+# 勝率が 0 や 1 に近い設定ほど早く終わる。固定回数で同じ精度を保証するには
+# 最悪の p = 0.5 に合わせた回数 (fixed_games()) がどの設定にも要る。
+#
+# ゲーム i はどの設定でも同じシード (first_seed + i) で作るので、設定どうしの差に
+# マップの違いによるばらつきが混ざりにくい (共通乱数)。
+
+DEFAULT_PRECISION = 0.02 # 勝率の 95% 区間の半分の幅
+DEFAULT_BATCH = 50 # 何ゲームごとに止めるかを判定するか
+DEFAULT_MIN_GAMES = 200 # これより少ないうちは止めない (勝率 0% / 100% で止まらないように)
+DEFAULT_MAX_GAMES = 20000
+
+# 1 つの設定。monster_types は (名前, HP, ATK) のタプル、
+# item_effects はアイテム番号ごとの HP の増減 (treasure_hunter_sim.ITEM_EFFECTS と同じ並び)
+SweepConfig = namedtuple("SweepConfig", [
+    "num_treasures", "num_monsters", "hp", "atk", "monster_types", "item_effects"])
+
+# 1 つの設定の結果
+SweepResult = namedtuple("SweepResult", [
+    "label", "config", "games", "wins", "win_rate", "win_ci", # win_ci は (下限, 上限)
+    "mean_turns", "turns_ci", "converged"]) # converged は precision に届いたか
+
+BASE_CONFIG = SweepConfig(NUM_TREASURES, NUM_MONSTERS, INITIAL_PLAYER_HP, INITIAL_PLAYER_ATK,
+                          tuple(MONSTER_TYPES), tuple(ITEM_EFFECTS))
+
+# スイープできる項目 -> 説明。ほかに消費アイテムの名前 (効果を差し替える) も使える
+PARAMETERS = {
+    "treasures": "宝箱の数 (NUM_TREASURES)",
+    "monsters": "モンスターの数 (NUM_MONSTERS)",
+    "hp": "プレイヤーの HP (INITIAL_PLAYER_HP)",
+    "atk": "プレイヤーの ATK (INITIAL_PLAYER_ATK)",
+    "monster_hp": "MONSTER_TYPES の HP の倍率",
+    "monster_atk": "MONSTER_TYPES の ATK の倍率",
+}
+ITEM_PARAMETERS = [REGISTRY.item_names[i] for i in REGISTRY.consumable_ids]
+
+POLICIES = {
+    "greedy": lambda rng: GreedyPolicy(),
+    "random": RandomPolicy,
+}
+
+
+def make_config(base=BASE_CONFIG, **values):
+    """base の一部を PARAMETERS / アイテム名の値で差し替えた SweepConfig"""
+    config = base
+    for name, value in values.items():
+        if name == "treasures":
+            config = config._replace(num_treasures=int(value))
+        elif name == "monsters":
+            config = config._replace(num_monsters=int(value))
+        elif name == "hp":
+            config = config._replace(hp=int(value))
+        elif name == "atk":
+            config = config._replace(atk=int(value))
+        elif name == "monster_hp":
+            config = config._replace(monster_types=tuple(
+                (m, max(1, round(hp * value)), atk) for m, hp, atk in config.monster_types))
+        elif name == "monster_atk":
+            config = config._replace(monster_types=tuple(
+                (m, hp, max(1, round(atk * value))) for m, hp, atk in config.monster_types))
+        elif name in ITEM_PARAMETERS:
+            effects = list(config.item_effects)
+            effects[ITEM_CODES[name]] = int(value)
+            config = config._replace(item_effects=tuple(effects))
+        else:
+            raise ValueError(f"スイープできない項目です: {name}")
+    return config
+
+
+def grid(axes, base=BASE_CONFIG, width=MAP_WIDTH, height=MAP_HEIGHT):
+    """{項目: 値のリスト} のすべての組み合わせの (ラベル, SweepConfig) のリスト
+
+    width x height のマップに置けない設定 (宝箱とモンスターが多すぎるなど) が
+    1 つでもあれば、回し始める前にそれをすべて挙げた PlacementError にする。
+    """
+    names = list(axes)
+    configs = []
+    errors = []
+    for values in itertools.product(*(axes[name] for name in names)):
+        label = " ".join(f"{name}={value:g}" for name, value in zip(names, values))
+        config = make_config(base, **dict(zip(names, values)))
+        try:
+            check_placement(width, height, (0, 0), config.num_treasures, config.num_monsters)
+        except PlacementError as e:
+            errors.append(f"  {label or '(基本設定)'}: {e}")
+        configs.append((label, config))
+    if errors:
+        raise PlacementError("配置できない設定があります:\n" + "\n".join(errors))
+    return configs
+
+
+def fixed_games(precision=DEFAULT_PRECISION, z=Z_95):
+    """どんな勝率でも半分の幅を precision 以下にするのに、固定回数なら何ゲーム要るか"""
+    return math.ceil(z * z / (4 * precision * precision))
+
+
+def run_config(label, config, policy="greedy", first_seed=0, precision=DEFAULT_PRECISION,
+               batch=DEFAULT_BATCH, min_games=DEFAULT_MIN_GAMES, max_games=DEFAULT_MAX_GAMES,
+               width=MAP_WIDTH, height=MAP_HEIGHT, max_turns=DEFAULT_MAX_TURNS):
+    """1 つの設定を、勝率の区間が precision に収まるまで (か max_games まで) 回す"""
+    make_policy = POLICIES[policy]
+    world_options = dict(width=width, height=height, num_treasures=config.num_treasures,
+                         num_monsters=config.num_monsters, hp=config.hp, atk=config.atk,
+                         monster_types=config.monster_types, item_effects=list(config.item_effects))
+    games = wins = 0
+    turns_sum = turns_sq = 0
+    converged = False
+    while games < max_games:
+        for seed in range(first_seed + games, first_seed + min(games + batch, max_games)):
+            rng = random.Random(seed)
+            state = generate_world(rng, **world_options)
+            result = run_game(make_policy(rng), rng, state, max_turns)
+            games += 1
+            wins += result.outcome == OUTCOME_WIN
+            turns_sum += result.turns
+            turns_sq += result.turns * result.turns
+        if games >= min_games:
+            lo, hi = wilson_interval(wins, games)
+            if hi - lo <= 2 * precision:
+                converged = True
+                break
+
+    mean = turns_sum / games
+    var = (turns_sq - games * mean * mean) / (games - 1) if games > 1 else 0.0
+    half = Z_95 * math.sqrt(max(0.0, var) / games)
+    return SweepResult(label, config, games, wins, wins / games, wilson_interval(wins, games),
+                       mean, (mean - half, mean + half), converged)
+
+
+def sweep(axes, base=BASE_CONFIG, progress=None, width=MAP_WIDTH, height=MAP_HEIGHT,
+          **options):
+    """axes の格子のすべての設定を run_config() で回し、SweepResult のリストを返す
+
+    progress を渡すと、設定が 1 つ終わるたびに progress(SweepResult) を呼ぶ。
+    置けない設定があれば、どれも回さずに PlacementError (grid() を参照)。
+    """
+    results = []
+    for label, config in grid(axes, base, width, height):
+        result = run_config(label, config, width=width, height=height, **options)
+        results.append(result)
+        if progress is not None:
+            progress(result)
+    return results
+
+
+def format_results(results, precision=DEFAULT_PRECISION):
+    """表と、固定回数と比べたゲーム数の節約を返す"""
+    width = max([len("設定")] + [len(r.label) for r in results])
+    lines = [f"{'設定':<{width}} {'勝率':>7} {'95%区間':>15} {'平均ターン':>10} "
+             f"{'95%区間':>15} {'ゲーム数':>8}"]
+    for r in results:
+        mark = "" if r.converged else " (上限)"
+        lines.append(
+            f"{r.label:<{width}} {r.win_rate:>7.1%} "
+            f"{f'{r.win_ci[0]:.1%}-{r.win_ci[1]:.1%}':>15} {r.mean_turns:>10.1f} "
+            f"{f'{r.turns_ci[0]:.1f}-{r.turns_ci[1]:.1f}':>15} {r.games:>8}{mark}")
+    total = sum(r.games for r in results)
+    fixed = fixed_games(precision) * len(results)
+    lines.append(f"\n{len(results)} 設定 / {total:,} ゲーム "
+                 f"(固定回数なら {fixed:,} ゲーム、{total / fixed:.0%})")
+    return "\n".join(lines)
+
+
+def _parse_axis(text):
+    """"hp=20,30,40" -> ("hp", [20.0, 30.0, 40.0])"""
+    name, _, values = text.partition("=")
+    if not values:
+        raise ValueError(f"項目=値,値,... の形で指定してください: {text}")
+    return name, [float(v) for v in values.split(",")]
+
+
+if __name__ == "__main__":
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(
+        description="ゲームの定数の組み合わせを、勝率が precision に収まるまで回して比べる",
+        epilog="項目: " + ", ".join(list(PARAMETERS) + ITEM_PARAMETERS))
+    parser.add_argument("--vary", action="append", type=_parse_axis, metavar="項目=値,値,...",
+                        help="スイープする項目 (何度でも指定できる)")
+    parser.add_argument("--policy", choices=sorted(POLICIES), default="greedy")
+    parser.add_argument("--precision", type=float, default=DEFAULT_PRECISION)
+    parser.add_argument("--batch", type=int, default=DEFAULT_BATCH)
+    parser.add_argument("--min-games", type=int, default=DEFAULT_MIN_GAMES)
+    parser.add_argument("--max-games", type=int, default=DEFAULT_MAX_GAMES)
+    parser.add_argument("--first-seed", type=int, default=0)
+    parser.add_argument("--width", type=int, default=MAP_WIDTH)
+    parser.add_argument("--height", type=int, default=MAP_HEIGHT)
+    args = parser.parse_args()
+    axes = dict(args.vary) if args.vary else {"hp": [20, 30, 40], "monsters": [2, 3, 4, 5]}
+    try:
+        grid(axes, width=args.width, height=args.height) # 回し始める前に設定を確かめる
+    except ValueError as e:
+        parser.error(str(e))
+
+    start = time.perf_counter()
+    results = sweep(axes, policy=args.policy, first_seed=args.first_seed,
+                    precision=args.precision, batch=args.batch, min_games=args.min_games,
+                    max_games=args.max_games, width=args.width, height=args.height)
+    elapsed = time.perf_counter() - start
+    print(format_results(results, args.precision))
+    print(f"{elapsed:.2f} 秒")
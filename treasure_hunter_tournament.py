@@ -0,0 +1,276 @@
+import math
+import random
+import time
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from treasure_hunter_engine import (MAP_WIDTH, MAP_HEIGHT, NUM_TREASURES, NUM_MONSTERS,
+                                    REGISTRY, GameSession, setup_game)
+from treasure_hunter_sim import (GameResult, OUTCOME_WIN, OUTCOME_QUIT, DEFAULT_MAX_TURNS)
+from treasure_hunter_solver import ACTION_ATTACK, ACTION_RUN, advise
+
+# --- トーナメント ---
+# 複数の方策 (ポリシー) を、同じシードの範囲の setup_game() で作ったゲームで
+# 戦わせて比べる。シードをチャンクに分けてプロセスプールで並列に回す。
+# 1 ゲームの乱数はシードだけから決まるので、ワーカー数やチャンクの
+# 大きさを変えても結果は同じになる。
+
+# ゲームの乱数とは別に、方策が使う乱数 (ランダム移動など) のシード
+POLICY_SEED_SALT = "policy"
+
+DEFAULT_CHUNK_SIZE = 64
+# 回復アイテムの番号 (回復量の小さい順)
+HEAL_IDS = sorted(REGISTRY.heal_ids, key=lambda i: REGISTRY.item_effects[i])
+Z_95 = 1.959964 # 95% 信頼区間
+
+
+class PlayPolicy:
+    """GameSession にコマンドを出す方策
+
+    flee_below   HP がこれ未満なら戦闘で逃げる (0 ならいつも戦う)
+    potion_below HP がこれ未満なら回復アイテムを使う (0 なら使わない)
+    auto_explore True なら自動探索 (x) で宝箱へ向かい (モンスターはなるべく避ける)、
+                 False ならランダムに歩く
+    oracle       True なら戦闘では treasure_hunter_solver の最善の行動をとる
+                 (flee_below と、戦闘中の potion_below は使わない)
+    seek_treasure True ならいちばん近い宝箱 (SpatialIndex.nearest_treasure) へまっすぐ歩く
+                 (モンスターは避けない)
+    """
+
+    def __init__(self, name, flee_below=0, potion_below=0, auto_explore=False, oracle=False,
+                 seek_treasure=False):
+        self.name = name
+        self.flee_below = flee_below
+        self.potion_below = potion_below
+        self.auto_explore = auto_explore
+        self.oracle = oracle
+        self.seek_treasure = seek_treasure
+
+    def __repr__(self):
+        return (f"PlayPolicy({self.name!r}, flee_below={self.flee_below}, "
+                f"potion_below={self.potion_below}, auto_explore={self.auto_explore}, "
+                f"oracle={self.oracle}, seek_treasure={self.seek_treasure})")
+
+    def potion(self, player):
+        """今使うべき回復アイテムの名前 (コマンドとして入力する。なければ None)
+
+        減った HP を超えずに回復できるうちでいちばん回復量の大きいもの、
+        どれも超えてしまうならいちばん回復量の小さいもの。
+        """
+        inventory = player.inventory
+        held = [i for i in HEAL_IDS if inventory[i]]
+        if not held:
+            return None
+        missing = player.max_hp - player.hp
+        fits = [i for i in held if REGISTRY.item_effects[i] <= missing]
+        return REGISTRY.item_names[fits[-1] if fits else held[0]]
+
+    def command(self, session, rng):
+        """次のコマンドを決める"""
+        player = session.player
+        if session.mode == GameSession.MODE_ITEM:
+            if self.oracle and session.monster is not None:
+                return advise(player, session.monster).action # 戦闘中に選んだアイテム
+            return self.potion(player) or "?"
+        if self.oracle and session.mode == GameSession.MODE_COMBAT:
+            action = advise(player, session.monster).action
+            return action if action in (ACTION_ATTACK, ACTION_RUN) else "i"
+        if player.hp < self.potion_below and self.potion(player):
+            return "i"
+        if session.mode == GameSession.MODE_COMBAT:
+            return "r" if player.hp < self.flee_below else "a"
+        if self.auto_explore:
+            return "x"
+        if self.seek_treasure:
+            target = session.spatial_index().nearest_treasure(player.x, player.y)
+            if target is not None:
+                dx, dy = target[0] - player.x, target[1] - player.y
+                if abs(dx) >= abs(dy) and dx:
+                    return "d" if dx > 0 else "a"
+                if dy:
+                    return "s" if dy > 0 else "w"
+        return rng.choice("wasd")
+
+
+# 比べる方策の既定の組み合わせ
+DEFAULT_POLICIES = [
+    PlayPolicy("always-fight"),
+    PlayPolicy("flee<10", flee_below=10),
+    PlayPolicy("potion<10", potion_below=10),
+    PlayPolicy("potion<15,flee<8", flee_below=8, potion_below=15),
+    PlayPolicy("auto-explore", potion_below=10, auto_explore=True),
+    PlayPolicy("nearest-treasure", potion_below=10, seek_treasure=True),
+    PlayPolicy("oracle", potion_below=10, oracle=True),
+]
+
+
+def play_game(policy, seed, width=MAP_WIDTH, height=MAP_HEIGHT,
+              num_treasures=NUM_TREASURES, num_monsters=NUM_MONSTERS,
+              max_turns=DEFAULT_MAX_TURNS):
+    """シード seed のゲームを policy で最後まで (か max_turns ターンまで) 進める
+
+    ターンはコマンドの数ではなく GameSession.steps (歩いた回数) で数える。
+    自動探索の x は 1 コマンドで何歩も歩くので、コマンドの数では方策どうしを比べられない。
+    """
+    rng = random.Random(seed)
+    player, game_map, monsters = setup_game(
+        verbose=False, width=width, height=height,
+        num_treasures=num_treasures, num_monsters=num_monsters, rng=rng)
+    session = GameSession(player, game_map, monsters, rng)
+    session.max_steps = max_turns
+    policy_rng = random.Random(f"{POLICY_SEED_SALT}-{seed}")
+    items_used = 0
+    inventory = player.inventory
+    while not session.finished and session.steps < max_turns:
+        if session.mode == GameSession.MODE_ITEM:
+            # 持ち物が減ったときだけ数える (やめた・持っていないアイテムは数えない)
+            before = inventory.total
+            session.handle(policy.command(session, policy_rng))
+            items_used += before - inventory.total
+        else:
+            session.handle(policy.command(session, policy_rng))
+    outcome = session.outcome or OUTCOME_QUIT # 打ち切りは「やめた」扱い
+    return GameResult(outcome, session.steps, player.hp, items_used)
+
+
+def _run_chunk(task):
+    """ワーカーで動く: 1 チャンク分のシードを回す"""
+    policy_index, policy, start, stop, world_options = task
+    return policy_index, start, [play_game(policy, seed, **world_options)
+                                 for seed in range(start, stop)]
+
+
+def iter_results(policies, seeds, workers=None, chunk_size=DEFAULT_CHUNK_SIZE, **world_options):
+    """(方策の番号, シード, GameResult) を終わった順に返す
+
+    workers=1 ならプロセスを使わずにその場で回す。
+    seeds は連続した range (step 1) であること。
+    """
+    if seeds.step != 1:
+        raise ValueError("seeds は step 1 の range にしてください")
+    tasks = [(p, policy, start, min(start + chunk_size, seeds.stop), world_options)
+             for p, policy in enumerate(policies)
+             for start in range(seeds.start, seeds.stop, chunk_size)]
+    if workers == 1:
+        chunks = map(_run_chunk, tasks)
+        executor = None
+    else:
+        executor = ProcessPoolExecutor(workers)
+        chunks = _as_completed(executor, tasks)
+    try:
+        for policy_index, start, results in chunks:
+            for offset, result in enumerate(results):
+                yield policy_index, start + offset, result
+    finally:
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+
+
+def _as_completed(executor, tasks):
+    futures = [executor.submit(_run_chunk, task) for task in tasks]
+    for future in as_completed(futures):
+        yield future.result()
+
+
+# 1 つの方策の成績
+PolicySummary = namedtuple("PolicySummary", [
+    "name", "games", "wins", "win_rate", "win_ci", # win_ci は (下限, 上限)
+    "mean_turns", "turns_ci", "median_turns", "p90_turns", "timeouts"])
+
+
+def wilson_interval(successes, n, z=Z_95):
+    """二項分布の割合の信頼区間 (Wilson)"""
+    if n == 0:
+        return (0.0, 1.0)
+    p = successes / n
+    denom = 1 + z * z / n
+    center = (p + z * z / (2 * n)) / denom
+    half = z * math.sqrt(p * (1 - p) / n + z * z / (4 * n * n)) / denom
+    return (max(0.0, center - half), min(1.0, center + half))
+
+
+def summarize(name, results):
+    """シード順に並んだ GameResult のリストから PolicySummary を作る"""
+    n = len(results)
+    wins = sum(1 for r in results if r.outcome == OUTCOME_WIN)
+    turns = sorted(r.turns for r in results)
+    mean = sum(turns) / n if n else 0.0
+    var = sum((t - mean) ** 2 for t in turns) / (n - 1) if n > 1 else 0.0
+    half = Z_95 * math.sqrt(var / n) if n else 0.0
+    return PolicySummary(
+        name, n, wins, wins / n if n else 0.0, wilson_interval(wins, n),
+        mean, (mean - half, mean + half),
+        turns[n // 2] if n else 0, turns[min(n - 1, n * 9 // 10)] if n else 0,
+        sum(1 for r in results if r.outcome == OUTCOME_QUIT))
+
+
+def run_tournament(policies=DEFAULT_POLICIES, seeds=range(1000), workers=None,
+                   chunk_size=DEFAULT_CHUNK_SIZE, progress=None, **world_options):
+    """policies をすべて seeds のゲームで回し、PolicySummary のリストを返す
+
+    結果はシードの位置に置いてから集計するので、終わった順番に関係なく同じになる。
+    progress を渡すと、1 ゲーム終わるたびに progress(終わった数, 全体の数) を呼ぶ。
+    """
+    table = [[None] * len(seeds) for _ in policies]
+    total = len(policies) * len(seeds)
+    done = 0
+    for p, seed, result in iter_results(policies, seeds, workers, chunk_size, **world_options):
+        table[p][seed - seeds.start] = result
+        done += 1
+        if progress is not None:
+            progress(done, total)
+    return [summarize(policy.name, results) for policy, results in zip(policies, table)]
+
+
+def format_summary(summaries):
+    """表にして返す"""
+    lines = [f"{'方策':<20} {'勝率':>7} {'95%区間':>15} {'平均ターン':>10} {'95%区間':>15} "
+             f"{'中央値':>6} {'90%':>5} {'打切':>5}"]
+    for s in summaries:
+        lines.append(
+            f"{s.name:<20} {s.win_rate:>7.1%} "
+            f"{f'{s.win_ci[0]:.1%}-{s.win_ci[1]:.1%}':>15} {s.mean_turns:>10.1f} "
+            f"{f'{s.turns_ci[0]:.1f}-{s.turns_ci[1]:.1f}':>15} "
+            f"{s.median_turns:>6} {s.p90_turns:>5} {s.timeouts:>5}")
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    import argparse
+    import os
+
+    parser = argparse.ArgumentParser(description="方策どうしを同じシードのゲームで比べる")
+    parser.add_argument("--games", type=int, default=2000, help="方策ごとのゲーム数")
+    parser.add_argument("--first-seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=None, help="プロセス数 (既定は CPU 数)")
+    parser.add_argument("--chunk", type=int, default=DEFAULT_CHUNK_SIZE, help="1 タスクのシード数")
+    parser.add_argument("--width", type=int, default=MAP_WIDTH)
+    parser.add_argument("--height", type=int, default=MAP_HEIGHT)
+    parser.add_argument("--treasures", type=int, default=NUM_TREASURES)
+    parser.add_argument("--monsters", type=int, default=NUM_MONSTERS)
+    parser.add_argument("--scaling", action="store_true",
+                        help="ワーカー数 1, 2, 4, ... で所要時間を測る")
+    args = parser.parse_args()
+    seeds = range(args.first_seed, args.first_seed + args.games)
+    world_options = dict(width=args.width, height=args.height,
+                         num_treasures=args.treasures, num_monsters=args.monsters)
+
+    if args.scaling:
+        baseline = None
+        workers = 1
+        while workers <= (os.cpu_count() or 1):
+            start = time.perf_counter()
+            summaries = run_tournament(seeds=seeds, workers=workers, chunk_size=args.chunk,
+                                       **world_options)
+            elapsed = time.perf_counter() - start
+            baseline = baseline or elapsed
+            print(f"ワーカー {workers}: {elapsed:.2f} 秒 (×{baseline / elapsed:.2f})")
+            workers *= 2
+    else:
+        start = time.perf_counter()
+        summaries = run_tournament(seeds=seeds, workers=args.workers, chunk_size=args.chunk,
+                                   **world_options)
+        elapsed = time.perf_counter() - start
+        print(format_summary(summaries))
+        games = len(seeds) * len(DEFAULT_POLICIES)
+        print(f"\n{games} ゲーム / {elapsed:.2f} 秒 ({games / elapsed:,.0f} ゲーム/秒)")
@@ -0,0 +1,267 @@
+import os
+import pickle
+import random
+import shutil
+import tempfile
+import time
+from collections import OrderedDict, deque
+
+from treasure_hunter_engine import (MapCell, ITEMS, REGISTRY, INITIAL_PLAYER_HP,
+                                    INITIAL_PLAYER_ATK, StoredMonster, Player, populate)
+from treasure_hunter_events import NULL_SINK
+from treasure_hunter_grid import GridMap
+from treasure_hunter_monsters import MonsterStore
+from treasure_hunter_placement import place_entities
+
+# --- オープンワールド ---
+# 果てのないマップを chunk_size x chunk_size のチャンクに区切り、
+# チャンクは初めて触ったときに「ワールドのシード + チャンクの座標」から作る。
+# 配置のルールは setup_game() と同じ (place_entities + populate)。
+# オーブはワールドに 1 つだけで、原点から orb_distance チャンク離れたチャンクに置く。
+#
+# 読み込んだチャンクは最大 max_chunks 個まで LRU で持つ。追い出すときに、
+# 書き換えた (アイテムを拾った・モンスターを倒した・モンスターに傷を負わせた) チャンクだけを
+# spill_dir に書き出し、書き換えていないチャンクはそのまま捨てる (同じシードからいつでも作り直せる)。
+# モンスターの HP はセルを書かずに変わる (戦って逃げたとき) ので、追い出すときに
+# 生成したときの HP と比べて確かめる。
+# なのでどれだけ遠くまで歩いても、メモリに持つのはチャンク max_chunks 個分だけ。
+#
+# GridMap と同じく world[(x, y)] で MapCell を読み書きでき、in_bounds() は
+# いつも True なので、Player / GameSession はそのまま動く (自動探索だけは使えない)。
+
+DEFAULT_CHUNK_SIZE = 16
+DEFAULT_MAX_CHUNKS = 64
+TREASURES_PER_CHUNK = 8
+MONSTERS_PER_CHUNK = 12
+DEFAULT_ORB_DISTANCE = 3 # オーブのあるチャンクの、原点からのチェビシェフ距離 (チャンク数)
+LATENCY_SAMPLES = 1024 # 生成時間の統計に使う直近のチャンク数
+
+
+class Chunk:
+    """チャンク 1 つ分のマップとモンスター"""
+    __slots__ = ("map", "monsters")
+
+    def __init__(self, game_map, monsters):
+        self.map = game_map
+        self.monsters = monsters
+
+
+class WorldMonsters:
+    """読み込み中のチャンクのモンスターをまとめて見せる (GameSession.monsters 用)"""
+
+    def __init__(self, world):
+        self.world = world
+
+    def remove(self, monster):
+        monster.store.remove(monster)
+
+    def __contains__(self, monster):
+        return monster in monster.store
+
+    def __iter__(self):
+        for chunk in list(self.world.chunks.values()):
+            yield from chunk.monsters
+
+    def __len__(self):
+        return sum(len(chunk.monsters) for chunk in self.world.chunks.values())
+
+
+class ChunkedWorld:
+    """チャンクに分けて必要な分だけ作る、果てのないマップ"""
+
+    def __init__(self, seed, chunk_size=DEFAULT_CHUNK_SIZE, max_chunks=DEFAULT_MAX_CHUNKS,
+                 treasures_per_chunk=TREASURES_PER_CHUNK, monsters_per_chunk=MONSTERS_PER_CHUNK,
+                 orb_distance=DEFAULT_ORB_DISTANCE, spill_dir=None):
+        if max_chunks < 9:
+            raise ValueError("max_chunks はプレイヤーの周りの 9 チャンクより多くしてください")
+        self.seed = seed
+        self.chunk_size = chunk_size
+        self.max_chunks = max_chunks
+        self.treasures_per_chunk = treasures_per_chunk
+        self.monsters_per_chunk = monsters_per_chunk
+        self.chunks = OrderedDict() # (cx, cy) -> Chunk。最後が最近使ったもの
+        self.modified = set() # 読み込み中のチャンクのうち、書き換えたもの
+        self._own_spill_dir = spill_dir is None
+        self.spill_dir = spill_dir # None なら最初に書き出すときに一時ディレクトリを作る
+        self.monsters = WorldMonsters(self)
+
+        # オーブのあるチャンク: 原点からちょうど orb_distance 離れた周の上から選ぶ
+        rng = random.Random(f"{seed}/orb")
+        ring = [(cx, cy) for cx in range(-orb_distance, orb_distance + 1)
+                for cy in range(-orb_distance, orb_distance + 1)
+                if max(abs(cx), abs(cy)) == orb_distance]
+        self.orb_chunk = rng.choice(ring)
+
+        self.generated = 0
+        self.loaded = 0 # ディスクから読み戻した数
+        self.spilled = 0 # ディスクに書き出した数
+        self.dropped = 0 # 書き換えていないので捨てた数
+        self.generation_times = deque(maxlen=LATENCY_SAMPLES) # 秒
+
+    def in_bounds(self, x, y):
+        return True
+
+    def close(self):
+        """書き出したチャンクを消す (spill_dir を自分で作ったときだけ)"""
+        if self._own_spill_dir and self.spill_dir is not None:
+            shutil.rmtree(self.spill_dir, ignore_errors=True)
+            self.spill_dir = None
+
+    # --- チャンク ---
+
+    def _spill_path(self, cx, cy):
+        return os.path.join(self.spill_dir, f"{cx}_{cy}.chunk")
+
+    def chunk(self, cx, cy):
+        """チャンク (cx, cy)。なければディスクから読むか作る"""
+        key = (cx, cy)
+        chunks = self.chunks
+        chunk = chunks.get(key)
+        if chunk is not None:
+            chunks.move_to_end(key)
+            return chunk
+        path = self._spill_path(cx, cy) if self.spill_dir is not None else None
+        if path is not None and os.path.exists(path):
+            with open(path, "rb") as f:
+                chunk = pickle.load(f)
+            os.remove(path)
+            self.modified.add(key) # メモリにしかない状態になったので、追い出すときにまた書く
+            self.loaded += 1
+        else:
+            chunk = self.generate(cx, cy)
+        chunks[key] = chunk
+        if len(chunks) > self.max_chunks:
+            self._evict()
+        return chunk
+
+    def generate(self, cx, cy):
+        """シードとチャンクの座標から、チャンクを作る (同じ引数ならいつも同じ中身)"""
+        start = time.perf_counter()
+        size = self.chunk_size
+        rng = random.Random(f"{self.seed}/{cx}/{cy}")
+        monsters = MonsterStore(StoredMonster)
+        game_map = GridMap(size, size, MapCell, ITEMS.values(), monster_store=monsters)
+        # チャンクの左上を place_entities のスタート地点にする (原点のチャンクならプレイヤーの位置)
+        treasure_coords, monster_coords, orb_coord = place_entities(
+            size, size, (0, 0), self.treasures_per_chunk, self.monsters_per_chunk, rng=rng)
+        if (cx, cy) != self.orb_chunk:
+            orb_coord = None
+        populate(game_map, monsters, treasure_coords, monster_coords, orb_coord, rng,
+                 origin=(cx * size, cy * size))
+        self.generated += 1
+        self.generation_times.append(time.perf_counter() - start)
+        return Chunk(game_map, monsters)
+
+    def _monsters_changed(self, chunk):
+        """チャンクのモンスターが生成したときから変わったか (傷を負った・取り除かれた)"""
+        store = chunk.monsters
+        if len(store) != len(store.slots):
+            return True
+        full_hp = [REGISTRY.monster_hp[REGISTRY.monster_ids[name]] for name in store.type_names]
+        type_ids = store.type_ids
+        hp = store.hp
+        return any(hp[slot] != full_hp[type_ids[handle]]
+                   for slot, handle in enumerate(store.handles))
+
+    def _evict(self):
+        """いちばん長く使っていないチャンクを追い出す"""
+        key, chunk = self.chunks.popitem(last=False)
+        if key in self.modified or self._monsters_changed(chunk):
+            self.modified.discard(key)
+            if self.spill_dir is None:
+                self.spill_dir = tempfile.mkdtemp(prefix="treasure_hunter_world_")
+            with open(self._spill_path(*key), "wb") as f:
+                pickle.dump(chunk, f, pickle.HIGHEST_PROTOCOL)
+            self.spilled += 1
+        else:
+            self.dropped += 1
+
+    # --- GridMap と同じ読み書き ---
+
+    def __getitem__(self, coord):
+        x, y = coord
+        size = self.chunk_size
+        cx, cy = x // size, y // size
+        return self.chunk(cx, cy).map[(x - cx * size, y - cy * size)]
+
+    def __setitem__(self, coord, cell):
+        x, y = coord
+        size = self.chunk_size
+        cx, cy = x // size, y // size
+        self.chunk(cx, cy).map[(x - cx * size, y - cy * size)] = cell
+        self.modified.add((cx, cy))
+
+    # --- 統計 ---
+
+    def stats(self):
+        """チャンクの数と生成時間 (µs) の統計"""
+        samples = sorted(self.generation_times)
+        n = len(samples)
+        data = {
+            "loaded_chunks": len(self.chunks),
+            "generated": self.generated,
+            "dropped": self.dropped,
+            "spilled": self.spilled,
+            "reloaded": self.loaded,
+        }
+        if n:
+            data["gen_p50_us"] = samples[n // 2] * 1e6
+            data["gen_p99_us"] = samples[min(n - 1, n * 99 // 100)] * 1e6
+            data["gen_max_us"] = samples[-1] * 1e6
+        return data
+
+
+def setup_world(seed, events=NULL_SINK, **world_options):
+    """オープンワールドのゲームを作る (setup_game() と同じく (player, マップ, モンスター) を返す)"""
+    world = ChunkedWorld(seed, **world_options)
+    player = Player(0, 0, INITIAL_PLAYER_HP, INITIAL_PLAYER_ATK, events)
+    return player, world, world.monsters
+
+
+if __name__ == "__main__":
+    import argparse
+    import tracemalloc
+
+    from treasure_hunter_engine import GameSession
+
+    parser = argparse.ArgumentParser(description="オープンワールドを遠くまで歩いて、メモリと生成時間を測る")
+    parser.add_argument("--steps", type=int, default=200_000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--max-chunks", type=int, default=DEFAULT_MAX_CHUNKS)
+    args = parser.parse_args()
+
+    # 生成時間 (tracemalloc を動かすと遅くなるので、歩く前に別のワールドで測る)
+    bench = ChunkedWorld(args.seed)
+    for i in range(2000):
+        bench.generate(i % 50, i // 50)
+    stats = bench.stats()
+    print(f"チャンク ({bench.chunk_size}x{bench.chunk_size}) の生成: "
+          f"p50 {stats['gen_p50_us']:.0f} µs / p99 {stats['gen_p99_us']:.0f} µs")
+    bench.close()
+
+    player, world, monsters = setup_world(args.seed, max_chunks=args.max_chunks)
+    # 宝箱は拾い、モンスターとは戦うプレイヤーが、右下へ斜めに進みつつランダムに歩く
+    session = GameSession(player, world, monsters, random.Random(args.seed))
+    walk = random.Random(args.seed)
+    player.hp = player.max_hp = 10**9 # 倒れないようにする
+    tracemalloc.start()
+    start = time.perf_counter()
+    report_every = args.steps // 5
+    for step in range(1, args.steps + 1):
+        if session.mode == GameSession.MODE_COMBAT:
+            session.handle("a")
+        else:
+            session.handle(walk.choice("ddssaw"))
+        if session.finished:
+            session = GameSession(player, world, monsters, random.Random(step))
+        if step % report_every == 0:
+            current, peak = tracemalloc.get_traced_memory()
+            print(f"{step:>8} 手  位置 ({player.x}, {player.y})  "
+                  f"メモリ {current / 2**20:.2f} MiB (最大 {peak / 2**20:.2f} MiB)  "
+                  f"チャンク {len(world.chunks)} 個")
+    elapsed = time.perf_counter() - start
+    tracemalloc.stop()
+    print(f"{args.steps} 手を {elapsed:.2f} 秒で")
+    for key, value in world.stats().items():
+        print(f"  {key}: {value:.1f}" if isinstance(value, float) else f"  {key}: {value}")
+    world.close()